@@ -0,0 +1,149 @@
+"""Prompt size per chat turn, with and without rolling summaries.
+
+Plays a long conversation against `POST /api/chat/stream` with a
+deterministic stub model in place of OpenAI. Replies are ~150 words, and
+summaries are built from the start of each message and capped at
+`CHAT_SUMMARY_WORDS`. Queued jobs run between turns, like a job worker that
+keeps up. The script prints the prompt size of the chat request every few turns
+(tokens estimated as characters / 4), once with summarization off
+(`CHAT_SUMMARY_THRESHOLD=0`: the last 20 raw messages) and once with the
+configured threshold.
+
+It exits non-zero if the summarized prompt keeps growing after the first
+summary, or if no summary was written.
+
+    cd backend && python bench/chat_summary_bench.py --turns 60
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import types
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.chdir(BACKEND)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET", "chat-summary-bench-secret-0123456789")
+
+WORDS = ("cell membrane energy gradient enzyme protein transport osmosis diffusion vesicle signal receptor "
+         "pathway mitochondria glucose oxygen carbon light reaction cycle").split()
+
+
+def tokens(messages: list[dict]) -> int:
+    return sum(len(m["content"]) for m in messages) // 4
+
+
+class StubModel:
+    """Deterministic stand-in for the OpenAI client; records the prompt of every call."""
+
+    def __init__(self, seed: int, summary_words: int):
+        self.rng = random.Random(seed)
+        self.summary_words = summary_words
+        self.chat_prompts: list[int] = []
+        self.summary_calls = 0
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self.create))
+
+    def create(self, messages, stream=False, **kwargs):
+        if stream:
+            self.chat_prompts.append(tokens(messages))
+            reply = " ".join(self.rng.choice(WORDS) for _ in range(150))
+            return iter([_delta(reply[i:i + 40]) for i in range(0, len(reply), 40)])
+        # Summary: previous summary, then the first words of each new message, capped
+        self.summary_calls += 1
+        text = messages[-1]["content"]
+        previous, _, new = text.partition("\n\nNew messages:\n")
+        words = previous.removeprefix("Existing summary:\n").replace("(none)", "").split()
+        for line in new.split("\n\n"):
+            words += line.split()[:12]
+        summary = " ".join(words[-self.summary_words:])
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=summary))])
+
+
+def _delta(text):
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=text))])
+
+
+def play(turns: int, threshold: int, args) -> tuple[list[int], StubModel, str | None]:
+    from werkzeug.security import generate_password_hash
+
+    import routes.openai_routes as openai_routes
+    from extensions import db
+    from factory import create_app
+    from models.canvas import Canvas
+    from models.chat import Chat
+    from models.user import User
+    from routes.auth import create_jwt_token
+    from services.jobs import job_queue
+
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tempfile.mkdtemp(), "chat.db"),
+        "SCHEMA_CHECK": True, "JOB_AUTOSTART": False, "RATE_LIMIT_ENABLED": False,
+        "CHAT_SUMMARY_THRESHOLD": threshold, "CHAT_RECENT_MESSAGES": args.recent,
+        "CHAT_SUMMARY_WORDS": args.summary_words, "CHAT_CHECKPOINT_INTERVAL": 60,
+    })
+    model = StubModel(args.seed, args.summary_words)
+    openai_routes._client = model
+    with app.app_context():
+        user = User(email="bench@example.com", username="bench", password_hash=generate_password_hash("x"))
+        db.session.add(user)
+        db.session.flush()
+        canvas = Canvas(user_id=user.id, name="Chat bench")
+        db.session.add(canvas)
+        db.session.commit()
+        auth = {"Authorization": f"Bearer {create_jwt_token(user)}"}
+        canvas_id = canvas.id
+
+    client = app.test_client()
+    rng = random.Random(args.seed + 1)
+    for _ in range(turns):
+        question = "Can you explain " + " ".join(rng.choice(WORDS) for _ in range(12)) + "?"
+        resp = client.post("/api/chat/stream", json={"message": question, "canvas_id": canvas_id}, headers=auth)
+        resp.get_data()
+        with app.app_context():
+            while job_queue.run_one():
+                pass
+    with app.app_context():
+        summary = db.session.query(Chat.summary).filter_by(canvas_id=canvas_id).scalar()
+    return model.chat_prompts, model, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--threshold", type=int, default=16)
+    parser.add_argument("--recent", type=int, default=8)
+    parser.add_argument("--summary-words", type=int, default=250)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    raw, _, _ = play(args.turns, 0, args)
+    rolled, model, summary = play(args.turns, args.threshold, args)
+
+    print(f"{'turn':>5s} {'raw history':>12s} {'summarized':>11s}   (prompt tokens, chars/4)")
+    shown = sorted({1, 2, 5} | set(range(10, args.turns + 1, 10)) | {args.turns})
+    for turn in shown:
+        if turn <= len(raw):
+            print(f"{turn:5d} {raw[turn - 1]:12d} {rolled[turn - 1]:11d}")
+    print(f"\nsummary calls: {model.summary_calls}, mean prompt: raw {sum(raw) // len(raw)}, "
+          f"summarized {sum(rolled) // len(rolled)}")
+
+    failures = []
+    if not summary or not model.summary_calls:
+        failures.append("no summary was written")
+    # Once the first summary exists, later prompts should stay within the band it set
+    settled = args.threshold // 2 + 2
+    if len(rolled) > 2 * settled:
+        band = max(rolled[settled:2 * settled])
+        late = max(rolled[2 * settled:])
+        if late > band * 1.15:
+            failures.append(f"summarized prompts keep growing: {band} -> {late} tokens")
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
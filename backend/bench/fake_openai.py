@@ -0,0 +1,190 @@
+"""Local stand-in for the OpenAI chat completions API, for load tests.
+
+Serves `POST /v1/chat/completions` with the same wire format as the real API:
+streamed requests get `chat.completion.chunk` SSE events followed by
+`data: [DONE]`, others a single `chat.completion` object. Latency is
+tunable: `--ttft` seconds before the first token, then `--tokens` tokens at
+`--tokens-per-sec` (with optional `--jitter`). Point the backend at it with
+
+    OPENAI_BASE_URL=http://127.0.0.1:8790/v1 OPENAI_API_KEY=fake
+
+The reply text is deterministic for a given prompt. Usage counts are
+estimated at 4 characters per token; `GET /stats` returns totals (requests,
+prompt and completion tokens) so a run can report what the model would have
+cost.
+
+    cd backend && python bench/fake_openai.py --port 8790 --ttft 0.3 --tokens-per-sec 60
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "photosynthesis converts light energy into chemical energy stored in glucose while "
+    "chlorophyll absorbs mostly blue and red light and the calvin cycle fixes carbon "
+    "dioxide inside the stroma of the chloroplast producing sugars for the plant"
+).split()
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeOpenAI:
+    """Settings and counters shared by all request handlers."""
+
+    def __init__(self, ttft: float = 0.3, tokens_per_sec: float = 60.0, tokens: int = 120, jitter: float = 0.0):
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.tokens = tokens
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self.totals = {"requests": 0, "streams": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def reply_words(self, messages: list, max_tokens: int | None) -> list[str]:
+        prompt = json.dumps(messages, sort_keys=True)
+        rng = random.Random(hashlib.sha256(prompt.encode()).digest())
+        n = min(self.tokens, max_tokens or self.tokens)
+        return [rng.choice(WORDS) + " " for _ in range(n)]
+
+    def card_reply(self) -> str:
+        return json.dumps({"title": "Light Into Sugar", "description": "Plants turn light, water and CO2 into glucose."})
+
+    def record(self, prompt_tokens: int, completion_tokens: int, streamed: bool) -> None:
+        with self._lock:
+            self.totals["requests"] += 1
+            self.totals["streams"] += int(streamed)
+            self.totals["prompt_tokens"] += prompt_tokens
+            self.totals["completion_tokens"] += completion_tokens
+
+    def sleep(self, seconds: float) -> None:
+        if self.jitter:
+            seconds *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake: FakeOpenAI = None  # set by make_server()
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status: int, obj: dict) -> None:
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            return self._json(200, dict(self.fake.totals))
+        return self._json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._json(400, {"error": {"message": "Invalid JSON"}})
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._json(404, {"error": {"message": "Not found"}})
+
+        messages = body.get("messages") or []
+        prompt_tokens = sum(estimate_tokens(str(m.get("content") or "")) for m in messages)
+        model = body.get("model") or "fake"
+        created = int(time.time())
+        completion_id = f"chatcmpl-fake-{created}-{threading.get_ident()}"
+
+        if not body.get("stream"):
+            last = str(messages[-1].get("content") or "") if messages else ""
+            content = self.fake.card_reply() if "JSON" in last else "".join(
+                self.fake.reply_words(messages, body.get("max_tokens"))).strip()
+            self.fake.sleep(self.fake.ttft + estimate_tokens(content) / max(self.fake.tokens_per_sec, 1e-6))
+            completion_tokens = estimate_tokens(content)
+            self.fake.record(prompt_tokens, completion_tokens, streamed=False)
+            return self._json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+
+        words = self.fake.reply_words(messages, body.get("max_tokens"))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(delta: dict, finish: str | None = None) -> bytes:
+            chunk = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            return f"data: {json.dumps(chunk)}\n\n".encode()
+
+        interval = 1.0 / self.fake.tokens_per_sec if self.fake.tokens_per_sec > 0 else 0.0
+        sent = 0
+        try:
+            self.fake.sleep(self.fake.ttft)
+            self.wfile.write(event({"role": "assistant", "content": ""}))
+            for word in words:
+                self.wfile.write(event({"content": word}))
+                self.wfile.flush()
+                sent += 1
+                self.fake.sleep(interval)
+            self.wfile.write(event({}, "stop"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except OSError:
+            pass  # client went away
+        finally:
+            self.fake.record(prompt_tokens, sent, streamed=True)
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8790, **settings) -> tuple[ThreadingHTTPServer, FakeOpenAI]:
+    fake = FakeOpenAI(**settings)
+    handler = type("BoundHandler", (Handler,), {"fake": fake})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, fake
+
+
+def start_in_thread(host: str = "127.0.0.1", port: int = 8790, **settings) -> tuple[ThreadingHTTPServer, FakeOpenAI]:
+    """Serve in a daemon thread (for load_test.py); stop with `server.shutdown()`."""
+    server, fake = make_server(host, port, **settings)
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server, fake
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--ttft", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=60.0)
+    parser.add_argument("--tokens", type=int, default=120, help="tokens per streamed reply")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- fraction applied to every delay")
+    args = parser.parse_args()
+
+    server, _ = make_server(args.host, args.port, ttft=args.ttft, tokens_per_sec=args.tokens_per_sec,
+                            tokens=args.tokens, jitter=args.jitter)
+    print(f"Fake OpenAI on http://{args.host}:{args.port}/v1 "
+          f"(ttft {args.ttft}s, {args.tokens_per_sec} tok/s, {args.tokens} tokens)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
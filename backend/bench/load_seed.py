@@ -0,0 +1,230 @@
+"""Synthetic data generator for load tests.
+
+Fills a database with users, canvases (one chat each), a mix of rectangle /
+text / image / line elements with order keys, groups, chat messages, purchases
+and token transactions, using chunked multi-row INSERTs. Users are
+`load<N>@example.com` and all share `--password`, which is what
+`bench/load_test.py` signs in with. Image elements point at a handful of
+small blobs written to the blob store.
+
+Targets `DATABASE_URL` (the app's `database.db` by default) unless
+`--database` is given, and refuses to seed a database that already has load
+users. Same `--seed`, same data.
+
+    cd backend && python bench/load_seed.py --database sqlite:////tmp/load.db \\
+        --users 50 --canvases 4 --elements 500 --groups 20 --messages 60
+"""
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+import zlib
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.chdir(BACKEND)
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET", "bench")
+
+CHUNK = 5000
+ELEMENT_TYPES = (("rectangle", 0.35), ("text", 0.4), ("image", 0.1), ("line", 0.15))
+COLORS = ("#FFFFFF", "#FDE68A", "#BFDBFE", "#FBCFE8", "#BBF7D0", "#E5E7EB")
+TOPICS = ("photosynthesis", "cell division", "plate tectonics", "supply and demand", "the french revolution",
+          "linear algebra", "neurons", "climate feedback loops", "probability", "the water cycle")
+
+
+def tiny_png(rgb: tuple[int, int, int], size: int = 16) -> bytes:
+    """A solid-colour PNG built with zlib, so seeding doesn't need Pillow."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    raw = b"".join(b"\x00" + bytes(rgb) * size for _ in range(size))
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw))
+            + chunk(b"IEND", b""))
+
+
+def insert_rows(table, rows: list[dict]) -> None:
+    from extensions import db
+
+    for i in range(0, len(rows), CHUNK):
+        db.session.execute(table.insert(), rows[i:i + CHUNK])
+
+
+def new_ids(table, after_id: int) -> list[int]:
+    """Ids inserted since `after_id`, in order (the generator is the only writer)."""
+    from sqlalchemy import select
+
+    from extensions import db
+
+    return db.session.execute(select(table.c.id).where(table.c.id > after_id).order_by(table.c.id)).scalars().all()
+
+
+def max_id(table) -> int:
+    from sqlalchemy import func, select
+
+    from extensions import db
+
+    return db.session.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar()
+
+
+def element_row(rng: random.Random, canvas_id: int, index: int, images: list[str], now: int) -> dict:
+    from services.blobs import blob_url
+    from services.order_keys import key_for_index
+
+    el_type = rng.choices([t for t, _ in ELEMENT_TYPES], [w for _, w in ELEMENT_TYPES])[0]
+    x, y = rng.uniform(-4000, 4000), rng.uniform(-3000, 3000)
+    row = {
+        "canvas_id": canvas_id, "type": el_type, "x": x, "y": y,
+        "width": rng.choice((120.0, 200.0, 280.0)), "height": rng.choice((60.0, 120.0, 160.0)),
+        "rotation": 0.0, "z_index": index, "order_key": key_for_index(index),
+        "bgcolor": rng.choice(COLORS), "data": {},
+        "line_start_x": None, "line_start_y": None, "line_end_x": None, "line_end_y": None,
+        "created_at": now, "updated_at": now,
+    }
+    if el_type == "text":
+        topic = rng.choice(TOPICS)
+        row["data"] = {"text": f"Notes on {topic}: key idea #{index} and how it connects to {rng.choice(TOPICS)}.",
+                       "fontSize": rng.choice((14, 16, 20))}
+    elif el_type == "image" and images:
+        sha = rng.choice(images)
+        row["data"] = {"blob": sha, "url": blob_url(sha)}
+    elif el_type == "line":
+        row["width"] = row["height"] = None
+        row.update(line_start_x=x, line_start_y=y,
+                   line_end_x=x + rng.uniform(-300, 300), line_end_y=y + rng.uniform(-300, 300))
+    return row
+
+
+def seed(args) -> dict:
+    from werkzeug.security import generate_password_hash
+
+    from extensions import db
+    from factory import create_app
+    from models.canvas import Canvas
+    from models.canvas_element import CanvasElement
+    from models.chat import Chat
+    from models.chat_message import ChatMessage
+    from models.element_group import ElementGroup, ElementGroupMember
+    from models.purchases import Purchase
+    from models.token_transactions import TokenTransaction
+    from models.user import User
+    from services.blobs import store_bytes
+
+    overrides = {"SCHEMA_CHECK": True, "JOB_AUTOSTART": False}
+    if args.database:
+        overrides["SQLALCHEMY_DATABASE_URI"] = args.database
+    app = create_app(overrides)
+    rng = random.Random(args.seed)
+    now = int(time.time())
+    counts = {}
+    with app.app_context():
+        if User.query.filter_by(email="load0@example.com").first():
+            sys.exit("This database already has load users; seed a fresh one.")
+
+        images = [store_bytes(tiny_png((rng.randrange(256), rng.randrange(256), rng.randrange(256)))).sha256
+                  for _ in range(8)]
+        password_hash = generate_password_hash(args.password)
+
+        users_table = User.__table__
+        before = max_id(users_table)
+        insert_rows(users_table, [
+            {"email": f"load{i}@example.com", "username": f"load{i}", "password_hash": password_hash,
+             "token_balance": 50000}
+            for i in range(args.users)
+        ])
+        user_ids = new_ids(users_table, before)
+        counts["users"] = len(user_ids)
+
+        canvas_table = Canvas.__table__
+        before = max_id(canvas_table)
+        insert_rows(canvas_table, [
+            {"user_id": uid, "name": f"{rng.choice(TOPICS).title()} {c + 1}",
+             "created_at": now - rng.randrange(90 * 86400), "updated_at": now - rng.randrange(86400),
+             "camera_x": 0.0, "camera_y": 0.0, "camera_zoom_percentage": 100.0, "revision": 0}
+            for uid in user_ids for c in range(args.canvases)
+        ])
+        canvas_ids = new_ids(canvas_table, before)
+        counts["canvases"] = len(canvas_ids)
+
+        chat_table = Chat.__table__
+        before = max_id(chat_table)
+        insert_rows(chat_table, [{"canvas_id": cid, "created_at": now, "updated_at": now} for cid in canvas_ids])
+        chat_ids = new_ids(chat_table, before)
+
+        el_table = CanvasElement.__table__
+        grp_table = ElementGroup.__table__
+        counts.update(elements=0, groups=0, group_members=0, chat_messages=0)
+        for canvas_id, chat_id in zip(canvas_ids, chat_ids):
+            before = max_id(el_table)
+            insert_rows(el_table, [element_row(rng, canvas_id, i, images, now) for i in range(args.elements)])
+            element_ids = new_ids(el_table, before)
+            counts["elements"] += len(element_ids)
+
+            before = max_id(grp_table)
+            insert_rows(grp_table, [
+                {"canvas_id": canvas_id, "name": f"Group {g + 1}", "created_at": now, "updated_at": now}
+                for g in range(args.groups)
+            ])
+            group_ids = new_ids(grp_table, before)
+            members = [
+                {"group_id": gid, "element_id": eid}
+                for gid in group_ids
+                for eid in rng.sample(element_ids, min(args.members, len(element_ids)))
+            ]
+            insert_rows(ElementGroupMember.__table__, members)
+            counts["groups"] += len(group_ids)
+            counts["group_members"] += len(members)
+
+            start = now - args.messages * 60
+            insert_rows(ChatMessage.__table__, [
+                {"chat_id": chat_id, "is_response": bool(m % 2), "is_liked": False, "is_disliked": False,
+                 "created_at": start + m * 60,
+                 "text": (f"Can you explain {rng.choice(TOPICS)}?" if m % 2 == 0 else
+                          " ".join(rng.choice(TOPICS) for _ in range(rng.randrange(20, 120))))}
+                for m in range(args.messages)
+            ])
+            counts["chat_messages"] += args.messages
+            db.session.commit()
+
+        insert_rows(Purchase.__table__, [
+            {"user_id": uid, "product_name": "50,000 Token Pack", "tokens_given": 50000, "price_usd": 4.99,
+             "payment_method": "demo", "status": "completed", "created_at": now - rng.randrange(30 * 86400)}
+            for uid in user_ids for _ in range(args.purchases)
+        ])
+        insert_rows(TokenTransaction.__table__, [
+            {"user_id": uid, "change_amount": -rng.randrange(50, 2000), "description": "AI usage",
+             "created_at": now - rng.randrange(30 * 86400)}
+            for uid in user_ids for _ in range(args.transactions)
+        ])
+        counts["purchases"] = len(user_ids) * args.purchases
+        counts["token_transactions"] = len(user_ids) * args.transactions
+        db.session.commit()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", help="SQLAlchemy URL (default: DATABASE_URL / the app's database.db)")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--canvases", type=int, default=3, help="per user")
+    parser.add_argument("--elements", type=int, default=300, help="per canvas")
+    parser.add_argument("--groups", type=int, default=10, help="per canvas")
+    parser.add_argument("--members", type=int, default=8, help="elements per group")
+    parser.add_argument("--messages", type=int, default=40, help="chat messages per canvas")
+    parser.add_argument("--purchases", type=int, default=2, help="per user")
+    parser.add_argument("--transactions", type=int, default=30, help="token transactions per user")
+    parser.add_argument("--password", default="loadtest")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = seed(args)
+    print(", ".join(f"{v} {k}" for k, v in counts.items()) + f" in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
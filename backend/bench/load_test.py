@@ -0,0 +1,439 @@
+"""Scenario load test: replay user flows at a fixed concurrency and report latency percentiles.
+
+Each virtual user (one process each, so the load generator isn't GIL-bound)
+signs in as a seeded `load<N>@example.com` user and loops over weighted flows:
+
+- `open`    list canvases, then fetch one canvas, its elements, groups and chat
+- `drag`    a burst of geometry PATCHes on one element (`--drag-steps`, `--drag-interval`)
+- `reorder` move an element above another with `place_after`
+- `chat`    stream a chat reply to the end (also records time to first token)
+
+Results per endpoint (and per flow) are count, errors by status, throughput
+and p50/p95/p99, written as JSON with the git commit so runs can be compared
+(`--compare old.json` prints the deltas).
+
+Without `--url` the runner starts `bench/fake_openai.py` in-process and a
+gunicorn server on `--database` pointed at it (rate limits off unless
+`--rate-limits`). Seed the database first with `bench/load_seed.py`.
+
+    cd backend && python bench/load_seed.py --database sqlite:////tmp/load.db
+    cd backend && python bench/load_test.py --database sqlite:////tmp/load.db \\
+        --concurrency 16 --duration 30 --mix open=3,drag=6,reorder=2,chat=1 --out before.json
+"""
+import argparse
+import http.client
+import json
+import math
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.chdir(BACKEND)
+
+DEFAULT_MIX = "open=3,drag=6,reorder=2,chat=1"
+CHAT_PROMPTS = (
+    "Summarize this canvas in three bullet points.",
+    "Explain the connection between these two ideas.",
+    "Give me a quiz question about this topic.",
+    "What should I study next?",
+)
+
+
+# ---------------------------
+# Virtual user
+# ---------------------------
+class VirtualUser:
+    def __init__(self, host: str, port: int, email: str, password: str, warmup_until: float, seed: int):
+        self.host, self.port = host, port
+        self.email, self.password = email, password
+        self.warmup_until = warmup_until
+        self.rng = random.Random(seed)
+        self.conn = self._connect()
+        self.token = None
+        self.canvases: list[int] = []
+        self.elements: dict[int, list[int]] = {}
+        self.records: list[tuple[str, float, int]] = []  # (label, seconds, status)
+
+    def _connect(self):
+        return http.client.HTTPConnection(self.host, self.port, timeout=60)
+
+    def record(self, label: str, seconds: float, status: int) -> None:
+        if time.time() >= self.warmup_until:
+            self.records.append((label, seconds, status))
+
+    def request(self, label: str, method: str, path: str, body=None):
+        """Send one request; returns (status, parsed JSON or None). Status 0 means a connection error."""
+        headers = {"Accept-Encoding": "identity"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        start = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=payload, headers=headers)
+            resp = self.conn.getresponse()
+            data = resp.read()
+            status = resp.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = self._connect()
+            self.record(label, time.perf_counter() - start, 0)
+            return 0, None
+        self.record(label, time.perf_counter() - start, status)
+        try:
+            return status, json.loads(data) if data else None
+        except ValueError:
+            return status, None
+
+    def sign_in(self) -> bool:
+        status, data = self.request("POST /api/auth/signin", "POST", "/api/auth/signin",
+                                    {"email": self.email, "password": self.password})
+        if status != 200 or not data:
+            return False
+        self.token = data["token"]
+        return True
+
+    def pick_canvas(self) -> int | None:
+        return self.rng.choice(self.canvases) if self.canvases else None
+
+    # ---------------------------
+    # Flows
+    # ---------------------------
+    def flow_open(self):
+        status, canvases = self.request("GET /api/canvas/canvases", "GET", "/api/canvas/canvases")
+        if status == 200 and isinstance(canvases, list):
+            self.canvases = [c["id"] for c in canvases]
+        canvas_id = self.pick_canvas()
+        if canvas_id is None:
+            return
+        self.request("GET /api/canvas/canvases/<id>", "GET", f"/api/canvas/canvases/{canvas_id}")
+        status, elements = self.request("GET /api/canvas/elements", "GET", f"/api/canvas/elements?canvas_id={canvas_id}")
+        if status == 200 and isinstance(elements, list):
+            self.elements[canvas_id] = [e["id"] for e in elements]
+        self.request("GET /api/canvas/groups", "GET", f"/api/canvas/groups?canvas_id={canvas_id}")
+        self.request("GET /api/canvas/chat", "GET", f"/api/canvas/chat?canvas_id={canvas_id}")
+
+    def _known_element(self) -> tuple[int, list[int]] | None:
+        choices = [cid for cid, ids in self.elements.items() if ids]
+        if not choices:
+            return None
+        canvas_id = self.rng.choice(choices)
+        return canvas_id, self.elements[canvas_id]
+
+    def flow_drag(self, steps: int, interval: float):
+        target = self._known_element()
+        if target is None:
+            return self.flow_open()
+        element_id = self.rng.choice(target[1])
+        x, y = self.rng.uniform(-2000, 2000), self.rng.uniform(-2000, 2000)
+        for _ in range(steps):
+            x += self.rng.uniform(-15, 15)
+            y += self.rng.uniform(-15, 15)
+            self.request("PATCH /api/canvas/elements/<id> (geometry)", "PATCH",
+                         f"/api/canvas/elements/{element_id}", {"x": x, "y": y})
+            if interval:
+                time.sleep(interval)
+
+    def flow_reorder(self):
+        target = self._known_element()
+        if target is None or len(target[1]) < 2:
+            return self.flow_open()
+        element_id, anchor_id = self.rng.sample(target[1], 2)
+        self.request("PATCH /api/canvas/elements/<id> (reorder)", "PATCH",
+                     f"/api/canvas/elements/{element_id}", {"place_after": anchor_id})
+
+    def flow_chat(self):
+        canvas_id = self.pick_canvas()
+        if canvas_id is None:
+            return self.flow_open()
+        body = json.dumps({"message": self.rng.choice(CHAT_PROMPTS), "canvas_id": canvas_id})
+        headers = {"Authorization": f"Bearer {self.token}", "Content-Type": "application/json",
+                   "Accept": "text/event-stream"}
+        start = time.perf_counter()
+        first_token = None
+        try:
+            self.conn.request("POST", "/api/chat/stream", body=body, headers=headers)
+            resp = self.conn.getresponse()
+            status = resp.status
+            if status == 200:
+                while True:
+                    line = resp.readline()
+                    if not line:
+                        break
+                    if line.startswith(b"data:"):
+                        if b"[DONE]" in line:
+                            break
+                        # The opening `event: stream` data line carries the stream id, not a token
+                        if first_token is None and b'"content"' in line:
+                            first_token = time.perf_counter()
+            resp.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = self._connect()
+            status = 0
+        if first_token is not None:
+            self.record("chat: first token", first_token - start, status)
+        self.record("POST /api/chat/stream", time.perf_counter() - start, status)
+
+
+def run_user(args) -> list[tuple[str, float, int]]:
+    """One virtual user: sign in, then run weighted flows until the deadline."""
+    url, email, password, mix, options, warmup_until, deadline, seed = args
+    parsed = urllib.parse.urlparse(url)
+    user = VirtualUser(parsed.hostname, parsed.port or 80, email, password, warmup_until, seed)
+    if not user.sign_in():
+        return [("POST /api/auth/signin", 0.0, -1)]
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    while time.time() < deadline:
+        flow = user.rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        if flow == "drag":
+            user.flow_drag(options["drag_steps"], options["drag_interval"])
+        else:
+            getattr(user, f"flow_{flow}")()
+        user.record(f"flow: {flow}", time.perf_counter() - start, 200)
+        if options["think"]:
+            time.sleep(user.rng.uniform(0, 2 * options["think"]))
+    return user.records
+
+
+# ---------------------------
+# Reporting
+# ---------------------------
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(records: list[tuple[str, float, int]], duration: float) -> dict:
+    by_label: dict[str, dict] = {}
+    for label, seconds, status in records:
+        entry = by_label.setdefault(label, {"ok": [], "errors": {}})
+        if 200 <= status < 400:
+            entry["ok"].append(seconds)
+        else:
+            key = str(status) if status > 0 else "connection"
+            entry["errors"][key] = entry["errors"].get(key, 0) + 1
+    out = {}
+    for label in sorted(by_label):
+        ok = sorted(by_label[label]["ok"])
+        errors = by_label[label]["errors"]
+        out[label] = {
+            "count": len(ok),
+            "errors": sum(errors.values()),
+            "errors_by_status": errors,
+            "rps": round(len(ok) / duration, 2) if duration else 0.0,
+            "p50_ms": round(percentile(ok, 50) * 1000, 2),
+            "p95_ms": round(percentile(ok, 95) * 1000, 2),
+            "p99_ms": round(percentile(ok, 99) * 1000, 2),
+            "max_ms": round(ok[-1] * 1000, 2) if ok else 0.0,
+        }
+    return out
+
+
+def git_commit() -> str | None:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=BACKEND, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, cwd=BACKEND).stdout.strip()
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(report: dict) -> None:
+    print(f"{'endpoint / flow':48s} {'count':>7s} {'err':>5s} {'rps':>8s} {'p50':>8s} {'p95':>8s} {'p99':>8s}")
+    for section in ("endpoints", "flows"):
+        for label, s in report[section].items():
+            print(f"{label:48s} {s['count']:7d} {s['errors']:5d} {s['rps']:8.1f} "
+                  f"{s['p50_ms']:8.1f} {s['p95_ms']:8.1f} {s['p99_ms']:8.1f}")
+    t = report["totals"]
+    print(f"\n{t['requests']} requests, {t['errors']} errors, {t['rps']:.1f} req/s over {report['meta']['duration_s']}s")
+
+
+def print_comparison(report: dict, baseline: dict) -> None:
+    print(f"\nvs {baseline['meta'].get('commit')} ({baseline['meta'].get('started')}):")
+    print(f"{'endpoint / flow':48s} {'p50':>16s} {'p95':>16s} {'p99':>16s} {'rps':>14s}")
+    for section in ("endpoints", "flows"):
+        for label, s in report[section].items():
+            old = baseline.get(section, {}).get(label)
+            if not old:
+                continue
+            cells = []
+            for key in ("p50_ms", "p95_ms", "p99_ms", "rps"):
+                change = (s[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+                cells.append(f"{old[key]:.1f}->{s[key]:.1f} {change:+.0f}%")
+            print(f"{label:48s} " + " ".join(f"{c:>16s}" for c in cells))
+
+
+# ---------------------------
+# Local server
+# ---------------------------
+def wait_ready(url: str, timeout: float = 30) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/readyz", timeout=1) as r:
+                if r.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def start_server(args):
+    """Start the fake OpenAI server and gunicorn; returns (url, cleanup, fake)."""
+    from fake_openai import start_in_thread
+
+    fake_server, fake = start_in_thread(port=args.fake_port, ttft=args.ttft,
+                                        tokens_per_sec=args.tokens_per_sec, tokens=args.tokens)
+    env = {
+        **os.environ,
+        "DATABASE_URL": args.database or os.environ.get("DATABASE_URL", "sqlite:///database.db"),
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.fake_port}/v1",
+        "OPENAI_API_KEY": "fake",
+        "JWT_SECRET": os.environ.get("JWT_SECRET", "load-test-secret"),
+        "RATE_LIMIT_ENABLED": "1" if args.rate_limits else "0",
+        "WEB_CONCURRENCY": str(args.workers),
+        "WEB_THREADS": str(args.threads),
+        "BIND": f"127.0.0.1:{args.port}",
+        "PYTHONWARNINGS": "ignore",
+    }
+    log = tempfile.NamedTemporaryFile(prefix="load-test-server-", suffix=".log", delete=False)
+    server = subprocess.Popen(["gunicorn", "-c", "gunicorn.conf.py"], cwd=BACKEND, env=env,
+                              stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{args.port}"
+
+    def cleanup():
+        server.terminate()
+        server.wait(30)
+        fake_server.shutdown()
+
+    try:
+        wait_ready(url)
+    except RuntimeError:
+        cleanup()
+        raise RuntimeError(f"server did not become ready; see {log.name}")
+    return url, cleanup, fake
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("open", "drag", "reorder", "chat"):
+            raise SystemExit(f"Unknown flow '{name}' in --mix")
+        mix[name] = float(weight or 1)
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="run against this server instead of starting one")
+    parser.add_argument("--database", help="SQLAlchemy URL for the started server (seeded by load_seed.py)")
+    parser.add_argument("--users", type=int, default=20, help="seeded users to sign in as")
+    parser.add_argument("--password", default="loadtest")
+    parser.add_argument("--concurrency", type=int, default=16, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds discarded at the start")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="flow weights, e.g. open=3,drag=6,reorder=2,chat=1")
+    parser.add_argument("--drag-steps", type=int, default=20)
+    parser.add_argument("--drag-interval", type=float, default=0.03, help="seconds between drag PATCHes")
+    parser.add_argument("--think", type=float, default=0.2, help="mean pause between flows")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON report to diff against")
+    server = parser.add_argument_group("started server")
+    server.add_argument("--port", type=int, default=8798)
+    server.add_argument("--workers", type=int, default=2)
+    server.add_argument("--threads", type=int, default=16)
+    server.add_argument("--rate-limits", action="store_true", help="keep rate limiting on")
+    server.add_argument("--fake-port", type=int, default=8790)
+    server.add_argument("--ttft", type=float, default=0.3, help="fake model: seconds to first token")
+    server.add_argument("--tokens-per-sec", type=float, default=60.0)
+    server.add_argument("--tokens", type=int, default=120, help="fake model: tokens per reply")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    cleanup, fake = None, None
+    url = args.url.rstrip("/") if args.url else None
+    if url is None:
+        url, cleanup, fake = start_server(args)
+    try:
+        start = time.time()
+        warmup_until = start + args.warmup
+        deadline = warmup_until + args.duration
+        options = {"drag_steps": args.drag_steps, "drag_interval": args.drag_interval, "think": args.think}
+        jobs = [
+            (url, f"load{i % args.users}@example.com", args.password, mix, options, warmup_until, deadline,
+             args.seed * 1000 + i)
+            for i in range(args.concurrency)
+        ]
+        with multiprocessing.get_context("spawn").Pool(args.concurrency) as pool:
+            results = pool.map(run_user, jobs)
+    finally:
+        if cleanup:
+            cleanup()
+
+    if any(r == [("POST /api/auth/signin", 0.0, -1)] for r in results):
+        sys.exit("Sign-in failed; seed the database with bench/load_seed.py (same --password).")
+    records = [rec for r in results for rec in r]
+    endpoint_records = [r for r in records if not r[0].startswith("flow: ")]
+    requests_only = [r for r in endpoint_records if not r[0].startswith("chat: ")]
+    errors = sum(1 for r in requests_only if not 200 <= r[2] < 400)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "started": datetime.fromtimestamp(start, timezone.utc).isoformat(timespec="seconds"),
+            "url": args.url or "local",
+            "duration_s": args.duration,
+            "concurrency": args.concurrency,
+            "mix": mix,
+            "drag_steps": args.drag_steps,
+            "think_s": args.think,
+            "cores": os.cpu_count(),
+        },
+        "endpoints": summarize(endpoint_records, args.duration),
+        "flows": summarize([(r[0][len("flow: "):], r[1], r[2]) for r in records if r[0].startswith("flow: ")],
+                           args.duration),
+        "totals": {
+            "requests": len(requests_only),
+            "errors": errors,
+            "rps": round((len(requests_only) - errors) / args.duration, 2),
+        },
+    }
+    if fake is not None:
+        report["meta"]["fake_openai"] = {"ttft_s": args.ttft, "tokens_per_sec": args.tokens_per_sec,
+                                         "tokens": args.tokens, **fake.totals}
+
+    print_table(report)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(report, json.load(f))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.out}")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
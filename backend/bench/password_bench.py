@@ -0,0 +1,158 @@
+"""Latency of other endpoints during a login storm, with and without the password pool.
+
+Runs the app on a threaded Werkzeug server in this process (one app process,
+like one gunicorn worker) and measures `GET /api/auth/me` from a single probe
+client, first alone and then while `--storm` client processes hammer
+`POST /api/auth/signin`. This happens twice: with `PASSWORD_WORKERS=0`
+(hashing on the request threads, as before) and with the pool.
+
+It exits non-zero if, with the pool, the probe's p95 during the storm is more
+than `--max-slowdown` times its idle p95 (plus 20 ms of slack).
+
+    cd backend && python bench/password_bench.py --storm 16 --duration 5
+"""
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.chdir(BACKEND)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET", "password-bench-secret-0123456789")
+
+EMAIL, PASSWORD = "bench@example.com", "correct horse battery"
+
+
+def storm(args) -> list[tuple[int, float]]:
+    """Sign in until the deadline; return (status, seconds) per request (status 0 = connection error)."""
+    port, deadline = args
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    body = json.dumps({"email": EMAIL, "password": PASSWORD})
+    out = []
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request("POST", "/api/auth/signin", body=body, headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            resp.read()
+            out.append((resp.status, time.perf_counter() - start))
+            if resp.status == 503:
+                time.sleep(float(resp.getheader("Retry-After") or 1) / 10)
+        except (OSError, http.client.HTTPException):
+            out.append((0, time.perf_counter() - start))
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    return out
+
+
+def probe(port: int, token: str, until: float) -> list[float]:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    latencies = []
+    while time.time() < until:
+        start = time.perf_counter()
+        conn.request("GET", "/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+        resp = conn.getresponse()
+        resp.read()
+        if resp.status == 200:
+            latencies.append(time.perf_counter() - start)
+        time.sleep(0.02)
+    return latencies
+
+
+def pct(values: list[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run(workers: int, args) -> dict:
+    from werkzeug.serving import make_server
+
+    from extensions import db
+    from factory import create_app
+    from models.user import User
+    from routes.auth import create_jwt_token
+    from services.passwords import passwords
+
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tempfile.mkdtemp(), "passwords.db"),
+        "SCHEMA_CHECK": True, "JOB_AUTOSTART": False, "RATE_LIMIT_ENABLED": False,
+        "MAX_INFLIGHT_REQUESTS": 0, "PASSWORD_WORKERS": workers, "PASSWORD_QUEUE_DEPTH": args.queue_depth,
+    })
+    with app.app_context():
+        user = User(email=EMAIL, username="bench", password_hash=passwords.hash(PASSWORD))
+        db.session.add(user)
+        db.session.commit()
+        token = create_jwt_token(user)
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    ctx = multiprocessing.get_context("spawn")
+    try:
+        with ctx.Pool(args.storm) as pool:
+            # Start the client processes before measuring anything
+            pool.map(abs, range(args.storm * 4), chunksize=1)
+            idle = probe(args.port, token, time.time() + args.duration)
+            deadline = time.time() + args.duration
+            result = pool.map_async(storm, [(args.port, deadline)] * args.storm, chunksize=1)
+            # Let the storm build up before measuring
+            time.sleep(min(1.0, args.duration / 4))
+            busy = probe(args.port, token, deadline)
+            signins = [r for chunk in result.get() for r in chunk]
+    finally:
+        server.shutdown()
+        passwords.shutdown()
+
+    ok = [s for status, s in signins if status == 200]
+    return {
+        "idle_p50": pct(idle, 0.5), "idle_p95": pct(idle, 0.95),
+        "storm_p50": pct(busy, 0.5), "storm_p95": pct(busy, 0.95), "storm_max": max(busy, default=float("nan")),
+        "signins": len(ok) / args.duration, "signin_p50": pct(ok, 0.5),
+        "rejected": sum(1 for status, _ in signins if status == 503),
+        "errors": sum(1 for status, _ in signins if status not in (200, 503)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--storm", type=int, default=16, help="concurrent sign-in clients")
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--workers", type=int, default=2, help="PASSWORD_WORKERS for the pooled run")
+    parser.add_argument("--queue-depth", type=int, default=16)
+    parser.add_argument("--max-slowdown", type=float, default=3.0)
+    parser.add_argument("--port", type=int, default=8798)
+    args = parser.parse_args()
+
+    results = {"inline": run(0, args), f"pool ({args.workers})": run(args.workers, args)}
+
+    ms = 1000
+    print(f"{'hashing':>10s} {'me idle p50/p95':>17s} {'me storm p50/p95/max':>22s} "
+          f"{'sign-ins/s':>11s} {'sign-in p50':>12s} {'503s':>6s} {'errors':>7s}")
+    for name, r in results.items():
+        print(f"{name:>10s} {r['idle_p50'] * ms:8.1f}/{r['idle_p95'] * ms:<8.1f} "
+              f"{r['storm_p50'] * ms:8.1f}/{r['storm_p95'] * ms:.1f}/{r['storm_max'] * ms:<6.1f} "
+              f"{r['signins']:11.1f} {r['signin_p50'] * ms:10.0f}ms {r['rejected']:6d} {r['errors']:7d}")
+
+    pooled = results[f"pool ({args.workers})"]
+    limit = pooled["idle_p95"] * args.max_slowdown + 0.020
+    if pooled["storm_p95"] > limit or pooled["errors"]:
+        print(f"FAIL: /api/auth/me p95 during the storm {pooled['storm_p95'] * ms:.1f} ms "
+              f"(limit {limit * ms:.1f} ms), {pooled['errors']} sign-in errors")
+        sys.exit(1)
+    print(f"\nWith the pool, /api/auth/me p95 during the storm is {pooled['storm_p95'] * ms:.1f} ms "
+          f"(limit {limit * ms:.1f} ms).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""Query-budget check: run every route against a seeded database and count SQL.
+
+Each route in ROUTES declares the most statements one request may issue. The
+whole table runs twice, against a small and a large seeded canvas; a route
+fails if it goes over budget, or if it issues more statements on the large
+canvas than on the small one (an N+1). Failures print the statements of the
+offending request. A route registered in the app without an entry here also
+fails, so new endpoints have to declare a budget.
+
+    cd backend && python bench/query_budget.py          # exit status 1 on failure
+    cd backend && python bench/query_budget.py -v       # print every statement
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+from dataclasses import dataclass, field
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.chdir(BACKEND)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET", "query-budget-bench-secret-0123456789")
+os.environ.setdefault("PYTHONWARNINGS", "ignore")
+
+from sqlalchemy import event  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+# (elements, groups, members per group, chat messages, purchases)
+SIZES = {"small": (5, 2, 2, 3, 2), "large": (300, 40, 6, 80, 30)}
+
+
+@dataclass
+class Route:
+    endpoint: str
+    method: str
+    path: str
+    budget: int
+    json: dict | None = None
+    data: dict | None = None
+    stream: bool = False  # read only the first chunk (endless SSE)
+    headers: dict = field(default_factory=dict)
+
+
+# Paths and bodies are formatted with the seeded ids: canvas, spare, element, group, reply, sha, thumbnail
+ROUTES = [
+    Route("home", "GET", "/", 0),
+    Route("health_bp.healthz", "GET", "/healthz", 0),
+    Route("health_bp.readyz", "GET", "/readyz", 1),
+    Route("health_bp.prometheus_metrics", "GET", "/metrics", 0),
+    Route("auth_bp.signup", "POST", "/api/auth/signup", 2,
+          json={"email": "new@example.com", "username": "new", "password": "secret123"}),
+    Route("auth_bp.signin", "POST", "/api/auth/signin", 1,
+          json={"email": "bench@example.com", "password": "secret123"}),
+    Route("auth_bp.google_signin", "POST", "/api/auth/google", 0, json={}),
+    Route("auth_bp.get_current_user", "GET", "/api/auth/me", 1),
+    Route("auth_bp.update_profile", "POST", "/api/auth/update_profile", 2, json={"username": "renamed"}),
+    Route("canvas.list_canvases", "GET", "/api/canvas/canvases?limit=20", 2),
+    Route("canvas.create_canvas", "POST", "/api/canvas/canvases", 3, json={"name": "Fresh"}),
+    Route("canvas.get_canvas", "GET", "/api/canvas/canvases/{canvas}", 2),
+    Route("canvas.update_canvas", "PATCH", "/api/canvas/canvases/{canvas}", 3, json={"name": "Renamed"}),
+    Route("canvas.get_canvas_tile", "GET", "/api/canvas/canvases/{canvas}/tiles/0/0/0", 3),
+    Route("canvas.get_canvas_thumbnail", "GET", "{thumbnail}", 3),
+    Route("canvas.canvas_change_feed", "GET", "/api/canvas/canvases/{canvas}/changes", 2, stream=True),
+    Route("canvas.list_canvas_elements", "GET", "/api/canvas/elements?canvas_id={canvas}", 4),
+    Route("canvas.create_canvas_element", "POST", "/api/canvas/elements", 6,
+          json={"canvas_id": "{canvas}", "type": "text", "x": 1, "y": 2, "data": {"content": "hi"}}),
+    Route("canvas.update_canvas_element", "PATCH", "/api/canvas/elements/{element}", 5,
+          json={"bgcolor": "#ffeeaa", "data": {"content": "edited"}}),
+    Route("canvas.list_groups", "GET", "/api/canvas/groups?canvas_id={canvas}", 4),
+    Route("canvas.create_group", "POST", "/api/canvas/groups", 7,
+          json={"canvas_id": "{canvas}", "name": "G", "element_ids": "{elements}"}),
+    Route("canvas.update_group", "PATCH", "/api/canvas/groups/{group}", 8,
+          json={"name": "G2", "element_ids": "{elements}"}),
+    Route("canvas.get_chat_for_canvas", "GET", "/api/canvas/chat?canvas_id={canvas}", 4),
+    Route("openai_bp.chat_stream", "POST", "/api/chat/stream", 10,
+          json={"message": "hello", "canvas_id": "{canvas}"}),
+    Route("openai_bp.resume_chat_stream", "GET", "/api/chat/stream/{reply}.gone?after=3", 2),
+    Route("canvas.export_canvas", "GET", "/api/canvas/canvases/{canvas}/export", 10),
+    Route("canvas.duplicate_canvas_route", "POST", "/api/canvas/canvases/{canvas}/duplicate", 10,
+          json={"include_chat": True}),
+    Route("canvas.import_canvas_route", "POST", "/api/canvas/canvases/import", 9),
+    Route("search_bp.search_route", "GET", "/api/search?q=m1", 2),
+    Route("payments_bp.get_purchase_history", "GET", "/api/payments/history", 2),
+    Route("payments_bp.buy_token_pack", "POST", "/api/payments/buy", 4, json={"tokens": 100, "price_usd": 1.0}),
+    Route("payments_bp.spend_tokens", "POST", "/api/payments/spend", 3, json={"amount": 10}),
+    Route("blobs_bp.upload_blob", "POST", "/api/blobs", 5),
+    Route("blobs_bp.get_blob", "GET", "/api/blobs/{sha}", 1),
+    Route("blobs_bp.get_blob_thumbnail", "GET", "/api/blobs/{sha}/thumbnail?size=64", 1),
+    Route("canvas.delete_group", "DELETE", "/api/canvas/groups/{group}", 7),
+    Route("canvas.delete_canvas_element", "DELETE", "/api/canvas/elements/{element}", 5),
+    Route("canvas.delete_canvas", "DELETE", "/api/canvas/canvases/{spare}", 4),
+]
+
+
+class StatementLog:
+    """Collects statements executed on this thread, or by a chat run it started, while recording."""
+
+    def __init__(self, engine):
+        self.thread = threading.get_ident()
+        self.recording = False
+        self.statements: list[str] = []
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.recording and (threading.get_ident() == self.thread
+                               or threading.current_thread().name.startswith("chat-")):
+            self.statements.append(" ".join(statement.split()))
+
+    def start(self):
+        self.statements = []
+        self.recording = True
+
+    def stop(self) -> list[str]:
+        self.recording = False
+        return self.statements
+
+
+def tiny_png() -> bytes:
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8), (200, 40, 40)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class FakeOpenAI:
+    """Stands in for the OpenAI client: streams two chunks."""
+
+    def __init__(self):
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        def delta(text):
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=text))])
+        return iter([delta("Hello"), delta(" there")])
+
+
+def seed(size: tuple) -> dict:
+    from extensions import db
+    from models.canvas import Canvas
+    from models.canvas_element import CanvasElement
+    from models.chat import Chat
+    from models.chat_message import ChatMessage
+    from models.element_group import ElementGroup, ElementGroupMember
+    from models.purchases import Purchase
+    from models.user import User
+    from routes.auth import create_jwt_token
+    from services.blobs import store_bytes
+    from services.order_keys import key_for_index
+    from services.thumbnails import thumbnail_url
+
+    n_elements, n_groups, per_group, n_messages, n_purchases = size
+    now = int(time.time())
+    user = User(email="bench@example.com", username="bench", password_hash=generate_password_hash("secret123"))
+    db.session.add(user)
+    db.session.flush()
+    canvas = Canvas(user_id=user.id, name="Seeded")
+    spare = Canvas(user_id=user.id, name="Spare")
+    db.session.add_all([canvas, spare])
+    db.session.flush()
+    db.session.execute(CanvasElement.__table__.insert(), [
+        {"canvas_id": canvas.id, "type": "text", "x": i * 10.0, "y": i * 5.0, "width": 80.0, "height": 30.0,
+         "rotation": 0.0, "z_index": i, "order_key": key_for_index(i), "data": {"content": f"n{i}"},
+         "created_at": now, "updated_at": now}
+        for i in range(n_elements)
+    ])
+    element_ids = [e for (e,) in db.session.query(CanvasElement.id).filter_by(canvas_id=canvas.id).order_by(CanvasElement.id)]
+    for gi in range(n_groups):
+        grp = ElementGroup(canvas_id=canvas.id, name=f"g{gi}")
+        db.session.add(grp)
+        db.session.flush()
+        for eid in element_ids[gi:gi + per_group]:
+            db.session.add(ElementGroupMember(group_id=grp.id, element_id=eid))
+    # Timestamps in the past, so a chat request always updates the chat row
+    chat = Chat(canvas_id=canvas.id, created_at=now - 3600, updated_at=now - 3600)
+    db.session.add(chat)
+    db.session.flush()
+    replies = [ChatMessage(chat_id=chat.id, text=f"m{mi}", is_response=bool(mi % 2)) for mi in range(n_messages)]
+    db.session.add_all(replies)
+    for pi in range(n_purchases):
+        db.session.add(Purchase(user_id=user.id, product_name="pack", tokens_given=100, price_usd=1.0,
+                                payment_method="demo", status="completed"))
+    user.token_balance = 1000
+    db.session.commit()
+    blob = store_bytes(tiny_png(), user.id)
+    first_group = db.session.query(ElementGroup.id).filter_by(canvas_id=canvas.id).order_by(ElementGroup.id).first()
+    return {
+        "token": create_jwt_token(user),
+        "canvas": canvas.id,
+        "spare": spare.id,
+        "element": element_ids[-1],
+        "elements": element_ids,
+        "group": first_group[0] if first_group else 0,
+        "reply": replies[-1].id if replies else 0,
+        "thumbnail": thumbnail_url(canvas.id, canvas.revision),
+        "sha": blob.sha256,
+    }
+
+
+def _fill(value, ids: dict):
+    if isinstance(value, str):
+        if value.startswith("{") and value.endswith("}") and value[1:-1] in ids:
+            return ids[value[1:-1]]
+        return value.format(**ids)
+    if isinstance(value, dict):
+        return {k: _fill(v, ids) for k, v in value.items()}
+    return value
+
+
+def run_size(name: str, size: tuple) -> dict:
+    """Run every route once against a fresh database of `size`; return endpoint -> (status, statements)."""
+    from factory import create_app
+    from extensions import db
+    import routes.openai_routes as openai_routes
+
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tempfile.mkdtemp(), f"{name}.db"),
+        "BLOB_STORAGE_DIR": tempfile.mkdtemp(),
+        "SCHEMA_CHECK": True, "JOB_AUTOSTART": False, "RATE_LIMIT_ENABLED": False,
+        "GEOMETRY_FLUSH_INTERVAL": 0,
+        # Low enough that the chat request queues a summary on both sizes (the costlier path)
+        "CHAT_SUMMARY_THRESHOLD": 2,
+    })
+    openai_routes._client = FakeOpenAI()
+    with app.app_context():
+        ids = seed(size)
+        log = StatementLog(db.engine)
+        export_body = b"".join(app.test_client().get(
+            f"/api/canvas/canvases/{ids['canvas']}/export",
+            headers={"Authorization": f"Bearer {ids['token']}"},
+        ).response)
+    png = tiny_png()
+
+    client = app.test_client()
+    auth = {"Authorization": f"Bearer {ids['token']}"}
+    results = {}
+    for route in ROUTES:
+        kwargs = {"headers": {**auth, **route.headers}}
+        if route.json is not None:
+            kwargs["json"] = _fill(route.json, ids)
+        if route.endpoint == "canvas.import_canvas_route":
+            kwargs["data"] = export_body
+            kwargs["headers"]["Content-Type"] = "application/gzip"
+        if route.endpoint == "blobs_bp.upload_blob":
+            kwargs["data"] = {"file": (io.BytesIO(png + b"x"), "x.png")}
+        with app.app_context():
+            log.start()
+            resp = client.open(_fill(route.path, ids), method=route.method, buffered=not route.stream, **kwargs)
+            if route.stream:
+                next(iter(resp.response), None)
+            statements = list(log.stop())
+            resp.close()
+        results[route.endpoint] = (resp.status_code, statements)
+    results["__endpoints__"] = {r.endpoint for r in app.url_map.iter_rules()}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    runs = {name: run_size(name, size) for name, size in SIZES.items()}
+    small, large = runs["small"], runs["large"]
+    failures = []
+
+    declared = {r.endpoint for r in ROUTES}
+    for endpoint in sorted(large.pop("__endpoints__") - declared - {"static"}):
+        failures.append((endpoint, "no query budget declared", []))
+    small.pop("__endpoints__")
+
+    print(f"{'endpoint':42s} {'status':>6s} {'small':>6s} {'large':>6s} {'budget':>6s}")
+    for route in ROUTES:
+        status, stmts = large[route.endpoint]
+        n_small, n_large = len(small[route.endpoint][1]), len(stmts)
+        flag = ""
+        if status >= 500:
+            failures.append((route.endpoint, f"returned {status}", stmts))
+            flag = "  ERROR"
+        elif n_large > route.budget:
+            failures.append((route.endpoint, f"{n_large} statements, budget {route.budget}", stmts))
+            flag = "  OVER BUDGET"
+        elif n_large > n_small:
+            failures.append((route.endpoint, f"{n_small} -> {n_large} statements as data grows", stmts))
+            flag = "  GROWS"
+        print(f"{route.endpoint:42s} {status:6d} {n_small:6d} {n_large:6d} {route.budget:6d}{flag}")
+        if args.verbose:
+            for s in stmts:
+                print(f"    {s[:160]}")
+
+    if failures:
+        print(f"\n{len(failures)} failure(s):")
+        for endpoint, reason, stmts in failures:
+            print(f"\n{endpoint}: {reason}")
+            for i, s in enumerate(stmts, 1):
+                print(f"  {i:3d}. {s[:200]}")
+        sys.exit(1)
+    print("\nAll routes within budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Micro-benchmark: ORM + to_dict + jsonify vs column tuples + fast encoder.
+
+Seeds a throwaway SQLite database with one canvas of N elements and times
+both serialization paths for the element list.
+
+    cd backend && python bench/serialization_bench.py --elements 20000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.chdir(BACKEND)
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET", "bench")
+
+from flask import jsonify  # noqa: E402
+
+from app import app  # noqa: E402
+from extensions import db  # noqa: E402
+from models.canvas import Canvas  # noqa: E402
+from models.canvas_element import CanvasElement  # noqa: E402
+from models.user import User  # noqa: E402
+from services import serialization  # noqa: E402
+from services.order_keys import key_for_index  # noqa: E402
+
+
+def seed(n: int) -> int:
+    user = User(email="bench@example.com", username="bench", password_hash="x")
+    db.session.add(user)
+    db.session.flush()
+    canvas = Canvas(user_id=user.id, name="bench")
+    db.session.add(canvas)
+    db.session.flush()
+    now = int(time.time())
+    db.session.execute(CanvasElement.__table__.insert(), [
+        {
+            "canvas_id": canvas.id, "type": "text", "x": i * 1.5, "y": i * 0.5,
+            "width": 120.0, "height": 40.0, "rotation": 0.0, "z_index": i,
+            "order_key": key_for_index(i), "data": {"content": f"note {i}"},
+            "created_at": now, "updated_at": now,
+        }
+        for i in range(n)
+    ])
+    db.session.commit()
+    return canvas.id
+
+
+def orm_path(canvas_id: int) -> int:
+    elements = (
+        CanvasElement.query.filter_by(canvas_id=canvas_id)
+        .order_by(CanvasElement.order_key.asc(), CanvasElement.id.asc())
+        .all()
+    )
+    body = jsonify([e.to_dict() for e in elements]).get_data()
+    db.session.expunge_all()
+    return len(body)
+
+
+def fast_path(canvas_id: int) -> int:
+    return len(serialization.json_response(serialization.element_rows(canvas_id)).get_data())
+
+
+def streamed_path(canvas_id: int) -> int:
+    resp = serialization.streamed_json_array(serialization.iter_element_chunks(canvas_id))
+    return sum(len(part) for part in resp.response)
+
+
+def timed(fn, canvas_id: int, repeat: int) -> tuple[float, int]:
+    best, size = float("inf"), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = fn(canvas_id)
+        best = min(best, time.perf_counter() - start)
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--elements", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # A request context so the streamed path can use stream_with_context
+    with app.test_request_context():
+        canvas_id = seed(args.elements)
+        print(f"{args.elements} elements, best of {args.repeat}, orjson={serialization.ORJSON_ENABLED}")
+        baseline = None
+        paths = (
+            ("orm+to_dict+jsonify", orm_path),
+            ("tuples+dumps", fast_path),
+            ("streamed chunks", streamed_path),
+        )
+        for name, fn in paths:
+            secs, size = timed(fn, canvas_id, args.repeat)
+            baseline = baseline or secs
+            print(f"  {name:22s} {secs * 1000:8.1f} ms  {secs / args.elements * 1e6:6.2f} us/row  "
+                  f"{size / 1024:8.0f} KiB  x{baseline / secs:.1f}")
+
+
+if __name__ == "__main__":
+    main()
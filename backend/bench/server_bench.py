@@ -0,0 +1,138 @@
+"""Throughput of the pre-fork server as the worker count grows.
+
+Seeds a throwaway SQLite database, then for each worker count starts
+`gunicorn -c gunicorn.conf.py` and drives it with keep-alive HTTP clients
+(one process each, so the load generator isn't GIL-bound) for a fixed time.
+Needs gunicorn (Linux/macOS).
+
+    cd backend && python bench/server_bench.py --workers 1,2,4 --duration 10
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.chdir(BACKEND)
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "server.db")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET", "bench")
+
+
+def seed(elements: int) -> tuple[str, int]:
+    from factory import create_app
+    from extensions import db
+    from models.canvas import Canvas
+    from models.canvas_element import CanvasElement
+    from models.user import User
+    from routes.auth import create_jwt_token
+    from services.order_keys import key_for_index
+
+    app = create_app({"SCHEMA_CHECK": True, "JOB_AUTOSTART": False})
+    with app.app_context():
+        user = User(email="bench@example.com", username="bench", password_hash="x")
+        db.session.add(user)
+        db.session.flush()
+        canvas = Canvas(user_id=user.id, name="bench")
+        db.session.add(canvas)
+        db.session.flush()
+        now = int(time.time())
+        db.session.execute(CanvasElement.__table__.insert(), [
+            {"canvas_id": canvas.id, "type": "text", "x": i, "y": i, "width": 100.0, "height": 40.0,
+             "rotation": 0.0, "z_index": i, "order_key": key_for_index(i), "data": {"content": f"n{i}"},
+             "created_at": now, "updated_at": now}
+            for i in range(elements)
+        ])
+        db.session.commit()
+        return create_jwt_token(user), canvas.id
+
+
+def client(args) -> list[float]:
+    """Issue requests until the deadline; return per-request latencies (errors as -1)."""
+    port, path, token, deadline = args
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers = {"Authorization": f"Bearer {token}", "Accept-Encoding": "identity"}
+    latencies = []
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            latencies.append(time.perf_counter() - start if resp.status == 200 else -1)
+        except (OSError, http.client.HTTPException):
+            latencies.append(-1)
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    return latencies
+
+
+def wait_ready(port: int, timeout: float = 30) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/readyz", timeout=1) as r:
+                if r.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def run(workers: int, args, token: str, path: str) -> dict:
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "WEB_THREADS": str(args.threads),
+           "BIND": f"127.0.0.1:{args.port}", "PYTHONWARNINGS": "ignore"}
+    server = subprocess.Popen(
+        ["gunicorn", "-c", "gunicorn.conf.py"], cwd=BACKEND, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(args.port)
+        deadline = time.time() + args.duration
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.map(client, [(args.port, path, token, deadline)] * args.clients)
+    finally:
+        server.terminate()
+        server.wait(30)
+    ok = sorted(x for r in results for x in r if x >= 0)
+    errors = sum(1 for r in results for x in r if x < 0)
+    return {
+        "workers": workers,
+        "rps": len(ok) / args.duration,
+        "p50_ms": statistics.median(ok) * 1000 if ok else 0.0,
+        "p99_ms": ok[int(len(ok) * 0.99) - 1] * 1000 if ok else 0.0,
+        "errors": errors,
+    }
+
+
+def main():
+    cores = multiprocessing.cpu_count()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default=",".join(str(w) for w in (1, 2, 4, 8) if w <= max(cores, 1)))
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--clients", type=int, default=max(4, cores * 2))
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--elements", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args()
+
+    token, canvas_id = seed(args.elements)
+    path = f"/api/canvas/elements?canvas_id={canvas_id}"
+    print(f"GET {path} ({args.elements} elements), {args.clients} clients, {args.duration:.0f}s, {cores} cores")
+    base = None
+    for w in (int(x) for x in args.workers.split(",")):
+        r = run(w, args, token, path)
+        base = base or r["rps"]
+        print(f"  workers={r['workers']:<3d} {r['rps']:8.1f} req/s  x{r['rps'] / base if base else 0:.2f}  "
+              f"p50 {r['p50_ms']:6.1f} ms  p99 {r['p99_ms']:6.1f} ms  errors {r['errors']}")
+
+
+if __name__ == "__main__":
+    main()
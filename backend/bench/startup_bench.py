@@ -0,0 +1,76 @@
+"""Startup benchmark: cold process boot and warm `create_app()` cost.
+
+Each cold scenario runs in a fresh interpreter (median of --runs) against a
+throwaway SQLite database, so the numbers match what a worker process or a
+test session pays at boot. "eager openai" adds what the old `app.py` did on
+every import: importing `openai` and building the client.
+
+    cd backend && python bench/startup_bench.py --runs 7
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRELUDE = "import time; _t = time.perf_counter()\n"
+SCENARIOS = {
+    "import factory": "import factory",
+    "create_app()": "from factory import create_app; create_app()",
+    "create_app() + schema check": "from factory import create_app; create_app({'SCHEMA_CHECK': True})",
+    "create_app() + eager openai": (
+        "from factory import create_app; create_app()\n"
+        "from openai import OpenAI; OpenAI(api_key='bench')"
+    ),
+    "create_app() + first request": (
+        "from factory import create_app; create_app().test_client().get('/')"
+    ),
+}
+WARM = (
+    "from factory import create_app; create_app()\n"
+    "_t = time.perf_counter()\n"
+    "for _ in range(20): create_app()\n"
+    "print((time.perf_counter() - _t) / 20)"
+)
+
+
+def run(code: str, env: dict) -> float:
+    """Run `code` in a fresh interpreter and return the seconds it reports."""
+    if "print(" not in code:
+        code += "\nprint(time.perf_counter() - _t)"
+    out = subprocess.run(
+        [sys.executable, "-c", PRELUDE + code],
+        cwd=BACKEND, env=env, capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        "DATABASE_URL": "sqlite:///" + os.path.join(tempfile.mkdtemp(), "startup.db"),
+        "JWT_SECRET": os.environ.get("JWT_SECRET", "bench"),
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "bench"),
+        "JOB_WORKERS": "0",
+        "PYTHONWARNINGS": "ignore",
+    }
+    # Create the schema once so the schema-check scenario measures the steady state
+    run("from factory import create_app; create_app({'SCHEMA_CHECK': True})", env)
+
+    print(f"cold start, median of {args.runs} fresh interpreters")
+    for name, code in SCENARIOS.items():
+        times = [run(code, env) for _ in range(args.runs)]
+        print(f"  {name:30s} {statistics.median(times) * 1000:8.1f} ms")
+    warm = run(WARM, env)
+    print(f"warm create_app() (modules already imported): {warm * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Micro-benchmark: JSON element list vs the packed binary wire format.
+
+Reports payload size (raw and gzip) and encode/decode time for one canvas.
+Decoding the packed format here maps columns as memoryviews, which is what a
+browser gets from typed arrays.
+
+    cd backend && python bench/wire_format_bench.py --elements 10000
+"""
+import argparse
+import gzip
+import json
+
+# Seeds a throwaway database and imports the app
+from serialization_bench import app, seed, timed
+
+from services import serialization, wire_format
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--elements", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with app.app_context():
+        canvas_id = seed(args.elements)
+        as_json = serialization.json_response(serialization.element_rows(canvas_id)).get_data()
+        packed = wire_format.canvas_elements_packed(canvas_id)
+
+        enc_json, _ = timed(lambda cid: serialization.json_response(serialization.element_rows(cid)), canvas_id, args.repeat)
+        enc_packed, _ = timed(wire_format.canvas_elements_packed, canvas_id, args.repeat)
+        dec_json, _ = timed(lambda _: json.loads(as_json), canvas_id, args.repeat)
+        dec_packed, _ = timed(lambda _: wire_format.decode_elements(packed), canvas_id, args.repeat)
+
+    print(f"{args.elements} elements, best of {args.repeat}")
+    print(f"  {'':8s} {'raw KiB':>9s} {'gzip KiB':>9s} {'encode ms':>10s} {'decode ms':>10s}")
+    for name, body, enc, dec in (("json", as_json, enc_json, dec_json), ("packed", packed, enc_packed, dec_packed)):
+        print(f"  {name:8s} {len(body) / 1024:9.0f} {len(gzip.compress(body)) / 1024:9.0f} "
+              f"{enc * 1000:10.1f} {dec * 1000:10.1f}")
+    print(f"  size x{len(as_json) / len(packed):.1f}, decode x{dec_json / dec_packed:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,64 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///database.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+    # Run create_all() + column upgrades + backfills when the app is created (see factory.py)
+    SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "0") == "1"
+    # Seconds between write-behind flushes of drag/resize/camera updates (0 = write-through)
+    GEOMETRY_FLUSH_INTERVAL = float(os.getenv("GEOMETRY_FLUSH_INTERVAL", "0.25"))
+    # Seconds between change-feed checks of the canvas revision in the database, so streams see
+    # commits made by other server processes (0 = single process, in-process events only)
+    CHANGE_FEED_POLL_INTERVAL = float(os.getenv("CHANGE_FEED_POLL_INTERVAL", "0"))
+    # Image blob store (defaults to <instance>/blobs)
+    BLOB_STORAGE_DIR = os.getenv("BLOB_STORAGE_DIR") or None
+    BLOB_MAX_BYTES = int(os.getenv("BLOB_MAX_BYTES", str(20 * 1024 * 1024)))
+    # Canvas imports: largest request body and uncompressed NDJSON, and longest single line
+    IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(256 * 1024 * 1024)))
+    IMPORT_MAX_LINE_BYTES = int(os.getenv("IMPORT_MAX_LINE_BYTES", str(32 * 1024 * 1024)))
+    # Background job queue (canvas purges, ...); 0 workers disables processing in this process
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+    JOB_VISIBILITY_TIMEOUT = int(os.getenv("JOB_VISIBILITY_TIMEOUT", "60"))
+    # Start job workers in create_app(); the pre-fork server starts them per worker instead
+    JOB_AUTOSTART = os.getenv("JOB_AUTOSTART", "1") == "1"
+    # Rate limiting (services/rate_limit.py): "N/period" buckets per user and route class
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+    RATE_LIMIT_CHAT = os.getenv("RATE_LIMIT_CHAT", "10/min")
+    RATE_LIMIT_WRITE = os.getenv("RATE_LIMIT_WRITE", "60/s")
+    RATE_LIMIT_READ = os.getenv("RATE_LIMIT_READ", "60/s")
+    # "memory" (per process) or "sqlite:///path" (shared by all processes on the host)
+    RATE_LIMIT_STORAGE = os.getenv("RATE_LIMIT_STORAGE", "memory")
+    MAX_STREAMS_PER_USER = int(os.getenv("MAX_STREAMS_PER_USER", "6"))
+    # Non-stream requests in flight per process before load shedding starts (0 = off)
+    MAX_INFLIGHT_REQUESTS = int(os.getenv("MAX_INFLIGHT_REQUESTS", "32"))
+    # If set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN") or None
+    # WAL journal for SQLite so several server processes can read while one writes
+    SQLITE_WAL = os.getenv("SQLITE_WAL", "0") == "1"
+    # Response compression: smallest body worth compressing, and memory for compressed ETagged bodies
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+    COMPRESS_CACHE_BYTES = int(os.getenv("COMPRESS_CACHE_BYTES", str(32 * 1024 * 1024)))
+    # Resumable chat streams: events kept per stream for replay, seconds a finished stream stays
+    # resumable, and seconds between checkpoints of the partial reply to the assistant message
+    CHAT_STREAM_BUFFER = int(os.getenv("CHAT_STREAM_BUFFER", "512"))
+    CHAT_STREAM_RETAIN = float(os.getenv("CHAT_STREAM_RETAIN", "120"))
+    CHAT_CHECKPOINT_INTERVAL = float(os.getenv("CHAT_CHECKPOINT_INTERVAL", "1.0"))
+    # Concept-card generation: threads shared by all chat streams, and seconds a stream waits for its card
+    CHAT_CARD_WORKERS = int(os.getenv("CHAT_CARD_WORKERS", "4"))
+    CHAT_CARD_TIMEOUT = float(os.getenv("CHAT_CARD_TIMEOUT", "20"))
+    # Rolling chat summaries (services/chat_summary.py): summarize once more than THRESHOLD messages
+    # aren't covered, keeping the last RECENT_MESSAGES raw; 0 disables
+    CHAT_SUMMARY_THRESHOLD = int(os.getenv("CHAT_SUMMARY_THRESHOLD", "16"))
+    CHAT_RECENT_MESSAGES = int(os.getenv("CHAT_RECENT_MESSAGES", "8"))
+    CHAT_SUMMARY_WORDS = int(os.getenv("CHAT_SUMMARY_WORDS", "250"))
+    # Password hashing (services/passwords.py): worker processes (0 = on the request thread) and their
+    # nice increment, calls that may wait for a busy pool before sign-ins get 503, and the Werkzeug
+    # method for new hashes. Stored hashes made with other parameters are replaced on the next sign-in
+    PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "2"))
+    PASSWORD_NICE = int(os.getenv("PASSWORD_NICE", "10"))
+    PASSWORD_QUEUE_DEPTH = int(os.getenv("PASSWORD_QUEUE_DEPTH", "16"))
+    PASSWORD_TIMEOUT = float(os.getenv("PASSWORD_TIMEOUT", "10"))
+    PASSWORD_METHOD = os.getenv("PASSWORD_METHOD", "scrypt:32768:8:1")
 
 
 def load_config(app):
     app.config.from_object(Config)
     return app
-
@@ -1,3 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+# Committed instances stay loaded; routes serialize them right after commit
+# without a reload round-trip per object.
+db = SQLAlchemy(session_options={"expire_on_commit": False})
@@ -0,0 +1,119 @@
+from flask import Flask, jsonify
+from flask_cors import CORS
+from sqlalchemy import event
+
+from config import load_config
+from extensions import db
+from services.chat_streams import chat_streams
+from services.compression import compression
+from services.jobs import job_queue
+from services.metrics import metrics
+from services.passwords import passwords
+from services.rate_limit import rate_limiter
+from services.write_buffer import write_buffer
+
+
+def create_app(config=None) -> Flask:
+    """Build a configured Flask app.
+
+    `config` is a config class/object or a dict of overrides applied on top of
+    `Config`. Route modules are imported here rather than at module import, and
+    the OpenAI client is only built on the first chat request, so importing
+    this module and creating an app stays cheap. The schema check
+    (`create_all()` plus column upgrades and backfills) runs only when
+    `SCHEMA_CHECK` is set; otherwise run `flask --app factory init-db` once
+    per deploy.
+    """
+    app = Flask(__name__)
+    app.config['CORS_HEADERS'] = 'Content-Type, Authorization'
+    load_config(app)
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    CORS(app)
+    db.init_app(app)
+    if app.config.get("SQLITE_WAL"):
+        with app.app_context():
+            enable_sqlite_wal()
+    write_buffer.init_app(app)
+    job_queue.init_app(app)
+    compression.init_app(app)
+    metrics.init_app(app)
+    chat_streams.init_app(app)
+    passwords.init_app(app)
+
+    register_blueprints(app)
+    from routes.auth import rate_limit_key
+    rate_limiter.init_app(app, key_func=rate_limit_key)
+
+    @app.cli.command("init-db")
+    def init_db_command():
+        """Create tables, add missing columns and run data backfills."""
+        with app.app_context():
+            check_schema()
+        print("Schema is up to date.")
+
+    if app.config.get("SCHEMA_CHECK"):
+        with app.app_context():
+            check_schema()
+
+    # Start background workers once the handlers (imported with the blueprints) are registered.
+    # The pre-fork server turns this off and starts them per worker (services/lifecycle.py).
+    if app.config.get("JOB_AUTOSTART", True):
+        job_queue.start()
+    return app
+
+
+def register_blueprints(app: Flask) -> None:
+    from routes.openai_routes import openai_bp
+    from routes.auth import auth_bp
+    from routes.canvas import canvas_bp
+    from routes.payments import payments_bp
+    from routes.blobs import blobs_bp
+    from routes.search import search_bp
+    from routes.health import health_bp
+
+    app.register_blueprint(openai_bp, url_prefix="/api/chat")
+    app.register_blueprint(auth_bp, url_prefix="/api/auth")
+    app.register_blueprint(canvas_bp, url_prefix="/api/canvas")
+    app.register_blueprint(payments_bp, url_prefix="/api/payments")
+    app.register_blueprint(blobs_bp, url_prefix="/api/blobs")
+    app.register_blueprint(search_bp, url_prefix="/api/search")
+    app.register_blueprint(health_bp)
+
+    @app.route("/", methods=["GET"])
+    def home():
+        return jsonify({"message": "Learnable API running"})
+
+
+def enable_sqlite_wal() -> None:
+    """Let readers in other processes run alongside a writer (SQLite only; no-op otherwise)."""
+    if db.engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(db.engine, "connect")
+    def _set_wal(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.close()
+
+
+def check_schema() -> None:
+    """Import every model so `create_all()` sees it, then bring the schema up to date."""
+    from models.user import User  # noqa: F401
+    from models.canvas import Canvas  # noqa: F401
+    from models.chat import Chat  # noqa: F401
+    from models.chat_message import ChatMessage  # noqa: F401
+    from models.canvas_element import CanvasElement  # noqa: F401
+    from models.canvas_thumbnail import CanvasThumbnail  # noqa: F401
+    from models.element_group import ElementGroup, ElementGroupMember  # noqa: F401
+    from models.purchases import Purchase  # noqa: F401
+    from models.token_transactions import TokenTransaction  # noqa: F401
+    from models.blob import Blob  # noqa: F401
+    from models.job import Job  # noqa: F401
+    from schema import ensure_schema
+
+    ensure_schema()
@@ -0,0 +1,74 @@
+"""Production server: `cd backend && gunicorn -c gunicorn.conf.py`.
+
+A pre-fork pool of `WEB_CONCURRENCY` processes (default: 1), each serving
+`WEB_THREADS` requests at once (default: 32). Scale a single worker with
+`WEB_THREADS`; threads matter because SSE streams (chat, change feed) hold one
+for their whole lifetime.
+
+One process is the default because some state is per process: the geometry
+write buffer, the change-feed broker and running chat streams. With more than
+one worker the write buffer is turned off (every drag PATCH commits) and change
+feeds poll the canvas revision every `CHANGE_FEED_POLL_INTERVAL` seconds
+(default 2), answering `resync` when another worker committed changes. Clients
+resuming a chat reply on another worker get the text saved so far and poll
+until the reply is complete.
+
+The app is imported once in the master and inherited by the workers; each
+worker then gets its own SQLAlchemy connections and job threads
+(`services/lifecycle.py`). On SIGTERM/SIGHUP a worker stops accepting, fails
+`/readyz`, closes change feeds with a `reconnect` event and gives in-flight
+requests `GRACEFUL_TIMEOUT` seconds to finish.
+"""
+import os
+import signal
+
+wsgi_app = "wsgi:app"
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+threads = int(os.getenv("WEB_THREADS", "32"))
+worker_class = "gthread"
+preload_app = True
+# Idle SSE connections send a keep-alive every 15s, well within this
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+accesslog = os.getenv("ACCESS_LOG") or None
+
+# Read by config.py when the app is preloaded below
+os.environ.setdefault("JOB_AUTOSTART", "0")
+os.environ.setdefault("SQLITE_WAL", "1")
+if workers > 1:
+    # The write buffer would let workers serve stale geometry and overwrite each other's flushes
+    os.environ["GEOMETRY_FLUSH_INTERVAL"] = "0"
+    os.environ.setdefault("CHANGE_FEED_POLL_INTERVAL", "2")
+
+
+def post_fork(server, worker):
+    from services import lifecycle
+    lifecycle.after_fork(server.app.wsgi())
+
+
+def post_worker_init(worker):
+    # gunicorn's SIGTERM handler only stops the accept loop; drain streams first
+    from services import lifecycle
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handle_term(signum, frame):
+        lifecycle.begin_drain()
+        if callable(previous):
+            previous(signum, frame)
+
+    signal.signal(signal.SIGTERM, handle_term)
+
+
+def worker_int(worker):
+    from services import lifecycle
+    lifecycle.begin_drain()
+
+
+def worker_exit(server, worker):
+    # Let a running job finish its current chunk; anything left is retried after its lease
+    from services.jobs import job_queue
+    from services.passwords import passwords
+    job_queue.stop(timeout=5)
+    passwords.shutdown()
@@ -0,0 +1,30 @@
+from extensions import db
+from time import time
+
+
+class Blob(db.Model):
+    """Metadata for a content-addressed file stored under BLOB_STORAGE_DIR.
+
+    The bytes live on disk, keyed by their SHA-256; identical uploads from any
+    user share one row and one file.
+    """
+    __tablename__ = "blobs"
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    content_type = db.Column(db.String(100), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at = db.Column(db.Integer, nullable=False, default=lambda: int(time()))
+
+    def to_dict(self):
+        return {
+            "sha256": self.sha256,
+            "url": f"/api/blobs/{self.sha256}",
+            "content_type": self.content_type,
+            "size": self.size,
+            "width": self.width,
+            "height": self.height,
+            "created_at": self.created_at,
+        }
@@ -4,6 +4,10 @@ from time import time
 
 class Canvas(db.Model):
     __tablename__ = "canvas"
+    __table_args__ = (
+        # Keyset pagination of a user's canvases by (updated_at, id)
+        db.Index("ix_canvas_user_updated", "user_id", "updated_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -14,6 +18,10 @@ class Canvas(db.Model):
     camera_x = db.Column(db.Float, nullable=False, default=0.0)
     camera_y = db.Column(db.Float, nullable=False, default=0.0)
     camera_zoom_percentage = db.Column(db.Float, nullable=False, default=0.0)
+    # Bumped on every element/group write; used to key derived caches (tiles, etc.)
+    revision = db.Column(db.Integer, nullable=False, default=0)
+    # Set on delete; rows are purged later by a background job
+    deleted_at = db.Column(db.Integer, nullable=True)
 
     chat = db.relationship("Chat", back_populates="canvas", uselist=False, cascade="all, delete")
     elements = db.relationship("CanvasElement", backref="canvas", cascade="all, delete", lazy=True)
@@ -28,6 +36,7 @@ class Canvas(db.Model):
             "camera_x": float(self.camera_x or 0.0),
             "camera_y": float(self.camera_y or 0.0),
             "camera_zoom_percentage": float(self.camera_zoom_percentage or 0.0),
+            "revision": int(self.revision or 0),
         }
         if include_elements:
             data["elements"] = [el.to_dict() for el in self.elements]
@@ -5,6 +5,9 @@ import json
 
 class CanvasElement(db.Model):
     __tablename__ = "canvas_element"
+    __table_args__ = (
+        db.Index("ix_canvas_element_canvas_order", "canvas_id", "order_key"),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     canvas_id = db.Column(db.Integer, db.ForeignKey("canvas.id", ondelete="CASCADE"), nullable=False)
@@ -17,6 +20,8 @@ class CanvasElement(db.Model):
     height = db.Column(db.Float, nullable=True)
     rotation = db.Column(db.Float, nullable=False, default=0)
     z_index = db.Column(db.Integer, nullable=False, default=0)
+    # Stacking order (bottom first); see services/order_keys.py. z_index is kept for older clients.
+    order_key = db.Column(db.String(64), nullable=True)
     # Shared color: used as background for rectangles and as text color for text elements
     bgcolor = db.Column(db.String(16), nullable=False, default='#FFFFFF')
 
@@ -43,6 +48,7 @@ class CanvasElement(db.Model):
             "height": self.height,
             "rotation": self.rotation,
             "z_index": self.z_index,
+            "order_key": self.order_key,
             "bgcolor": self.bgcolor,
             "data": self.data or {},
             "line_start_x": self.line_start_x,
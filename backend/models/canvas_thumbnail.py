@@ -0,0 +1,12 @@
+from extensions import db
+from time import time
+
+
+class CanvasThumbnail(db.Model):
+    """Rendered SVG preview of a canvas at one revision (see services/thumbnails.py)."""
+    __tablename__ = "canvas_thumbnail"
+
+    canvas_id = db.Column(db.Integer, db.ForeignKey("canvas.id", ondelete="CASCADE"), primary_key=True)
+    revision = db.Column(db.Integer, nullable=False)
+    svg = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.Integer, nullable=False, default=lambda: int(time()))
@@ -9,6 +9,11 @@ class Chat(db.Model):
     canvas_id = db.Column(db.Integer, db.ForeignKey("canvas.id", ondelete="CASCADE"), nullable=False, unique=True)
     created_at = db.Column(db.Integer, nullable=False, default=lambda: int(time()))
     updated_at = db.Column(db.Integer, nullable=False, default=lambda: int(time()), onupdate=lambda: int(time()))
+    # Rolling summary of the messages up to and including `summary_through` (services/chat_summary.py)
+    summary = db.Column(db.Text, nullable=True)
+    summary_through = db.Column(db.Integer, nullable=True)
+    # Set while a summarize_chat job is queued, so each chat has at most one in flight
+    summary_requested_at = db.Column(db.Integer, nullable=True)
 
     # one-to-one relationship back to Canvas
     canvas = db.relationship("Canvas", back_populates="chat")
@@ -4,6 +4,10 @@ from time import time
 
 class ChatMessage(db.Model):
     __tablename__ = "chat_message"
+    __table_args__ = (
+        # Per-chat history and "last message" lookups
+        db.Index("ix_chat_message_chat_created", "chat_id", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     chat_id = db.Column(db.Integer, db.ForeignKey("chat.id", ondelete="CASCADE"), nullable=False)
@@ -11,6 +15,8 @@ class ChatMessage(db.Model):
     is_response = db.Column(db.Boolean, default=False, nullable=False)
     is_liked = db.Column(db.Boolean, default=False, nullable=False)
     is_disliked = db.Column(db.Boolean, default=False, nullable=False)
+    # Set on an assistant reply until its run saves the final text (checkpoints are partial)
+    is_generating = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.Integer, nullable=False, default=lambda: int(time()))
 
     def to_dict(self):
@@ -21,5 +27,6 @@ class ChatMessage(db.Model):
             "is_response": self.is_response,
             "is_liked": self.is_liked,
             "is_disliked": self.is_disliked,
+            "is_generating": self.is_generating,
             "created_at": self.created_at,
         }
@@ -1,7 +1,6 @@
 from flask import Blueprint, request, jsonify, g
 from extensions import db
 from models.user import User
-from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 import time
 import os
@@ -9,6 +8,8 @@ from functools import wraps
 from typing import Optional
 from dotenv import load_dotenv
 
+from services.passwords import PasswordBusy, passwords
+
 # Load .env variables
 load_dotenv()
 
@@ -63,6 +64,19 @@ def _extract_token() -> Optional[str]:
     return cookie_token or None
 
 
+def rate_limit_key() -> Optional[str]:
+    """Identify the caller for rate limiting: the signed-in user, if the token is valid."""
+    token = _extract_token()
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+    except jwt.InvalidTokenError:
+        return None
+    email = payload.get("email")
+    return f"user:{email}" if email else None
+
+
 def authenticate_token(view_func):
     @wraps(view_func)
     def wrapper(*args, **kwargs):
@@ -90,6 +104,41 @@ def authenticate_token(view_func):
     return wrapper
 
 
+# ---------------------------
+# Password helpers (hashing runs on services/passwords.py's process pool)
+# ---------------------------
+def password_busy():
+    resp = jsonify({"error": "Too many sign-ins right now, please try again."})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = "1"
+    return resp
+
+
+def release_connection() -> None:
+    # End the read transaction so the connection goes back to the pool while the KDF runs;
+    # otherwise a burst of sign-ins holds every pooled connection and stalls other requests
+    db.session.commit()
+
+
+def hash_password(password: str) -> str:
+    """Raises PasswordBusy when the pool is saturated."""
+    release_connection()
+    return passwords.hash(password)
+
+
+def check_password(user: User, password: str) -> bool:
+    """Verify on the hashing pool, saving a rehash if the hash predates PASSWORD_METHOD.
+
+    Raises PasswordBusy when the pool is saturated.
+    """
+    release_connection()
+    ok, new_hash = passwords.verify(user.password_hash, password)
+    if new_hash:
+        user.password_hash = new_hash
+        db.session.commit()
+    return ok
+
+
 # ---------------------------
 # Signup
 # ---------------------------
@@ -104,15 +153,18 @@ def signup():
         return jsonify({"error": "Email and password required"}), 400
 
     existing = User.query.filter_by(email=email).first()
-    if existing:
-        if check_password_hash(existing.password_hash, password):
-            token = create_jwt_token(existing)
-            return jsonify(
-                {"success": True, "token": token, "user": existing.to_public_dict(), "message": "Welcome back!"}
-            )
-        return jsonify({"error": "Email already registered"}), 400
-
-    hashed = generate_password_hash(password)
+    try:
+        if existing:
+            if check_password(existing, password):
+                token = create_jwt_token(existing)
+                return jsonify(
+                    {"success": True, "token": token, "user": existing.to_public_dict(), "message": "Welcome back!"}
+                )
+            return jsonify({"error": "Email already registered"}), 400
+        hashed = hash_password(password)
+    except PasswordBusy:
+        return password_busy()
+
     user = User(email=email, username=username, password_hash=hashed)
     db.session.add(user)
     db.session.commit()
@@ -136,8 +188,11 @@ def signin():
         return jsonify({"error": "Email and password required"}), 400
 
     user = User.query.filter_by(email=email).first()
-    if not user or not check_password_hash(user.password_hash, password):
-        return jsonify({"error": "Invalid credentials"}), 401
+    try:
+        if not user or not check_password(user, password):
+            return jsonify({"error": "Invalid credentials"}), 401
+    except PasswordBusy:
+        return password_busy()
 
     token = create_jwt_token(user)
     return jsonify(
@@ -181,10 +236,15 @@ def google_signin():
 
     user = User.query.filter_by(email=email).first()
     if not user:
+        try:
+            # Random, so the account can only sign in through Google
+            unusable_hash = hash_password(os.urandom(16).hex())
+        except PasswordBusy:
+            return password_busy()
         user = User(
             email=email,
             username=name,
-            password_hash=generate_password_hash(os.urandom(16).hex()),
+            password_hash=unusable_hash,
             google_id=google_sub,
             profile_picture=picture,
             is_google_account=1,
@@ -221,11 +281,14 @@ def update_profile():
     username = data.get("username")
     new_password = data.get("password")
 
+    if new_password:
+        try:
+            user.password_hash = hash_password(new_password.strip())
+        except PasswordBusy:
+            return password_busy()
+
     if username:
         user.username = username.strip()
 
-    if new_password:
-        user.password_hash = generate_password_hash(new_password.strip())
-
     db.session.commit()
     return jsonify({"success": True, "message": "Profile updated successfully.", "user": user.to_public_dict()})
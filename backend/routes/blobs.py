@@ -0,0 +1,76 @@
+from flask import Blueprint, jsonify, request, g, send_file
+from extensions import db
+from models.blob import Blob
+from routes.auth import authenticate_token
+from services.blobs import BlobError, blob_path, get_thumbnail, store_stream, thumbnail_size_for
+
+blobs_bp = Blueprint("blobs_bp", __name__)
+
+# Content-addressed: a URL's bytes never change
+IMMUTABLE_MAX_AGE = 31536000
+
+
+def _immutable(resp):
+    resp.cache_control.public = True
+    resp.cache_control.max_age = IMMUTABLE_MAX_AGE
+    resp.cache_control.immutable = True
+    return resp
+
+
+@blobs_bp.route("", methods=["POST"])
+@authenticate_token
+def upload_blob():
+    """Store an image and return its blob reference.
+
+    Accepts multipart form data (`file` field) or the raw image as the request body.
+    Identical bytes from any user resolve to the same blob.
+    """
+    upload = request.files.get("file")
+    stream = upload.stream if upload else request.stream
+    try:
+        blob = store_stream(stream, g.current_user.id)
+    except BlobError as e:
+        return jsonify({"error": str(e)}), 400
+    db.session.commit()
+    return jsonify(blob.to_dict()), 201
+
+
+@blobs_bp.route("/<string(length=64):sha256>", methods=["GET"])
+def get_blob(sha256: str):
+    """Serve blob bytes with ETag, Range and immutable caching support.
+
+    Unauthenticated so `<img src>` works; the URL is the content hash.
+    """
+    blob = db.session.get(Blob, sha256.lower())
+    if not blob:
+        return jsonify({"error": "Blob not found"}), 404
+    resp = send_file(
+        blob_path(blob.sha256),
+        mimetype=blob.content_type,
+        conditional=True,
+        etag=blob.sha256,
+        max_age=IMMUTABLE_MAX_AGE,
+    )
+    return _immutable(resp)
+
+
+@blobs_bp.route("/<string(length=64):sha256>/thumbnail", methods=["GET"])
+def get_blob_thumbnail(sha256: str):
+    """Serve a downscaled copy for zoomed-out views (`?size=` in px, longest side)."""
+    blob = db.session.get(Blob, sha256.lower())
+    if not blob:
+        return jsonify({"error": "Blob not found"}), 404
+    size = thumbnail_size_for(request.args.get("size", 256, type=int) or 256)
+    thumb = get_thumbnail(blob, size)
+    if thumb is None:
+        # Pillow missing, the original already small or not decodable: serve it as-is
+        return get_blob(blob.sha256)
+    path, mimetype = thumb
+    resp = send_file(
+        path,
+        mimetype=mimetype,
+        conditional=True,
+        etag=f"{blob.sha256}-{size}",
+        max_age=IMMUTABLE_MAX_AGE,
+    )
+    return _immutable(resp)
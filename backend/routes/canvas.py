@@ -1,15 +1,40 @@
-from flask import Blueprint, jsonify, request, g
+import json
+from time import time
+from flask import Blueprint, Response, current_app, jsonify, request, g, stream_with_context
 from models.canvas import Canvas
 from models.chat import Chat
-from models.chat_message import ChatMessage
 from models.canvas_element import CanvasElement
 from models.element_group import ElementGroup, ElementGroupMember
 from routes.auth import authenticate_token
 from extensions import db
+from services import lifecycle, lod, thumbnails, wire_format
+from services.access import owned_canvas, owned_element, owned_group
+from services.blobs import externalize_image_data
+from services.change_feed import RESYNC, broker, record_change
+from services.order_keys import key_for_rank, key_next_to, needs_rebalance, schedule_rebalance, top_placement
+from services.metrics import metrics
+from services.purge import enqueue_purge
+from services.rate_limit import stream
+from services.serialization import (
+    canvas_page, canvas_rows, element_list_response, group_rows, json_response, message_rows, parse_canvas_cursor,
+)
+from services.transfer import TransferError, duplicate_canvas, import_canvas, iter_export_lines, iter_gzip
+from services.write_buffer import CAMERA_FIELDS, ELEMENT_FIELDS, NULLABLE_ELEMENT_FIELDS, coerce_fields, write_buffer
+from sqlalchemy import delete, select
 from sqlalchemy.exc import OperationalError
 
 canvas_bp = Blueprint("canvas", __name__)
 
+# Seconds between SSE keep-alive comments on idle change feeds
+CHANGE_FEED_HEARTBEAT = 15
+# Sent when this worker drains; clients reconnect (to another worker) and resume
+RECONNECT_EVENT = "retry: 1000\nevent: reconnect\ndata: {}\n\n"
+# Canvas list pages (`GET /canvases?limit=`)
+CANVAS_PAGE_SIZE = 24
+CANVAS_PAGE_MAX = 100
+# Thumbnails at a given revision never change
+THUMBNAIL_MAX_AGE = 31536000
+
 # --------------------------
 # 📚 CANVASES
 # --------------------------
@@ -17,10 +42,27 @@ canvas_bp = Blueprint("canvas", __name__)
 @canvas_bp.route("/canvases", methods=["GET"])
 @authenticate_token
 def list_canvases():
-    """List all canvases belonging to the authenticated user"""
+    """List the canvases belonging to the authenticated user.
+
+    Without `limit`, every canvas as an array (older clients). With `limit`
+    (at most 100), one page ordered by `updated_at` (newest first; `order=asc`
+    for oldest first) as `{canvases, next_cursor}`; pass `cursor` back to get
+    the next page. Paged rows also carry `element_count`, `last_message_at`
+    and a cacheable `thumbnail_url`.
+    """
     user_id = g.current_user.id
-    canvases = Canvas.query.filter_by(user_id=user_id).order_by(Canvas.updated_at.desc()).all()
-    return jsonify([c.to_dict() for c in canvases]), 200
+    if "limit" not in request.args and "cursor" not in request.args:
+        # Camera state may still be staged in the write-behind buffer
+        return json_response(write_buffer.overlay_cameras(canvas_rows(user_id)))
+
+    try:
+        limit = max(1, min(int(request.args.get("limit", CANVAS_PAGE_SIZE)), CANVAS_PAGE_MAX))
+        cursor = request.args.get("cursor")
+        after = parse_canvas_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({"error": "limit must be an integer and cursor a value from next_cursor"}), 400
+    rows, next_cursor = canvas_page(user_id, limit, after, ascending=request.args.get("order") == "asc")
+    return json_response({"canvases": write_buffer.overlay_cameras(rows), "next_cursor": next_cursor})
 
 
 @canvas_bp.route("/canvases", methods=["POST"])
@@ -52,10 +94,10 @@ def create_canvas():
 @authenticate_token
 def get_canvas(canvas_id: int):
     """Return a single canvas owned by the authenticated user."""
-    user_id = g.current_user.id
-    canvas = Canvas.query.filter_by(id=canvas_id, user_id=user_id).first()
+    canvas = owned_canvas(canvas_id)
     if not canvas:
         return jsonify({"error": "Canvas not found or unauthorized"}), 404
+    write_buffer.flush(canvas_id)
     return jsonify(canvas.to_dict()), 200
 
 
@@ -66,12 +108,21 @@ def update_canvas(canvas_id: int):
 
     JSON: any of { name, camera_x, camera_y, camera_zoom_percentage }
     """
-    user_id = g.current_user.id
-    canvas = Canvas.query.filter_by(id=canvas_id, user_id=user_id).first()
+    canvas = owned_canvas(canvas_id)
     if not canvas:
         return jsonify({"error": "Canvas not found or unauthorized"}), 404
 
     body = request.get_json(silent=True) or {}
+    if body and write_buffer.enabled and set(body) <= CAMERA_FIELDS:
+        # Camera panning/zooming: coalesce instead of committing every PATCH
+        try:
+            fields = coerce_fields(body)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid field type"}), 400
+        write_buffer.stage_camera(canvas.id, fields)
+        return jsonify(write_buffer.overlay_camera(canvas.to_dict())), 200
+
+    write_buffer.flush(canvas_id)
     try:
         if 'name' in body and isinstance(body['name'], str):
             name = body['name'].strip()
@@ -89,30 +140,273 @@ def update_canvas(canvas_id: int):
     return jsonify(canvas.to_dict()), 200
 
 
+@canvas_bp.route("/canvases/<int:canvas_id>/export", methods=["GET"])
+@authenticate_token
+def export_canvas(canvas_id: int):
+    """Stream a canvas with its elements, groups and chat as gzip-compressed NDJSON."""
+    canvas = owned_canvas(canvas_id)
+    if not canvas:
+        return jsonify({"error": "Canvas not found or unauthorized"}), 404
+    write_buffer.flush(canvas_id)
+
+    return Response(
+        stream_with_context(iter_gzip(iter_export_lines(canvas))),
+        mimetype="application/gzip",
+        headers={
+            "Content-Disposition": f'attachment; filename="canvas-{canvas_id}.ndjson.gz"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+@canvas_bp.route("/canvases/<int:canvas_id>/duplicate", methods=["POST"])
+@authenticate_token
+def duplicate_canvas_route(canvas_id: int):
+    """Copy a canvas with its elements and groups (and chat if asked).
+
+    JSON (optional): { name, include_chat }
+    """
+    canvas = owned_canvas(canvas_id)
+    if not canvas:
+        return jsonify({"error": "Canvas not found or unauthorized"}), 404
+    body = request.get_json(silent=True) or {}
+    name = body.get("name").strip() if isinstance(body.get("name"), str) else None
+    write_buffer.flush(canvas_id)
+
+    copy = duplicate_canvas(canvas, name=name or None, include_chat=bool(body.get("include_chat")))
+    out = copy.to_dict()
+    out["chat_id"] = copy.chat.id if copy.chat else None
+    return jsonify(out), 201
+
+
+@canvas_bp.route("/canvases/import", methods=["POST"])
+@authenticate_token
+def import_canvas_route():
+    """Create a canvas from an export (request body: NDJSON, optionally gzip-compressed)."""
+    user_id = g.current_user.id
+    # Reading past this answers 413 (see IMPORT_MAX_BYTES)
+    request.max_content_length = current_app.config.get("IMPORT_MAX_BYTES") or None
+    try:
+        canvas = import_canvas(user_id, request.stream)
+    except TransferError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(canvas.to_dict()), 201
+
+
+def _with_etag(response, tag: str):
+    """Mark a revision-derived response as cacheable but always revalidated."""
+    response.set_etag(tag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def _not_modified(tag: str):
+    return _with_etag(Response(status=304), tag)
+
+
+@canvas_bp.route(
+    "/canvases/<int:canvas_id>/tiles/<int:level>/<int(signed=True):tx>/<int(signed=True):ty>",
+    methods=["GET"],
+)
+@authenticate_token
+def get_canvas_tile(canvas_id: int, level: int, tx: int, ty: int):
+    """Return aggregated element clusters for one level-of-detail tile.
+
+    Used instead of `GET /elements` when zoomed far out; see `services/lod.py`
+    for the tile geometry.
+    """
+    canvas = owned_canvas(canvas_id)
+    if not canvas:
+        return jsonify({"error": "Canvas not found or unauthorized"}), 404
+    if level > lod.MAX_LEVEL:
+        return jsonify({"error": f"level must be between 0 and {lod.MAX_LEVEL}"}), 400
+    write_buffer.flush(canvas_id)
+
+    revision = int(canvas.revision or 0)
+    tag = f"tile-{canvas.id}-{revision}-{level}-{tx}-{ty}"
+    if tag in request.if_none_match:
+        return _not_modified(tag)
+    tile = lod.get_tile(canvas.id, revision, level, tx, ty)
+    return _with_etag(jsonify(tile), tag)
+
+
+@canvas_bp.route("/thumbnails/<int:canvas_id>/<int:revision>.svg", methods=["GET"])
+def get_canvas_thumbnail(canvas_id: int, revision: int):
+    """Serve a canvas' SVG preview (see `services/thumbnails.py`).
+
+    Authorized by the signed URL from the canvas list rather than a bearer token,
+    so it works in `<img src>`. Immutable; a URL for an older revision is gone
+    (410), so a leaked or stale link stops showing the canvas once it changes.
+    """
+    if not thumbnails.valid_signature(canvas_id, revision, request.args.get("sig")):
+        return jsonify({"error": "Thumbnail not found"}), 404
+    tag = f"thumb-{canvas_id}-{revision}"
+    if tag in request.if_none_match:
+        return _not_modified(tag)
+    found = thumbnails.get_thumbnail(canvas_id)
+    if found is None:
+        return jsonify({"error": "Thumbnail not found"}), 404
+    current, svg = found
+    if current != revision:
+        # The canvas list hands out a fresh URL for the current revision
+        return jsonify({"error": "Thumbnail revision is out of date"}), 410
+    resp = Response(svg, mimetype="image/svg+xml")
+    resp.headers["Content-Security-Policy"] = "default-src 'none'"
+    resp.set_etag(tag)
+    resp.cache_control.private = True
+    resp.cache_control.max_age = THUMBNAIL_MAX_AGE
+    resp.cache_control.immutable = True
+    return resp
+
+
+def _canvas_revision(app, canvas_id: int) -> int:
+    """The canvas revision in the database, read from a stream outside the request context."""
+    with app.app_context():
+        return int(db.session.query(Canvas.revision).filter_by(id=canvas_id).scalar() or 0)
+
+
+@canvas_bp.route("/canvases/<int:canvas_id>/changes", methods=["GET"])
+@stream
+@authenticate_token
+def canvas_change_feed(canvas_id: int):
+    """Stream element/group changes for a canvas as Server-Sent Events.
+
+    Each event's `id:` is the canvas revision it produced. Clients resume after a
+    reconnect with `Last-Event-ID` (or `?since=<revision>`); when the gap can't be
+    replayed they receive a `resync` event and should reload the element list.
+    """
+    canvas = owned_canvas(canvas_id)
+    if not canvas:
+        return jsonify({"error": "Canvas not found or unauthorized"}), 404
+
+    since = request.headers.get("Last-Event-ID") or request.args.get("since")
+    try:
+        since = int(since) if since not in (None, "") else None
+    except ValueError:
+        return jsonify({"error": "since must be an integer revision"}), 400
+    current_revision = int(canvas.revision or 0)
+    # With several worker processes, other workers' commits never reach this process's
+    # broker; the stream then polls the canvas revision and resyncs when it falls behind
+    poll = float(current_app.config.get("CHANGE_FEED_POLL_INTERVAL", 0) or 0)
+    app = current_app._get_current_object()
+    # Release the DB connection; the stream below only opens one briefly to poll
+    db.session.remove()
+
+    def generate():
+        if lifecycle.draining.is_set():
+            yield RECONNECT_EVENT
+            return
+        # Subscribing from the revision read above replays anything committed since; a client
+        # resuming from an older revision this process can't replay gets a resync
+        sub = broker.subscribe(canvas_id, since if since is not None else current_revision, current_revision)
+        metrics.stream_opened("changes")
+        seen, behind = current_revision, None
+        last_sent = next_poll = time()
+        try:
+            yield f"event: hello\ndata: {json.dumps({'revision': current_revision})}\n\n"
+            while True:
+                ev = sub.get(timeout=min(CHANGE_FEED_HEARTBEAT, poll) if poll else CHANGE_FEED_HEARTBEAT)
+                if ev is not None and "revision" in ev:
+                    seen = max(seen, ev["revision"])
+                if poll and time() >= next_poll and (ev is None or "revision" in ev):
+                    next_poll = time() + poll
+                    # A revision still missing one poll after it was first seen was committed elsewhere
+                    if behind is not None and seen < behind:
+                        ev = RESYNC
+                    latest = _canvas_revision(app, canvas_id)
+                    behind = latest if latest > seen else None
+                if ev is None:
+                    if lifecycle.draining.is_set():
+                        yield RECONNECT_EVENT
+                        return
+                    if time() - last_sent >= CHANGE_FEED_HEARTBEAT:
+                        last_sent = time()
+                        yield ": keep-alive\n\n"
+                    continue
+                last_sent = time()
+                if ev["type"] == "closed":
+                    yield RECONNECT_EVENT
+                    return
+                if ev["type"] == "resync":
+                    # Start over from "now"; the client reloads the full element list
+                    broker.unsubscribe(sub)
+                    if poll:
+                        seen, behind = _canvas_revision(app, canvas_id), None
+                        sub = broker.subscribe(canvas_id, seen, seen)
+                    else:
+                        sub = broker.subscribe(canvas_id)
+                    yield "event: resync\ndata: {}\n\n"
+                    continue
+                yield f"id: {ev['revision']}\nevent: change\ndata: {json.dumps(ev)}\n\n"
+        finally:
+            broker.unsubscribe(sub)
+            metrics.stream_closed("changes")
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
 # --------------------------
 # 🧩 CANVAS ELEMENTS
 # --------------------------
 
+def _placement_key(canvas_id: int, body: dict, exclude_id: int | None = None):
+    """Resolve `place_after` / `place_before` (an element id) to an order key.
+
+    Returns (key, error); both are None when the body has no placement.
+    """
+    if 'place_after' in body:
+        after, anchor_id = True, body['place_after']
+    elif 'place_before' in body:
+        after, anchor_id = False, body['place_before']
+    else:
+        return None, None
+    try:
+        anchor_id = int(anchor_id)
+    except (TypeError, ValueError):
+        return None, "place_after/place_before must be an element id"
+    anchor = CanvasElement.query.filter_by(id=anchor_id, canvas_id=canvas_id).first()
+    if not anchor or anchor.id == exclude_id:
+        return None, "Anchor element not found on this canvas"
+    return key_next_to(anchor, after, exclude_id=exclude_id), None
+
+
 @canvas_bp.route("/elements", methods=["GET"])
 @authenticate_token
 def list_canvas_elements():
-    """Return all elements for a canvas owned by the authenticated user."""
-    user_id = g.current_user.id
+    """Return all elements for a canvas owned by the authenticated user.
+
+    Clients sending `Accept: application/x-learnable-elements` get the packed
+    binary layout from `services/wire_format.py` instead of JSON.
+    """
     canvas_id = request.args.get("canvas_id", type=int)
     if not canvas_id:
         return jsonify({"error": "canvas_id is required"}), 400
 
     # Verify ownership
-    canvas = Canvas.query.filter_by(id=canvas_id, user_id=user_id).first()
+    canvas = owned_canvas(canvas_id)
     if not canvas:
         return jsonify({"error": "Canvas not found or unauthorized"}), 404
 
-    elements = (
-        CanvasElement.query.filter_by(canvas_id=canvas_id)
-        .order_by(CanvasElement.z_index.asc(), CanvasElement.id.asc())
-        .all()
-    )
-    return jsonify([e.to_dict() for e in elements]), 200
+    write_buffer.flush(canvas_id)
+    packed = request.accept_mimetypes.best_match(["application/json", wire_format.MEDIA_TYPE]) == wire_format.MEDIA_TYPE
+    # Every element write bumps the revision, so it identifies the list
+    tag = f"elements-{canvas_id}-{int(canvas.revision or 0)}" + ("-packed" if packed else "")
+    if tag in request.if_none_match:
+        return _not_modified(tag)
+    if packed:
+        resp = Response(wire_format.canvas_elements_packed(canvas_id), mimetype=wire_format.MEDIA_TYPE)
+    else:
+        resp = element_list_response(canvas_id)
+    resp.vary.add("Accept")
+    return _with_etag(resp, tag)
 
 
 @canvas_bp.route("/elements", methods=["POST"])
@@ -121,7 +415,8 @@ def create_canvas_element():
     """Create a new element on a canvas (rectangle, text, image).
 
     Body JSON should include at least: { canvas_id, type }
-    Optional: x, y, width, height, rotation, z_index, data (object)
+    Optional: x, y, width, height, rotation, z_index, data (object),
+    place_after / place_before (element id). Without either the element goes on top.
     """
     user_id = g.current_user.id
     data = request.get_json(silent=True) or {}
@@ -132,7 +427,7 @@ def create_canvas_element():
         return jsonify({"error": "canvas_id and type are required"}), 400
 
     # Verify ownership
-    canvas = Canvas.query.filter_by(id=canvas_id, user_id=user_id).first()
+    canvas = owned_canvas(canvas_id)
     if not canvas:
         return jsonify({"error": "Canvas not found or unauthorized"}), 404
 
@@ -159,16 +454,20 @@ def create_canvas_element():
         payload = data.get("data") or {}
         if not isinstance(payload, dict):
             return jsonify({"error": "data must be an object"}), 400
+        # Inline data URLs from older clients go to the blob store
+        payload = externalize_image_data(payload, user_id)
     except (TypeError, ValueError):
         return jsonify({"error": "Invalid numeric value for x/y/width/height/rotation/z_index"}), 400
 
-    # Ensure new elements are created on top if z_index is not provided or is <= 0
-    if z_index <= 0:
-        try:
-            max_z = db.session.query(db.func.max(CanvasElement.z_index)).filter_by(canvas_id=canvas_id).scalar()
-            z_index = int((max_z or 0) + 1)
-        except Exception:
-            z_index = 1
+    order_key, error = _placement_key(canvas_id, data)
+    if error:
+        return jsonify({"error": error}), 400
+    if order_key is None:
+        # Older clients send an explicit z_index (a rank); otherwise stack on top
+        if z_index > 0:
+            order_key = key_for_rank(canvas_id, z_index)
+        else:
+            order_key, z_index = top_placement(canvas_id)
 
     element = CanvasElement(
         canvas_id=canvas_id,
@@ -179,6 +478,7 @@ def create_canvas_element():
         height=height,
         rotation=rotation,
         z_index=z_index,
+        order_key=order_key,
         bgcolor=bgcolor,
         data=payload,
         line_start_x=lsx,
@@ -187,7 +487,11 @@ def create_canvas_element():
         line_end_y=ley,
     )
     db.session.add(element)
+    db.session.flush()
+    record_change(canvas_id, "element", "created", element.to_dict())
     db.session.commit()
+    if needs_rebalance(order_key):
+        schedule_rebalance(current_app._get_current_object(), canvas_id)
     return jsonify(element.to_dict()), 201
 
 
@@ -197,17 +501,26 @@ def update_canvas_element(element_id: int):
     """Update element geometry/z/data. Accepts partial fields.
 
     JSON: any of { x, y, width, height, rotation, z_index, data }
+    Reorder with { place_after: <element id> } or { place_before: <element id> };
+    only this element's row is rewritten.
     """
     user_id = g.current_user.id
-    el = CanvasElement.query.filter_by(id=element_id).first()
+    el, _ = owned_element(element_id)
     if not el:
         return jsonify({"error": "Element not found"}), 404
-    # Verify ownership via canvas
-    canvas = Canvas.query.filter_by(id=el.canvas_id, user_id=user_id).first()
-    if not canvas:
-        return jsonify({"error": "Unauthorized"}), 403
 
     body = request.get_json(silent=True) or {}
+    if body and write_buffer.enabled and set(body) <= ELEMENT_FIELDS:
+        # Drag/resize/rotate: coalesce in the write-behind buffer
+        try:
+            fields = coerce_fields(body, NULLABLE_ELEMENT_FIELDS)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid field type"}), 400
+        write_buffer.stage_element(el.id, el.canvas_id, fields)
+        return jsonify(write_buffer.overlay_element(el.to_dict())), 200
+
+    # Land any staged geometry first so it can't overwrite this write later
+    write_buffer.flush(el.canvas_id)
     try:
         if 'x' in body:
             el.x = float(body['x'])
@@ -226,7 +539,7 @@ def update_canvas_element(element_id: int):
         if 'data' in body:
             if not isinstance(body['data'], dict) and body['data'] is not None:
                 return jsonify({"error": "data must be an object or null"}), 400
-            el.data = body['data']
+            el.data = externalize_image_data(body['data'], user_id)
         if 'line_start_x' in body:
             el.line_start_x = float(body['line_start_x']) if body['line_start_x'] is not None else None
         if 'line_start_y' in body:
@@ -238,7 +551,20 @@ def update_canvas_element(element_id: int):
     except (TypeError, ValueError):
         return jsonify({"error": "Invalid field type"}), 400
 
+    order_key, error = _placement_key(el.canvas_id, body, exclude_id=el.id)
+    if error:
+        return jsonify({"error": error}), 400
+    if order_key is None and 'z_index' in body:
+        # Legacy restacking: move to that rank in the current order
+        order_key = key_for_rank(el.canvas_id, el.z_index, exclude_id=el.id)
+    if order_key is not None:
+        el.order_key = order_key
+
+    db.session.flush()
+    record_change(el.canvas_id, "element", "updated", el.to_dict())
     db.session.commit()
+    if order_key is not None and needs_rebalance(order_key):
+        schedule_rebalance(current_app._get_current_object(), el.canvas_id)
     return jsonify(el.to_dict()), 200
 
 
@@ -246,14 +572,14 @@ def update_canvas_element(element_id: int):
 @authenticate_token
 def delete_canvas_element(element_id: int):
     """Delete a canvas element owned by the authenticated user."""
-    user_id = g.current_user.id
-    el = CanvasElement.query.filter_by(id=element_id).first()
+    el, _ = owned_element(element_id)
     if not el:
         return jsonify({"error": "Element not found"}), 404
-    canvas = Canvas.query.filter_by(id=el.canvas_id, user_id=user_id).first()
-    if not canvas:
-        return jsonify({"error": "Unauthorized"}), 403
+    # Waits out a flush that already took this element's staged geometry
+    write_buffer.flush(el.canvas_id)
+    write_buffer.discard_element(el.id)
     db.session.delete(el)
+    record_change(el.canvas_id, "element", "deleted", {"id": element_id})
     db.session.commit()
     return jsonify({"success": True}), 200
 
@@ -261,89 +587,138 @@ def delete_canvas_element(element_id: int):
 @canvas_bp.route("/groups", methods=["GET"])
 @authenticate_token
 def list_groups():
-    user_id = g.current_user.id
     canvas_id = request.args.get("canvas_id", type=int)
     if not canvas_id:
         return jsonify({"error": "canvas_id is required"}), 400
-    canvas = Canvas.query.filter_by(id=canvas_id, user_id=user_id).first()
+    canvas = owned_canvas(canvas_id)
     if not canvas:
         return jsonify({"error": "Canvas not found or unauthorized"}), 404
-    groups = ElementGroup.query.filter_by(canvas_id=canvas_id).order_by(ElementGroup.updated_at.desc()).all()
-    return jsonify([g.to_dict(include_elements=True) for g in groups]), 200
+    return json_response(group_rows(canvas_id))
+
+
+def _element_id_list(raw) -> list[int]:
+    """Integer element ids from a request list, deduplicated in order; anything else is skipped."""
+    ids = []
+    for x in raw or []:
+        if isinstance(x, bool) or not isinstance(x, (int, str)):
+            continue
+        try:
+            ids.append(int(x))
+        except ValueError:
+            continue
+    return list(dict.fromkeys(ids))
+
+
+def _valid_element_ids(canvas_id: int, ids: list[int]) -> list[int]:
+    """The subset of `ids` that are elements of `canvas_id`, in request order (one query)."""
+    if not ids:
+        return []
+    found = set(db.session.execute(
+        select(CanvasElement.id).where(CanvasElement.id.in_(ids), CanvasElement.canvas_id == canvas_id)
+    ).scalars())
+    return [eid for eid in ids if eid in found]
+
+
+def _member_ids(group_id: int) -> list[int]:
+    return db.session.execute(
+        select(ElementGroupMember.element_id)
+        .where(ElementGroupMember.group_id == group_id)
+        .order_by(ElementGroupMember.id.asc())
+    ).scalars().all()
+
+
+def _insert_members(group_id: int, element_ids: list[int]) -> None:
+    """Add group members with one multi-row INSERT (the ORM would issue one per row)."""
+    if element_ids:
+        db.session.execute(
+            ElementGroupMember.__table__.insert(),
+            [{"group_id": group_id, "element_id": eid} for eid in element_ids],
+        )
+
+
+def _delete_members(group_id: int, element_ids: list[int]) -> None:
+    if element_ids:
+        db.session.execute(
+            delete(ElementGroupMember)
+            .where(ElementGroupMember.group_id == group_id, ElementGroupMember.element_id.in_(element_ids))
+        )
+
+
+def _group_dict(grp: ElementGroup, element_ids: list[int]) -> dict:
+    # Membership is written with Core statements, so don't read it back through `grp.members`
+    return {**grp.to_dict(include_elements=False), "element_ids": element_ids}
 
 
 @canvas_bp.route("/groups", methods=["POST"])
 @authenticate_token
 def create_group():
-    user_id = g.current_user.id
     data = request.get_json(silent=True) or {}
     canvas_id = data.get("canvas_id")
     name = (data.get("name") or "Group").strip() or "Group"
-    element_ids = data.get("element_ids") or []
     if not canvas_id:
         return jsonify({"error": "canvas_id is required"}), 400
-    canvas = Canvas.query.filter_by(id=canvas_id, user_id=user_id).first()
+    canvas = owned_canvas(canvas_id)
     if not canvas:
         return jsonify({"error": "Canvas not found or unauthorized"}), 404
     # Validate elements belong to this canvas
-    if element_ids:
-        elems = CanvasElement.query.filter(CanvasElement.id.in_(element_ids)).all()
-        valid_ids = [e.id for e in elems if e.canvas_id == canvas_id]
-    else:
-        valid_ids = []
-    grp = ElementGroup(canvas_id=canvas_id, name=name)
+    valid_ids = _valid_element_ids(canvas.id, _element_id_list(data.get("element_ids")))
+    grp = ElementGroup(canvas_id=canvas.id, name=name)
     db.session.add(grp)
     db.session.flush()
-    for eid in valid_ids:
-        db.session.add(ElementGroupMember(group_id=grp.id, element_id=eid))
+    _insert_members(grp.id, valid_ids)
+    out = _group_dict(grp, valid_ids)
+    record_change(canvas.id, "group", "created", out)
     db.session.commit()
-    return jsonify(grp.to_dict(include_elements=True)), 201
+    return jsonify(out), 201
 
 
 @canvas_bp.route("/groups/<int:group_id>", methods=["PATCH"])
 @authenticate_token
 def update_group(group_id: int):
-    user_id = g.current_user.id
-    grp = ElementGroup.query.filter_by(id=group_id).first()
+    """Rename a group and/or set its members.
+
+    JSON: any of { name, element_ids }. `element_ids` is the full new member list;
+    only the difference from the current members is written.
+    """
+    grp, _ = owned_group(group_id)
     if not grp:
         return jsonify({"error": "Group not found"}), 404
-    canvas = Canvas.query.filter_by(id=grp.canvas_id, user_id=user_id).first()
-    if not canvas:
-        return jsonify({"error": "Unauthorized"}), 403
     body = request.get_json(silent=True) or {}
     changed = False
     if 'name' in body and isinstance(body['name'], str):
         new_name = body['name'].strip()
-        if new_name:
+        if new_name and new_name != grp.name:
             grp.name = new_name
             changed = True
+    members = _member_ids(grp.id)
     if 'element_ids' in body and isinstance(body['element_ids'], list):
-        # Reset membership to provided set
-        ElementGroupMember.query.filter_by(group_id=grp.id).delete()
-        ids = [int(x) for x in body['element_ids'] if isinstance(x, (int, str))]
-        if ids:
-            elems = CanvasElement.query.filter(CanvasElement.id.in_(ids)).all()
-            for e in elems:
-                if e.canvas_id == grp.canvas_id:
-                    db.session.add(ElementGroupMember(group_id=grp.id, element_id=e.id))
-        changed = True
+        wanted = _valid_element_ids(grp.canvas_id, _element_id_list(body['element_ids']))
+        current, wanted_set = set(members), set(wanted)
+        removed = [eid for eid in members if eid not in wanted_set]
+        added = [eid for eid in wanted if eid not in current]
+        if removed or added:
+            _delete_members(grp.id, removed)
+            _insert_members(grp.id, added)
+            members = [eid for eid in members if eid in wanted_set] + added
+            changed = True
     if changed:
+        # Set explicitly: a membership-only change doesn't touch the group row otherwise
+        grp.updated_at = int(time())
+        db.session.flush()
+        record_change(grp.canvas_id, "group", "updated", _group_dict(grp, members))
         db.session.commit()
-    return jsonify(grp.to_dict(include_elements=True)), 200
+    return jsonify(_group_dict(grp, members)), 200
 
 
 @canvas_bp.route("/groups/<int:group_id>", methods=["DELETE"])
 @authenticate_token
 def delete_group(group_id: int):
-    user_id = g.current_user.id
-    grp = ElementGroup.query.filter_by(id=group_id).first()
+    grp, _ = owned_group(group_id)
     if not grp:
         return jsonify({"error": "Group not found"}), 404
-    canvas = Canvas.query.filter_by(id=grp.canvas_id, user_id=user_id).first()
-    if not canvas:
-        return jsonify({"error": "Unauthorized"}), 403
     # Members cascade delete due to FK
     db.session.delete(grp)
+    record_change(grp.canvas_id, "group", "deleted", {"id": group_id})
     db.session.commit()
     return jsonify({"success": True}), 200
 
@@ -353,12 +728,11 @@ def get_chat_for_canvas():
     """Return chat + messages for a given canvas_id owned by the user.
     Creates an empty chat if none exists yet.
     """
-    user_id = g.current_user.id
     canvas_id = request.args.get("canvas_id", type=int)
     if not canvas_id:
         return jsonify({"error": "canvas_id is required"}), 400
     # Ensure ownership
-    canvas = Canvas.query.filter_by(id=canvas_id, user_id=user_id).first()
+    canvas = owned_canvas(canvas_id)
     if not canvas:
         return jsonify({"error": "Canvas not found or unauthorized"}), 404
 
@@ -374,33 +748,29 @@ def get_chat_for_canvas():
         db.session.add(chat)
         db.session.commit()
 
-    messages = (
-        ChatMessage.query.filter_by(chat_id=chat.id)
-        .order_by(ChatMessage.created_at.asc())
-        .all()
-    )
-    return jsonify({
+    return json_response({
         "chat": chat.to_dict(),
-        "messages": [m.to_dict() for m in messages],
-    }), 200
+        "messages": message_rows(chat.id),
+    })
 
 @canvas_bp.route("/canvases/<int:canvas_id>", methods=["DELETE"])
 @authenticate_token
 def delete_canvas(canvas_id: int):
-    """Delete a canvas owned by the authenticated user (and its chats/messages)."""
-    user_id = g.current_user.id
-    canvas = Canvas.query.filter_by(id=canvas_id, user_id=user_id).first()
+    """Delete a canvas owned by the authenticated user (and its chats/messages).
+
+    The canvas disappears immediately; its rows are purged by a background job
+    (see services/purge.py) so large canvases don't hold the write lock.
+    """
+    canvas = owned_canvas(canvas_id)
     if not canvas:
         return jsonify({"error": "Canvas not found or unauthorized"}), 404
 
-    # Manually delete chats + messages to avoid FK issues on SQLite
-    chats = Chat.query.filter_by(canvas_id=canvas_id).all()
-    for ch in chats:
-        ChatMessage.query.filter_by(chat_id=ch.id).delete()
-        db.session.delete(ch)
-
-    db.session.delete(canvas)
+    canvas.deleted_at = int(time())
+    enqueue_purge(canvas_id)
     db.session.commit()
+    write_buffer.discard_canvas(canvas_id)
+    lod.invalidate(canvas_id)
+    broker.forget(canvas_id)
     return jsonify({"success": True}), 200
 
 # All note and connection endpoints removed during canvas reset phase.
@@ -0,0 +1,48 @@
+import hmac
+import os
+from flask import Blueprint, Response, current_app, jsonify, request
+from sqlalchemy import text
+from extensions import db
+from services import lifecycle
+from services.metrics import metrics
+from services.rate_limit import exempt
+
+health_bp = Blueprint("health_bp", __name__)
+
+
+# ---------------------------
+# Liveness / readiness probes
+# ---------------------------
+@health_bp.route("/healthz", methods=["GET"])
+@exempt
+def healthz():
+    """The process is up and serving requests."""
+    return jsonify({"status": "ok", "pid": os.getpid()}), 200
+
+
+@health_bp.route("/readyz", methods=["GET"])
+@exempt
+def readyz():
+    """Ready for new traffic: not draining and the database answers."""
+    if lifecycle.draining.is_set():
+        return jsonify({"status": "draining", "pid": os.getpid()}), 503
+    try:
+        db.session.execute(text("SELECT 1"))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"status": "unavailable", "error": str(e), "pid": os.getpid()}), 503
+    return jsonify({"status": "ready", "pid": os.getpid()}), 200
+
+
+# ---------------------------
+# Prometheus metrics
+# ---------------------------
+@health_bp.route("/metrics", methods=["GET"])
+@exempt
+def prometheus_metrics():
+    token = current_app.config.get("METRICS_TOKEN")
+    if token:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(supplied, token):
+            return jsonify({"error": "Unauthorized"}), 401
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
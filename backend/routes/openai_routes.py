@@ -1,17 +1,37 @@
 import json
 import os
-from flask import Blueprint, request, jsonify, Response, stream_with_context
+import threading
+from flask import Blueprint, current_app, request, jsonify, Response, g
+from sqlalchemy import select, update
 from extensions import db
+from models.canvas import Canvas
 from models.chat import Chat
 from models.chat_message import ChatMessage
-from models.canvas import Canvas
+from routes.auth import authenticate_token
+from services.access import owned_canvas
+from services.chat_streams import chat_streams, message_id_of, parse_event_id
+from services.chat_summary import context_for
+from services.metrics import metrics
+from services.rate_limit import limit_class, stream
 from flask_cors import cross_origin
-from openai import OpenAI
-from time import time
+from time import perf_counter, time
 
 
 openai_bp = Blueprint("openai_bp", __name__)
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# The client (and the `openai` package, which is slow to import) is built on first use
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(api_key=current_app.config.get("OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY"))
+    return _client
 
 # ---------------------------
 # Learnable prompt configuration
@@ -30,12 +50,39 @@ LEARNABLE_PROMPT = {
 
 MODEL = "gpt-4o-mini"
 
+# Reply characters streamed before card generation starts alongside the rest of the reply
+CARD_START_CHARS = 300
+# Seconds after which a reply still marked as generating is treated as final (its run died)
+ABANDONED_REPLY_AGE = 600
+
+
+def generate_card_json(user_message: str, reply: str) -> str:
+    """Ask the model for a concept card (JSON text) about `reply`; runs on the chat side-work pool."""
+    card_prompt = (
+        "From the conversation and your reply, generate a short Learnable concept card as JSON. "
+        "Return ONLY a JSON object with keys: title (3-6 words, concise) and description (1-3 sentences, clear). "
+        "Do not include markdown or extra text."
+    )
+    card = get_client().chat.completions.create(
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": LEARNABLE_PROMPT["base"]},
+            {"role": "user", "content": f"{user_message}\n\n{reply}\n\n{card_prompt}"},
+        ],
+        temperature=0.7,
+        max_tokens=200,
+    )
+    return card.choices[0].message.content.strip()
+
 
 # ---------------------------
 # Streaming chat endpoint
 # ---------------------------
 @openai_bp.route("/stream", methods=["POST"])
 @cross_origin()
+@limit_class("chat")
+@stream
+@authenticate_token
 def chat_stream():
     data = request.get_json(silent=True) or {}
     user_message = (data.get("message") or "").strip()
@@ -46,6 +93,7 @@ def chat_stream():
 
     chat_obj = None
     assistant_msg_id = None
+    summary = None
     prior_messages = []
 
     # ---------------------------
@@ -54,7 +102,7 @@ def chat_stream():
     if canvas_id is not None:
         try:
             cid = int(canvas_id)
-            canvas = Canvas.query.filter_by(id=cid).first()
+            canvas = owned_canvas(cid)
             if canvas:
                 # Ensure one chat per canvas
                 chat_obj = Chat.query.filter_by(canvas_id=cid).first()
@@ -63,18 +111,13 @@ def chat_stream():
                     db.session.add(chat_obj)
                     db.session.commit()
 
-                # Snapshot prior messages
-                prior_messages = [
-                    {"text": m.text or "", "is_response": bool(m.is_response)}
-                    for m in ChatMessage.query.filter_by(chat_id=chat_obj.id)
-                    .order_by(ChatMessage.created_at.asc())
-                    .all()
-                ]
+                # Snapshot the summary and the messages after it (may queue a new summary)
+                summary, prior_messages = context_for(chat_obj)
 
                 # Save user message + placeholder assistant
                 um = ChatMessage(chat_id=chat_obj.id, text=user_message, is_response=False)
                 db.session.add(um)
-                am = ChatMessage(chat_id=chat_obj.id, text="", is_response=True)
+                am = ChatMessage(chat_id=chat_obj.id, text="", is_response=True, is_generating=True)
                 db.session.add(am)
                 db.session.flush()
                 assistant_msg_id = am.id
@@ -92,15 +135,18 @@ def chat_stream():
 
     base_prompt = LEARNABLE_PROMPT["base"]
     generate_card = LEARNABLE_PROMPT["generate_card"]
+    app = current_app._get_current_object()
 
     # ---------------------------
-    # Stream response generator
+    # Generation (background run)
     # ---------------------------
-    def generate():
+    def produce(run):
         # Build system + conversation context
         context_messages = [{"role": "system", "content": base_prompt}]
+        if summary:
+            context_messages.append({"role": "system", "content": f"Summary of the conversation so far:\n{summary}"})
         if prior_messages:
-            for m in prior_messages[-20:]:
+            for m in prior_messages:
                 txt = m["text"].strip()
                 if not txt:
                     continue
@@ -113,10 +159,13 @@ def chat_stream():
         context_messages.append({"role": "user", "content": user_message})
 
         # Stream OpenAI response (with graceful fallback)
-        full_reply = ""
         stream_error: str | None = None
+        card_future = None
+        started = perf_counter()
+        first_token = None
+        metrics.stream_opened("chat")
         try:
-            stream = client.chat.completions.create(
+            stream = get_client().chat.completions.create(
                 model=MODEL,
                 messages=context_messages,
                 temperature=0.7,
@@ -126,61 +175,124 @@ def chat_stream():
             for chunk in stream:
                 content = getattr(chunk.choices[0].delta, "content", None)
                 if content:
-                    full_reply += content
-                    yield f"data: {json.dumps({'content': content})}\n\n"
+                    if first_token is None:
+                        first_token = perf_counter()
+                        metrics.observe("learnable_openai_ttft_seconds", first_token - started)
+                    run.add_content(content)
+                    if run.checkpoint_due(chat_streams.checkpoint_interval):
+                        save_reply(run.text)
+                    # Start the card as soon as there's enough of the reply to go on
+                    if generate_card and card_future is None and len(run.text) >= CARD_START_CHARS:
+                        card_future = chat_streams.submit(app, generate_card_json, user_message, run.text)
         except Exception as e:
             stream_error = str(e)
+            metrics.inc("learnable_openai_errors_total")
+        finally:
+            metrics.observe("learnable_openai_stream_seconds", perf_counter() - started)
+            metrics.stream_closed("chat")
 
         # If streaming failed entirely, send a fallback message and persist it
-        if stream_error and not full_reply:
-            full_reply = "I'm having trouble reaching the AI model right now. Try again in a bit."
-            yield f"data: {json.dumps({'content': full_reply})}\n\n"
+        if stream_error and not run.text:
+            run.add_content("I'm having trouble reaching the AI model right now. Try again in a bit.")
+        full_reply = run.text
 
         # ---------------------------
-        # Optional: Generate Learnable concept card
+        # Save assistant reply (without waiting for the card)
         # ---------------------------
-        if generate_card and not stream_error and full_reply.strip():
-            card_prompt = (
-                "From the conversation and your reply, generate a short Learnable concept card as JSON. "
-                "Return ONLY a JSON object with keys: title (3-6 words, concise) and description (1-3 sentences, clear). "
-                "Do not include markdown or extra text."
-            )
-            try:
-                card = client.chat.completions.create(
-                    model=MODEL,
-                    messages=[
-                        {"role": "system", "content": base_prompt},
-                        {"role": "user", "content": f"{user_message}\n\n{full_reply}\n\n{card_prompt}"},
-                    ],
-                    temperature=0.7,
-                    max_tokens=200,
-                )
-                json_text = card.choices[0].message.content.strip()
-                yield f"data: {json.dumps({'content': f'<card>{json_text}</card>'})}\n\n"
-            except Exception as e:
-                # Non-fatal; still persist the main reply
-                pass
+        save_reply(full_reply, final=True)
+        run.emit({"message_id": assistant_msg_id}, event="reply")
 
         # ---------------------------
-        # Save assistant reply
+        # Optional: Learnable concept card, pushed as its own event
         # ---------------------------
-        if assistant_msg_id is not None:
+        if stream_error:
+            if card_future is not None:
+                card_future.cancel()
+            return
+        if generate_card and card_future is None and full_reply.strip():
+            card_future = chat_streams.submit(app, generate_card_json, user_message, full_reply)
+        if card_future is not None:
             try:
-                am = ChatMessage.query.filter_by(id=assistant_msg_id).first()
-                if am:
-                    am.text = full_reply
-                    db.session.commit()
+                run.emit({"card": card_future.result(timeout=current_app.config.get("CHAT_CARD_TIMEOUT", 20))},
+                         event="card")
             except Exception as e:
-                print("Error updating assistant message:", e)
-                db.session.rollback()
+                # Non-fatal; the reply is already saved
+                print("Card generation failed:", e)
 
-        yield "data: [DONE]\n\n"
+    def save_reply(text: str, final: bool = False):
+        if assistant_msg_id is None:
+            return
+        values = {"text": text, "is_generating": False} if final else {"text": text}
+        try:
+            db.session.execute(update(ChatMessage).where(ChatMessage.id == assistant_msg_id).values(**values))
+            db.session.commit()
+        except Exception as e:
+            print("Error updating assistant message:", e)
+            db.session.rollback()
 
     # ---------------------------
     # Stream response to client
     # ---------------------------
+    # The run outlives this response, so a dropped client can reattach with GET /stream/<id>
+    run = chat_streams.start(app, g.current_user.id, assistant_msg_id, produce)
+    return sse_response(run.subscribe())
+
+
+@openai_bp.route("/stream/<stream_id>", methods=["GET"])
+@cross_origin()
+@stream
+@authenticate_token
+def resume_chat_stream(stream_id):
+    """Reattach to a chat stream after a dropped connection.
+
+    Replays the events after `Last-Event-ID` (or `?after=<seq>`) and then follows
+    the still-running generation. If the run isn't known to this process (other
+    worker, or finished long ago) the reply saved on the assistant message is sent
+    as a `resync` event. It ends with `[DONE]` only when that reply is complete;
+    otherwise the event says `"complete": false` and the client polls again.
+    """
+    last_id, after = parse_event_id(request.headers.get("Last-Event-ID"))
+    if last_id is None:
+        last_id = stream_id
+        try:
+            after = max(0, int(request.args.get("after", 0)))
+        except ValueError:
+            return jsonify({"error": "after must be an integer"}), 400
+    if last_id != stream_id:
+        return jsonify({"error": "Last-Event-ID belongs to another stream"}), 400
+
+    run = chat_streams.get(stream_id, g.current_user.id)
+    if run is not None:
+        return sse_response(run.subscribe(after))
+
+    message_id = message_id_of(stream_id)
+    row = None
+    if message_id is not None:
+        row = db.session.execute(
+            select(ChatMessage.text, ChatMessage.is_generating, ChatMessage.created_at)
+            .join(Chat, Chat.id == ChatMessage.chat_id)
+            .join(Canvas, Canvas.id == Chat.canvas_id)
+            .where(ChatMessage.id == message_id, ChatMessage.is_response.is_(True),
+                   Canvas.user_id == g.current_user.id)
+        ).first()
+    if row is None:
+        return jsonify({"error": "Stream not found"}), 404
+    db.session.remove()
+    # Still being generated by another worker's run, unless that run has long since died
+    complete = not row.is_generating or time() - row.created_at > ABANDONED_REPLY_AGE
+
+    def replay():
+        data = json.dumps({"text": row.text, "complete": complete})
+        yield f"event: resync\nid: {stream_id}:{after}\ndata: {data}\n\n"
+        if complete:
+            yield f"id: {stream_id}:{after + 1}\ndata: [DONE]\n\n"
+
+    return sse_response(replay())
+
+
+def sse_response(events):
     return Response(
-        stream_with_context(generate()),
+        events,
         mimetype="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
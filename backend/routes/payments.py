@@ -4,6 +4,7 @@ from models.user import User
 from models.purchases import Purchase
 from models.token_transactions import TokenTransaction
 from routes.auth import authenticate_token
+from services.serialization import json_response, purchase_rows
 
 payments_bp = Blueprint("payments_bp", __name__)
 
@@ -15,8 +16,7 @@ payments_bp = Blueprint("payments_bp", __name__)
 def get_purchase_history():
     """Return all purchases for the logged-in user"""
     user_id = g.current_user.id
-    purchases = Purchase.query.filter_by(user_id=user_id).order_by(Purchase.created_at.desc()).all()
-    return jsonify([p.to_dict() for p in purchases]), 200
+    return json_response(purchase_rows(user_id))
 
 
 # -------------------------------
@@ -0,0 +1,36 @@
+from flask import Blueprint, request, jsonify, g
+from routes.auth import authenticate_token
+from services.search import SearchUnavailable, search
+
+search_bp = Blueprint("search_bp", __name__)
+
+KINDS = {"element", "message"}
+
+
+# ---------------------------
+# Full-text search
+# ---------------------------
+@search_bp.route("", methods=["GET"])
+@authenticate_token
+def search_route():
+    """Search the current user's text elements and chat messages.
+
+    `q` is required; `type` (element|message, comma separated) narrows the
+    result kinds and `limit` caps the hits (default 20, at most 50).
+    """
+    query = request.args.get("q", "")
+    kinds = {k.strip() for k in request.args.get("type", "element,message").split(",") if k.strip()}
+    if not kinds or kinds - KINDS:
+        return jsonify({"error": "type must be element, message or both"}), 400
+    try:
+        limit = int(request.args.get("limit", 20))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    try:
+        results = search(g.current_user.id, query, kinds, limit)
+    except SearchUnavailable as e:
+        return jsonify({"error": str(e)}), 501
+    if results is None:
+        return jsonify({"error": "q must contain at least one word"}), 400
+    return jsonify({"query": query, "results": results})
@@ -0,0 +1,68 @@
+from sqlalchemy import inspect, text
+
+from extensions import db
+from services.blobs import extract_inline_images
+from services.order_keys import key_for_index
+from services.search import ensure_search_index
+
+
+# Columns added to existing tables after they were first created. `db.create_all()`
+# never alters tables that already exist, so older databases get these via ALTER TABLE.
+# Each entry: (table, column, column DDL)
+ADDED_COLUMNS = [
+    ("canvas", "revision", "INTEGER NOT NULL DEFAULT 0"),
+    ("canvas_element", "order_key", "VARCHAR(64)"),
+    ("canvas", "deleted_at", "INTEGER"),
+    ("chat", "summary", "TEXT"),
+    ("chat", "summary_through", "INTEGER"),
+    ("chat", "summary_requested_at", "INTEGER"),
+    ("chat_message", "is_generating", "BOOLEAN NOT NULL DEFAULT 0"),
+]
+
+
+def _backfill_order_keys(conn):
+    """Derive order keys for elements created before they existed, from (z_index, id)."""
+    rows = conn.execute(text(
+        "SELECT id, z_index FROM canvas_element WHERE order_key IS NULL"
+    )).fetchall()
+    if rows:
+        conn.execute(
+            text("UPDATE canvas_element SET order_key = :key WHERE id = :id"),
+            [{"id": r[0], "key": key_for_index(r[1] or 0)} for r in rows],
+        )
+
+
+# Data fixes run after the columns above exist; each must be idempotent.
+BACKFILLS = [
+    _backfill_order_keys,
+    extract_inline_images,
+]
+
+
+def ensure_schema():
+    """Create missing tables/indexes and add any columns introduced since a table was created.
+
+    Must be called inside an app context with all models imported.
+    """
+    db.create_all()
+    inspector = inspect(db.engine)
+    existing = {}
+    with db.engine.begin() as conn:
+        for table, column, ddl in ADDED_COLUMNS:
+            if table not in existing:
+                existing[table] = {c["name"] for c in inspector.get_columns(table)}
+            if column in existing[table]:
+                continue
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+            existing[table].add(column)
+
+        # create_all() skips indexes on tables that already existed
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+        # FTS5 tables and the triggers that keep them current (SQLite only)
+        ensure_search_index(conn)
+
+        for backfill in BACKFILLS:
+            backfill(conn)
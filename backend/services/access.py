@@ -0,0 +1,67 @@
+"""Ownership-checked loading of canvases, elements and groups.
+
+Each helper loads the row together with its canvas and filters on the
+current user in a single statement. There is no separate "does this canvas
+belong to you" query, and "missing" and "someone else's" look the same (None).
+Canvases found along the way are remembered on `g` for the rest of the
+request, so repeated checks against the same canvas don't go back to the
+database.
+"""
+from flask import g
+from sqlalchemy import select
+
+from extensions import db
+from models.canvas import Canvas
+from models.canvas_element import CanvasElement
+from models.element_group import ElementGroup
+
+
+def _memo() -> dict:
+    memo = g.get("owned_canvases")
+    if memo is None:
+        memo = g.owned_canvases = {}
+    return memo
+
+
+def _remember(canvas: Canvas) -> Canvas:
+    _memo()[canvas.id] = canvas
+    return canvas
+
+
+def _owned(stmt):
+    return stmt.where(Canvas.user_id == g.current_user.id, Canvas.deleted_at.is_(None))
+
+
+def owned_canvas(canvas_id) -> Canvas | None:
+    """The current user's (not deleted) canvas `canvas_id`, or None."""
+    try:
+        canvas_id = int(canvas_id)
+    except (TypeError, ValueError):
+        return None
+    canvas = _memo().get(canvas_id)
+    if canvas is not None and canvas.deleted_at is None:
+        return canvas
+    canvas = db.session.execute(_owned(select(Canvas).where(Canvas.id == canvas_id))).scalar_one_or_none()
+    return _remember(canvas) if canvas is not None else None
+
+
+def owned_element(element_id: int) -> tuple[CanvasElement, Canvas] | tuple[None, None]:
+    """(element, canvas) if the element is on one of the current user's canvases."""
+    row = db.session.execute(
+        _owned(select(CanvasElement, Canvas).join(Canvas, Canvas.id == CanvasElement.canvas_id))
+        .where(CanvasElement.id == element_id)
+    ).first()
+    if row is None:
+        return None, None
+    return row[0], _remember(row[1])
+
+
+def owned_group(group_id: int) -> tuple[ElementGroup, Canvas] | tuple[None, None]:
+    """(group, canvas) if the group is on one of the current user's canvases."""
+    row = db.session.execute(
+        _owned(select(ElementGroup, Canvas).join(Canvas, Canvas.id == ElementGroup.canvas_id))
+        .where(ElementGroup.id == group_id)
+    ).first()
+    if row is None:
+        return None, None
+    return row[0], _remember(row[1])
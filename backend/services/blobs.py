@@ -0,0 +1,267 @@
+"""Content-addressed storage for canvas images.
+
+Bytes are written once to `<BLOB_STORAGE_DIR>/<aa>/<bb>/<sha256>` and described
+by a `Blob` row. Image elements reference them as
+`data = {"blob": <sha256>, "url": "/api/blobs/<sha256>"}` instead of carrying an
+inline base64 data URL, so element lists, snapshots and PATCHes stay small.
+
+Thumbnails are generated on demand with Pillow (optional) and cached on disk next
+to the originals.
+"""
+import base64
+import binascii
+import hashlib
+import io
+import json
+import os
+import tempfile
+from time import time
+
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models.blob import Blob
+
+try:
+    from PIL import Image
+    PIL_ENABLED = True
+except ImportError:
+    PIL_ENABLED = False
+
+CHUNK_SIZE = 64 * 1024
+THUMBNAIL_SIZES = (64, 128, 256, 512)
+
+# Magic-number prefixes of the image formats we accept
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
+class BlobError(ValueError):
+    """Raised for uploads that can't be stored (too large, not an image, ...)."""
+
+
+def sniff_content_type(head: bytes) -> str | None:
+    for sig, ctype in _SIGNATURES:
+        if head.startswith(sig):
+            return ctype
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def storage_dir() -> str:
+    return current_app.config.get("BLOB_STORAGE_DIR") or os.path.join(current_app.instance_path, "blobs")
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(storage_dir(), sha256[:2], sha256[2:4], sha256)
+
+
+def thumbnail_path(sha256: str, size: int) -> str:
+    return os.path.join(storage_dir(), "thumbs", sha256[:2], f"{sha256}_{size}")
+
+
+def blob_url(sha256: str) -> str:
+    return f"/api/blobs/{sha256}"
+
+
+def _write_file(stream) -> dict:
+    """Copy a stream into the store, hashing as it goes; returns the file's metadata.
+
+    The bytes go through a temp file in the storage directory, so memory stays
+    flat regardless of upload size. No database rows are touched.
+    """
+    max_bytes = int(current_app.config.get("BLOB_MAX_BYTES") or 0)
+    root = storage_dir()
+    os.makedirs(root, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    fd, tmp_path = tempfile.mkstemp(dir=root, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if len(head) < 16:
+                    head += chunk[:16 - len(head)]
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise BlobError(f"File exceeds the {max_bytes} byte limit")
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        if size == 0:
+            raise BlobError("Empty upload")
+        content_type = sniff_content_type(head)
+        if not content_type:
+            raise BlobError("Unsupported file type; upload a PNG, JPEG, GIF or WebP image")
+
+        sha256 = digest.hexdigest()
+        final_path = blob_path(sha256)
+        if os.path.exists(final_path):
+            os.unlink(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    width = height = None
+    if PIL_ENABLED:
+        try:
+            with Image.open(final_path) as im:
+                width, height = im.size
+        except Exception:
+            pass
+    return {"sha256": sha256, "content_type": content_type, "size": size, "width": width, "height": height}
+
+
+def store_stream(stream, user_id: int | None = None) -> Blob:
+    """Store an image from a file-like object, deduplicating by SHA-256.
+
+    Adds the `Blob` row to the session if it is new; the caller commits.
+    """
+    info = _write_file(stream)
+    blob = db.session.get(Blob, info["sha256"])
+    if blob:
+        return blob
+    blob = Blob(created_by=user_id, **info)
+    try:
+        with db.session.begin_nested():
+            db.session.add(blob)
+    except IntegrityError:
+        # Same bytes uploaded concurrently; the other request's row is equivalent
+        blob = db.session.get(Blob, info["sha256"])
+    return blob
+
+
+def store_bytes(data: bytes, user_id: int | None = None) -> Blob:
+    return store_stream(io.BytesIO(data), user_id)
+
+
+def decode_data_url(url: str) -> bytes | None:
+    """Return the bytes of a base64 `data:image/...` URL, or None if it isn't one."""
+    if not isinstance(url, str) or not url.startswith("data:image/"):
+        return None
+    header, sep, payload = url.partition(",")
+    if not sep or not header.endswith(";base64"):
+        return None
+    try:
+        return base64.b64decode(payload, validate=False)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def externalize_image_data(payload, user_id: int | None = None):
+    """Move an inline data URL in an element's `data.url` into the blob store.
+
+    Returns the (possibly rewritten) payload. Anything that isn't an inline image
+    is returned unchanged.
+    """
+    if not isinstance(payload, dict):
+        return payload
+    raw = decode_data_url(payload.get("url"))
+    if raw is None:
+        return payload
+    try:
+        blob = store_bytes(raw, user_id)
+    except BlobError:
+        return payload
+    return {**payload, "blob": blob.sha256, "url": blob_url(blob.sha256)}
+
+
+def thumbnail_size_for(requested: int) -> int:
+    """Snap a requested width to one of THUMBNAIL_SIZES so the disk cache stays bounded."""
+    for size in THUMBNAIL_SIZES:
+        if requested <= size:
+            return size
+    return THUMBNAIL_SIZES[-1]
+
+
+def get_thumbnail(blob: Blob, size: int) -> tuple[str, str] | None:
+    """Return (path, mimetype) of a thumbnail no wider/taller than `size`.
+
+    Generated on first request and cached on disk. Returns None when Pillow is
+    not installed, the image is already small enough, or Pillow can't decode it
+    (truncated, corrupt or a decompression bomb); callers serve the original then.
+    """
+    if not PIL_ENABLED:
+        return None
+    if blob.width and blob.height and max(blob.width, blob.height) <= size:
+        return None
+    path = thumbnail_path(blob.sha256, size)
+    # Keep alpha for formats that may have it
+    fmt, mimetype = ("PNG", "image/png") if blob.content_type in ("image/png", "image/gif", "image/webp") else ("JPEG", "image/jpeg")
+    if os.path.exists(path):
+        return path, mimetype
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".thumb-")
+    try:
+        with os.fdopen(fd, "wb") as out, Image.open(blob_path(blob.sha256)) as im:
+            im.thumbnail((size, size))
+            if fmt == "JPEG" and im.mode not in ("RGB", "L"):
+                im = im.convert("RGB")
+            im.save(out, format=fmt, optimize=True)
+        os.replace(tmp_path, path)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        print(f"Thumbnail of blob {blob.sha256} failed:", e)
+        return None
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return path, mimetype
+
+
+def extract_inline_images(conn) -> int:
+    """Migration: move inline data URLs in image elements into the blob store.
+
+    Runs on the schema connection (see `schema.BACKFILLS`), one element at a time
+    so large images are never all in memory. Idempotent; rows already holding a
+    blob reference don't match. Returns the number of elements rewritten.
+    """
+    ids = [r[0] for r in conn.execute(text(
+        "SELECT id FROM canvas_element WHERE type = 'image' AND data LIKE '%data:image/%'"
+    ))]
+    rewritten = 0
+    for element_id in ids:
+        raw, user_id = conn.execute(text(
+            "SELECT e.data, c.user_id FROM canvas_element e JOIN canvas c ON c.id = e.canvas_id "
+            "WHERE e.id = :id"
+        ), {"id": element_id}).one()
+        try:
+            data = json.loads(raw) if isinstance(raw, str) else raw
+        except ValueError:
+            continue
+        inline = decode_data_url(data.get("url")) if isinstance(data, dict) else None
+        if inline is None:
+            continue
+        try:
+            info = _write_file(io.BytesIO(inline))
+        except BlobError:
+            continue
+        exists = conn.execute(
+            text("SELECT 1 FROM blobs WHERE sha256 = :sha256"), {"sha256": info["sha256"]}
+        ).first()
+        if not exists:
+            conn.execute(
+                Blob.__table__.insert(),
+                {**info, "created_by": user_id, "created_at": int(time())},
+            )
+        data = {**data, "blob": info["sha256"], "url": blob_url(info["sha256"])}
+        conn.execute(
+            text("UPDATE canvas_element SET data = :data WHERE id = :id"),
+            {"id": element_id, "data": json.dumps(data)},
+        )
+        rewritten += 1
+    return rewritten
@@ -0,0 +1,186 @@
+"""Per-canvas change feed.
+
+Routes call `record_change()` before committing an element or group write. The
+change is stamped with the canvas' new revision and held on the session until the
+transaction commits; only then is it published to in-process subscribers, so
+clients never see writes that were rolled back.
+
+Each subscriber gets a bounded queue. A subscriber that falls behind is cut off
+and told to resync (reload the full element list) rather than letting its queue
+grow without limit. A short per-canvas history lets reconnecting clients resume
+from the last revision they saw, as long as it holds every revision since then;
+otherwise they are told to resync.
+
+The broker and its history are per process. When several server processes
+share the database, the change-feed route also polls the canvas revision
+(`CHANGE_FEED_POLL_INTERVAL`) and tells its client to resync when another
+process committed changes; those changes are never streamed individually.
+"""
+import bisect
+from queue import Empty, Full, Queue
+from threading import Lock
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from extensions import db
+from services.revisions import bump_revision
+
+SUBSCRIBER_QUEUE_SIZE = 256
+HISTORY_SIZE = 512
+
+_SESSION_KEY = "pending_canvas_changes"
+
+# Sentinel pushed to a subscriber whose queue overflowed
+RESYNC = {"type": "resync"}
+# Sentinel pushed to every subscriber when the process starts draining
+CLOSED = {"type": "closed"}
+
+
+class Subscription:
+    def __init__(self, canvas_id: int, maxsize: int):
+        self.canvas_id = canvas_id
+        self.queue: Queue = Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def get(self, timeout: float):
+        """Return the next event, or None if nothing arrived within `timeout`."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except Empty:
+            return None
+
+
+class ChangeBroker:
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE, history_size: int = HISTORY_SIZE):
+        self.queue_size = queue_size
+        self.history_size = history_size
+        self._lock = Lock()
+        self._subscribers: dict[int, set[Subscription]] = {}
+        # canvas_id -> (revisions, events), both kept sorted by revision
+        self._history: dict[int, tuple[list[int], list[dict]]] = {}
+
+    def subscribe(self, canvas_id: int, since: int | None = None, current: int | None = None) -> Subscription:
+        """Register a subscriber, queueing any history newer than `since`.
+
+        `current` is the canvas revision the caller read from the database. If the
+        retained history doesn't hold every revision in `(since, current]` (it
+        was trimmed, the process restarted, or the commits happened in another
+        process), the subscriber starts with a resync event instead.
+        """
+        sub = Subscription(canvas_id, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(canvas_id, set()).add(sub)
+            if since is None:
+                return sub
+            revisions, events = self._history.get(canvas_id, ([], []))
+            start = bisect.bisect_right(revisions, since)
+            backlog = events[start:]
+            missing = False
+            if current is not None and current > since:
+                end = bisect.bisect_right(revisions, current)
+                missing = len(set(revisions[start:end])) < current - since
+            if missing or len(backlog) > self.queue_size:
+                sub.queue.put_nowait(RESYNC)
+            else:
+                for ev in backlog:
+                    sub.queue.put_nowait(ev)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._subscribers.get(sub.canvas_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.canvas_id]
+
+    def publish(self, canvas_id: int, ev: dict) -> None:
+        with self._lock:
+            revisions, events = self._history.setdefault(canvas_id, ([], []))
+            # Commits on different threads can finish out of order; keep history sorted
+            idx = bisect.bisect_right(revisions, ev["revision"])
+            revisions.insert(idx, ev["revision"])
+            events.insert(idx, ev)
+            if len(revisions) > self.history_size:
+                del revisions[0]
+                del events[0]
+
+            for sub in list(self._subscribers.get(canvas_id, ())):
+                if sub.overflowed:
+                    continue
+                try:
+                    sub.queue.put_nowait(ev)
+                except Full:
+                    sub.overflowed = True
+                    # Make room for the resync marker; the client reloads anyway
+                    try:
+                        while True:
+                            sub.queue.get_nowait()
+                    except Empty:
+                        pass
+                    sub.queue.put_nowait(RESYNC)
+
+    def close_all(self) -> None:
+        """End every open subscription (the process is shutting down)."""
+        with self._lock:
+            for subs in self._subscribers.values():
+                for sub in subs:
+                    try:
+                        while True:
+                            sub.queue.get_nowait()
+                    except Empty:
+                        pass
+                    sub.queue.put_nowait(CLOSED)
+
+    def forget(self, canvas_id: int) -> None:
+        """Drop retained history for a canvas (e.g. once it is deleted)."""
+        with self._lock:
+            self._history.pop(canvas_id, None)
+
+
+broker = ChangeBroker()
+
+
+def record_change(canvas_id: int, kind: str, op: str, data: dict) -> int:
+    """Bump the canvas revision and queue a change event for publishing on commit.
+
+    `kind` is "element" or "group"; `op` is "created", "updated" or "deleted".
+    Returns the new revision.
+    """
+    return record_changes(canvas_id, kind, op, [data])
+
+
+def record_changes(canvas_id: int, kind: str, op: str, items: list[dict]) -> int:
+    """Like `record_change` for a batch: one revision bump, one event per item.
+
+    Partial updates (e.g. flushed geometry) carry only `id` and the changed fields.
+    """
+    revision = bump_revision(canvas_id)
+    queue_changes(canvas_id, revision, kind, op, items)
+    return revision
+
+
+def queue_changes(canvas_id: int, revision: int, kind: str, op: str, items: list[dict]) -> None:
+    """Queue events for a revision the caller already bumped (see `record_changes`)."""
+    pending = db.session.info.setdefault(_SESSION_KEY, [])
+    for data in items:
+        pending.append({
+            "type": "change",
+            "canvas_id": canvas_id,
+            "revision": revision,
+            "kind": kind,
+            "op": op,
+            "data": data,
+        })
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session):
+    for ev in session.info.pop(_SESSION_KEY, []):
+        broker.publish(ev["canvas_id"], ev)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_SESSION_KEY, None)
@@ -0,0 +1,194 @@
+"""Resumable chat streams.
+
+A chat reply is generated on a background thread (a "run"), not inside the
+HTTP response. The run appends every SSE event to a ring buffer
+(`CHAT_STREAM_BUFFER` events) and keeps the full reply text. Responses are
+subscribers: they replay the buffer from a position and then follow the run
+live. So a client whose connection drops can reconnect with `Last-Event-ID`
+and pick up where it left off, while the upstream generation keeps going and
+is paid for only once.
+
+Side work for a reply, such as concept-card generation, runs on a small
+shared pool (`CHAT_CARD_WORKERS` threads, see `submit()`) next to the
+generation, and emits its result into the same run.
+
+Event ids are `<stream id>:<seq>`. A reconnect that asks for events already
+pushed out of the ring buffer gets one `resync` event with the full text so
+far, then continues live. Finished runs are kept for `CHAT_STREAM_RETAIN`
+seconds. Like the change feed, runs live in one process; a reconnect that
+lands on another worker gets the partial text the run checkpoints to the
+assistant `ChatMessage` every `CHAT_CHECKPOINT_INTERVAL` seconds instead, and
+polls until the final save clears the message's `is_generating` flag.
+"""
+import json
+import secrets
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import monotonic
+
+# Seconds between SSE keep-alive comments while a run is quiet (e.g. waiting for the first token)
+HEARTBEAT = 15
+
+
+class ChatRun:
+    def __init__(self, stream_id: str, user_id: int, message_id: int | None, buffer_size: int):
+        self.id = stream_id
+        self.user_id = user_id
+        self.message_id = message_id
+        self.text = ""
+        self.seq = 0
+        self.done = False
+        self.finished_at = None
+        self._events: deque[tuple[int, str]] = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._last_checkpoint = monotonic()
+
+    # ---------------------------
+    # Producer side
+    # ---------------------------
+    def emit(self, data, event: str | None = None, content: str | None = None) -> None:
+        """Append one event (`data` is JSON-encoded unless it's a str); `content` extends the reply text."""
+        payload = data if isinstance(data, str) else json.dumps(data)
+        with self._cond:
+            if content:
+                self.text += content
+            self.seq += 1
+            self._events.append((self.seq, _format(self.id, self.seq, payload, event)))
+            self._cond.notify_all()
+
+    def add_content(self, content: str) -> None:
+        self.emit({"content": content}, content=content)
+
+    def finish(self) -> None:
+        with self._cond:
+            if self.done:
+                return
+            self.seq += 1
+            self._events.append((self.seq, _format(self.id, self.seq, "[DONE]")))
+            self.done = True
+            self.finished_at = monotonic()
+            self._cond.notify_all()
+
+    def checkpoint_due(self, interval: float) -> bool:
+        now = monotonic()
+        if now - self._last_checkpoint < interval:
+            return False
+        self._last_checkpoint = now
+        return True
+
+    # ---------------------------
+    # Subscriber side
+    # ---------------------------
+    def subscribe(self, after: int = 0):
+        """Yield SSE strings for every event after `after`, then follow the run until it's done."""
+        if after == 0:
+            yield _format(self.id, 0, json.dumps({"stream_id": self.id, "message_id": self.message_id}), "stream")
+        while True:
+            with self._cond:
+                if self.seq <= after and not self.done:
+                    self._cond.wait(HEARTBEAT)
+                if self._events and self._events[0][0] > after + 1:
+                    # Some events were pushed out of the ring buffer: send the text so far instead
+                    upto = self.seq - 1 if self.done else self.seq
+                    pending = [_format(self.id, upto, json.dumps({"text": self.text}), "resync")]
+                    pending += [text for seq, text in self._events if seq > upto]
+                else:
+                    pending = [text for seq, text in self._events if seq > after]
+                after = self.seq
+                done = self.done
+            yield from pending
+            if done:
+                return
+            if not pending:
+                yield ": keep-alive\n\n"
+
+
+def _format(stream_id: str, seq: int, payload: str, event: str | None = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}id: {stream_id}:{seq}\ndata: {payload}\n\n"
+
+
+def parse_event_id(value: str | None) -> tuple[str | None, int]:
+    """'<stream id>:<seq>' -> (stream id, seq); anything else -> (None, 0)."""
+    stream_id, sep, seq = (value or "").strip().rpartition(":")
+    if not sep or not stream_id:
+        return None, 0
+    try:
+        return stream_id, max(0, int(seq))
+    except ValueError:
+        return None, 0
+
+
+def message_id_of(stream_id: str) -> int | None:
+    """Stream ids start with the assistant message id (`<id>.<random>`), so any worker can find the row."""
+    head, sep, _ = stream_id.partition(".")
+    return int(head) if sep and head.isdigit() else None
+
+
+class ChatStreamRegistry:
+    """Flask extension: runs by stream id, for the lifetime of one process."""
+
+    def __init__(self):
+        self.buffer_size = 512
+        self.retain = 120.0
+        self.checkpoint_interval = 1.0
+        self.card_workers = 4
+        self._lock = threading.Lock()
+        self._runs: dict[str, ChatRun] = {}
+        self._pool: ThreadPoolExecutor | None = None
+
+    def init_app(self, app):
+        self.buffer_size = int(app.config.get("CHAT_STREAM_BUFFER", 512))
+        self.retain = float(app.config.get("CHAT_STREAM_RETAIN", 120))
+        self.checkpoint_interval = float(app.config.get("CHAT_CHECKPOINT_INTERVAL", 1.0))
+        self.card_workers = max(1, int(app.config.get("CHAT_CARD_WORKERS", 4)))
+
+    def start(self, app, user_id: int, message_id: int | None, produce) -> ChatRun:
+        """Create a run and call `produce(run)` on a background thread inside an app context."""
+        stream_id = secrets.token_urlsafe(12)
+        if message_id is not None:
+            stream_id = f"{message_id}.{stream_id}"
+        run = ChatRun(stream_id, user_id, message_id, self.buffer_size)
+        with self._lock:
+            self._reap()
+            self._runs[stream_id] = run
+
+        def target():
+            try:
+                with app.app_context():
+                    produce(run)
+            except Exception as e:
+                print("Chat stream error:", e)
+            finally:
+                run.finish()
+
+        threading.Thread(target=target, name=f"chat-{stream_id}", daemon=True).start()
+        return run
+
+    def submit(self, app, fn, *args) -> Future:
+        """Run `fn(*args)` on the shared side-work pool, inside an app context."""
+        def task():
+            with app.app_context():
+                return fn(*args)
+
+        with self._lock:
+            if self._pool is None:
+                # Created on first use, so forked workers each build their own
+                self._pool = ThreadPoolExecutor(self.card_workers, thread_name_prefix="chat-side")
+        return self._pool.submit(task)
+
+    def get(self, stream_id: str, user_id: int) -> ChatRun | None:
+        with self._lock:
+            self._reap()
+            run = self._runs.get(stream_id)
+        return run if run is not None and run.user_id == user_id else None
+
+    def _reap(self):
+        now = monotonic()
+        expired = [sid for sid, run in self._runs.items() if run.done and now - run.finished_at > self.retain]
+        for sid in expired:
+            del self._runs[sid]
+
+
+chat_streams = ChatStreamRegistry()
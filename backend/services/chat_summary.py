@@ -0,0 +1,116 @@
+"""Rolling summaries of long chats.
+
+Instead of replaying the raw history, a chat request sends the chat's summary
+plus the messages after it (`context_for()`). Once more than
+`CHAT_SUMMARY_THRESHOLD` messages aren't covered by the summary, the request
+queues a `summarize_chat` job. The job folds everything except the last
+`CHAT_RECENT_MESSAGES` into the summary with one model call. Prompts stay
+between "summary + recent" and "summary + threshold" messages however long the
+chat gets, and the model call is never on a request's critical path.
+
+`CHAT_SUMMARY_THRESHOLD = 0` turns summarization off; requests then send the
+last `CHAT_HISTORY_MESSAGES` raw messages, as before.
+"""
+from time import time
+
+from flask import current_app
+from sqlalchemy import func, or_, select, update
+
+from extensions import db
+from models.chat import Chat
+from models.chat_message import ChatMessage
+from services.jobs import enqueue, handler
+
+# Raw messages sent when summarization is off
+CHAT_HISTORY_MESSAGES = 20
+# A queued summary that hasn't landed after this many seconds may be requested again
+SUMMARY_REQUEST_TIMEOUT = 300
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a study conversation between a learner and the Learnable AI. "
+    "Merge the new messages into the existing summary. Keep the topics covered, what the learner "
+    "understood or struggled with, definitions and examples worth remembering, and open questions. "
+    "Write plain prose in at most {words} words. Return only the summary."
+)
+
+
+def context_for(chat: Chat) -> tuple[str | None, list[dict]]:
+    """(summary, recent messages oldest first) to send with the next request in `chat`.
+
+    Queues a summarize_chat job (on the caller's session) when the uncovered
+    history, counting the turn about to be added, passes the threshold.
+    """
+    threshold = int(current_app.config.get("CHAT_SUMMARY_THRESHOLD", 0) or 0)
+    limit = threshold or CHAT_HISTORY_MESSAGES
+    stmt = select(ChatMessage.text, ChatMessage.is_response).where(ChatMessage.chat_id == chat.id)
+    if threshold and chat.summary_through:
+        stmt = stmt.where(ChatMessage.id > chat.summary_through)
+    rows = db.session.execute(stmt.order_by(ChatMessage.id.desc()).limit(limit + 1)).all()
+    # This turn adds the user message and the reply
+    if threshold and len(rows) + 2 > threshold:
+        request_summary(chat.id)
+    messages = [{"text": r.text or "", "is_response": bool(r.is_response)} for r in reversed(rows[:limit])]
+    return (chat.summary if threshold else None), messages
+
+
+def request_summary(chat_id: int) -> bool:
+    """Queue a summarize_chat job unless one is already pending for this chat."""
+    now = int(time())
+    claimed = db.session.execute(
+        update(Chat)
+        .where(Chat.id == chat_id, or_(Chat.summary_requested_at.is_(None),
+                                       Chat.summary_requested_at < now - SUMMARY_REQUEST_TIMEOUT))
+        .values(summary_requested_at=now, updated_at=Chat.updated_at)
+    ).rowcount
+    if claimed:
+        enqueue("summarize_chat", {"chat_id": chat_id}, max_attempts=3)
+    return bool(claimed)
+
+
+def summarize(previous: str | None, messages: list) -> str:
+    """One model call: the previous summary with `messages` folded in."""
+    from routes.openai_routes import MODEL, get_client
+
+    words = int(current_app.config.get("CHAT_SUMMARY_WORDS", 250))
+    transcript = "\n\n".join(
+        f"{'Assistant' if m.is_response else 'Learner'}: {(m.text or '').strip()}" for m in messages
+    )
+    resp = get_client().chat.completions.create(
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": SUMMARY_PROMPT.format(words=words)},
+            {"role": "user", "content": f"Existing summary:\n{previous or '(none)'}\n\nNew messages:\n{transcript}"},
+        ],
+        temperature=0.2,
+        max_tokens=words * 2,
+    )
+    return (resp.choices[0].message.content or "").strip()
+
+
+@handler("summarize_chat")
+def summarize_chat(payload: dict, ctx) -> None:
+    chat_id = int(payload["chat_id"])
+    keep = int(current_app.config.get("CHAT_RECENT_MESSAGES", 8))
+    chat = db.session.get(Chat, chat_id)
+    if chat is None:
+        return
+    through = chat.summary_through or 0
+    rows = db.session.execute(
+        select(ChatMessage.id, ChatMessage.text, ChatMessage.is_response)
+        .where(ChatMessage.chat_id == chat_id, ChatMessage.id > through)
+        .order_by(ChatMessage.id)
+    ).all()
+    older = rows[:-keep] if keep else rows
+    # Leave the reply being streamed right now (still empty) for the next round
+    while older and older[-1].is_response and not (older[-1].text or "").strip():
+        older = older[:-1]
+    summary = summarize(chat.summary, older) if older else chat.summary
+
+    # Don't overwrite a newer summary written by another worker in the meantime
+    db.session.execute(
+        update(Chat)
+        .where(Chat.id == chat_id, func.coalesce(Chat.summary_through, 0) == through)
+        .values(summary=summary, summary_through=older[-1].id if older else chat.summary_through,
+                summary_requested_at=None, updated_at=Chat.updated_at)
+    )
+    db.session.commit()
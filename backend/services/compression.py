@@ -0,0 +1,192 @@
+"""Response compression negotiated from `Accept-Encoding`.
+
+JSON, NDJSON, SVG and other text responses of at least `COMPRESS_MIN_SIZE`
+bytes are encoded with the best codec the client accepts: zstd (needs
+`zstandard`), brotli (needs `brotli`), then gzip. Streamed responses are
+compressed chunk by chunk. `text/event-stream` and responses that already
+have a Content-Encoding (the gzip export) are left alone, as are file
+responses (`send_file`).
+
+A response with an ETag gets the codec appended to its tag (`"<tag>-br"`),
+and its compressed body is kept in a bounded LRU keyed by path, tag and
+codec, so repeat downloads of an unchanged resource skip recompression.
+Conditional requests have the suffix stripped before the route sees them.
+"""
+import gzip
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+    BROTLI_ENABLED = True
+except ImportError:
+    BROTLI_ENABLED = False
+
+try:
+    import zstandard
+    ZSTD_ENABLED = True
+except ImportError:
+    ZSTD_ENABLED = False
+
+COMPRESSIBLE_TYPES = frozenset({
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "application/x-learnable-elements",
+})
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+_ETAG_SUFFIX = re.compile(r'-(?:zstd|br|gzip)"')
+
+
+def available_encodings() -> list[str]:
+    """Codecs this process can produce, most preferred first."""
+    encodings = []
+    if ZSTD_ENABLED:
+        encodings.append("zstd")
+    if BROTLI_ENABLED:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_stream(chunks, encoding: str):
+    """Compress an iterable of byte chunks incrementally."""
+    if encoding == "zstd":
+        comp = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        process, finish = comp.compress, comp.flush
+    elif encoding == "br":
+        comp = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, finish = comp.process, comp.finish
+    else:
+        comp = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        process, finish = comp.compress, comp.flush
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        out = process(chunk)
+        if out:
+            yield out
+    yield finish()
+
+
+class ResponseCompressor:
+    """Flask extension: registers the request hooks on `init_app`."""
+
+    def __init__(self):
+        self.min_size = 1024
+        self.cache_bytes = 0
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_size = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.min_size = int(app.config.get("COMPRESS_MIN_SIZE", 1024))
+        self.cache_bytes = int(app.config.get("COMPRESS_CACHE_BYTES", 32 * 1024 * 1024))
+        app.before_request(self._strip_etag_suffix)
+        app.after_request(self._compress_response)
+
+    # ---------------------------
+    # Negotiation
+    # ---------------------------
+    def choose_encoding(self) -> str | None:
+        accepted = request.accept_encodings
+        best, best_q = None, 0.0
+        for encoding in available_encodings():
+            q = accepted[encoding]
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def _compressible(self, response) -> bool:
+        if request.method == "HEAD" or response.direct_passthrough:
+            return False
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if "Content-Encoding" in response.headers:
+            return False
+        mimetype = response.mimetype or ""
+        if mimetype == "text/event-stream":
+            return False
+        return mimetype in COMPRESSIBLE_TYPES or mimetype.startswith("text/")
+
+    # ---------------------------
+    # Hooks
+    # ---------------------------
+    def _strip_etag_suffix(self):
+        header = request.environ.get("HTTP_IF_NONE_MATCH")
+        if header:
+            request.environ["HTTP_IF_NONE_MATCH"] = _ETAG_SUFFIX.sub('"', header)
+
+    def _compress_response(self, response):
+        if not self._compressible(response):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = self.choose_encoding()
+        if not encoding:
+            return response
+
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding)
+            response.headers.pop("Content-Length", None)
+            response.headers["Content-Encoding"] = encoding
+            return response
+
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        etag, weak = response.get_etag()
+        if etag:
+            key = (request.full_path, etag, encoding)
+            body = self._cache_get(key)
+            if body is None:
+                body = compress(data, encoding)
+                self._cache_put(key, body)
+            response.set_etag(f"{etag}-{encoding}", weak=weak)
+        else:
+            body = compress(data, encoding)
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    # ---------------------------
+    # Compressed body cache
+    # ---------------------------
+    def _cache_get(self, key):
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+            return body
+
+    def _cache_put(self, key, body: bytes) -> None:
+        if len(body) > self.cache_bytes:
+            return
+        with self._lock:
+            old = self._cache.pop(key, None)
+            if old is not None:
+                self._cache_size -= len(old)
+            self._cache[key] = body
+            self._cache_size += len(body)
+            while self._cache_size > self.cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_size -= len(evicted)
+
+
+compression = ResponseCompressor()
@@ -0,0 +1,168 @@
+"""Small durable job queue backed by the `jobs` table.
+
+Jobs are enqueued in the caller's transaction, so they exist exactly when the
+change that needs them commits. Worker threads claim one job at a time with a
+conditional UPDATE (safe across threads and processes), holding it for
+`JOB_VISIBILITY_TIMEOUT` seconds. A worker that dies mid-job simply lets the
+lease expire and another worker picks the job up again, so handlers must be
+idempotent. Long handlers call `JobContext.heartbeat()` to extend the lease.
+
+Failed jobs are retried with exponential backoff up to `max_attempts`.
+"""
+import threading
+from time import time
+
+from sqlalchemy import or_, and_, update
+
+from extensions import db
+from models.job import Job
+
+_handlers = {}
+
+
+def handler(kind: str):
+    """Register a function `fn(payload: dict, ctx: JobContext)` for a job kind."""
+    def decorator(fn):
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+def enqueue(kind: str, payload: dict, max_attempts: int = 5) -> Job:
+    """Add a job to the current session; it becomes visible to workers on commit."""
+    job = Job(kind=kind, payload=payload, max_attempts=max_attempts)
+    db.session.add(job)
+    job_queue.notify()
+    return job
+
+
+class JobContext:
+    def __init__(self, queue: "JobQueue", job_id: int):
+        self.queue = queue
+        self.job_id = job_id
+
+    def heartbeat(self) -> None:
+        """Extend this job's lease; call between chunks of long-running work."""
+        db.session.execute(
+            update(Job)
+            .where(Job.id == self.job_id)
+            .values(locked_until=int(time()) + self.queue.visibility_timeout)
+        )
+        db.session.commit()
+
+
+class JobQueue:
+    def __init__(self):
+        self.app = None
+        self.workers = 0
+        self.visibility_timeout = 60
+        self.poll_interval = 1.0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = int(app.config.get("JOB_WORKERS", 1) or 0)
+        self.visibility_timeout = int(app.config.get("JOB_VISIBILITY_TIMEOUT", 60))
+        self.poll_interval = float(app.config.get("JOB_POLL_INTERVAL", 1.0))
+
+    def start(self):
+        """Start worker threads (no-op if already running or JOB_WORKERS is 0)."""
+        if self._threads or self.workers <= 0:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float | None = None):
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def after_fork(self):
+        """Forget the parent's threads and events in a freshly forked worker process."""
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def notify(self):
+        self._wake.set()
+
+    # ---------------------------
+    # Claiming and running
+    # ---------------------------
+    def claim(self) -> Job | None:
+        """Atomically take the oldest runnable job, or return None."""
+        now = int(time())
+        runnable = or_(
+            and_(Job.status == "queued", Job.run_after <= now),
+            and_(Job.status == "running", Job.locked_until < now),
+        )
+        while True:
+            job_id = db.session.query(Job.id).filter(runnable).order_by(Job.id.asc()).limit(1).scalar()
+            if job_id is None:
+                db.session.rollback()
+                return None
+            claimed = db.session.execute(
+                update(Job)
+                .where(Job.id == job_id, runnable)
+                .values(
+                    status="running",
+                    attempts=Job.attempts + 1,
+                    locked_until=now + self.visibility_timeout,
+                )
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return db.session.get(Job, job_id)
+            # Another worker won the race; look again
+
+    def run_one(self) -> bool:
+        """Claim and run a single job. Returns False if there was nothing to do."""
+        job = self.claim()
+        if job is None:
+            return False
+        job_id, kind, payload = job.id, job.kind, dict(job.payload or {})
+        fn = _handlers.get(kind)
+        try:
+            if fn is None:
+                raise RuntimeError(f"No handler registered for job kind '{kind}'")
+            fn(payload, JobContext(self, job_id))
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(Job, job_id)
+            job.last_error = f"{type(e).__name__}: {e}"[:2000]
+            job.locked_until = None
+            if job.attempts >= job.max_attempts:
+                job.status = "failed"
+            else:
+                job.status = "queued"
+                job.run_after = int(time()) + min(2 ** job.attempts, 300)
+            db.session.commit()
+            print(f"Job {job_id} ({kind}) failed:", e)
+            return True
+        job = db.session.get(Job, job_id)
+        job.status = "done"
+        job.locked_until = None
+        db.session.commit()
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    worked = self.run_one()
+            except Exception as e:
+                print("Job worker error:", e)
+                worked = False
+            if not worked:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+
+job_queue = JobQueue()
@@ -0,0 +1,38 @@
+"""Process lifecycle hooks for the pre-fork production server.
+
+`gunicorn.conf.py` loads the app once in the master (`preload_app`) and forks
+workers from it. Each worker then calls `after_fork()` to drop the SQLAlchemy
+connections inherited from the master (pools are not fork-safe) and start its
+own job workers; its password hashing pool is built on first use. On shutdown
+or reload a worker calls `begin_drain()`: the readiness probe starts failing
+and open change-feed streams end with a `reconnect` event, while other
+in-flight requests (e.g. chat streams) are left to finish within gunicorn's
+graceful timeout.
+"""
+import threading
+
+from extensions import db
+from services.change_feed import broker
+from services.jobs import job_queue
+from services.passwords import passwords
+
+draining = threading.Event()
+
+
+def after_fork(app) -> None:
+    """Run once in each freshly forked worker process."""
+    with app.app_context():
+        for engine in db.engines.values():
+            # Forget the parent's pooled connections without closing its sockets
+            engine.dispose(close=False)
+    job_queue.after_fork()
+    passwords.after_fork()
+    job_queue.start()
+
+
+def begin_drain() -> None:
+    """Stop reporting ready and end long-lived change-feed streams."""
+    if draining.is_set():
+        return
+    draining.set()
+    broker.close_all()
@@ -0,0 +1,146 @@
+"""Level-of-detail tile summaries for zoomed-out canvases.
+
+A tile at `level` covers `TILE_SIZE * 2**level` world units per side; level 0 is
+roughly one screen tile at 100% zoom and every level up halves the scale. Each
+tile is divided into a `GRID x GRID` grid and elements are bucketed by the cell
+containing their centre, so a response never holds more than `GRID**2`
+clusters regardless of how many elements the canvas has.
+
+Whole levels are computed in one pass over the canvas geometry and cached per
+`(canvas_id, level)` together with the canvas revision they were built from. Any
+element/group write bumps the revision, which invalidates the entry.
+"""
+from collections import Counter, OrderedDict
+from math import floor
+from threading import Lock
+
+from extensions import db
+from models.canvas_element import CanvasElement
+
+TILE_SIZE = 512
+GRID = 16
+MAX_LEVEL = 12
+
+# Same fallbacks the frontend uses when width/height are unset
+DEFAULT_WIDTH = 200.0
+DEFAULT_HEIGHT = 120.0
+
+_CACHE_MAX_ENTRIES = 256
+_cache: "OrderedDict[tuple[int, int], tuple[int, dict]]" = OrderedDict()
+_cache_lock = Lock()
+
+
+def tile_span(level: int) -> float:
+    return float(TILE_SIZE * (2 ** level))
+
+
+def _bounds(row):
+    el_type, x, y, width, height, _bgcolor, lsx, lsy, lex, ley = row
+    if el_type == "line" and None not in (lsx, lsy, lex, ley):
+        return min(lsx, lex), min(lsy, ley), max(lsx, lex), max(lsy, ley)
+    x = float(x or 0.0)
+    y = float(y or 0.0)
+    w = float(width) if width else DEFAULT_WIDTH
+    h = float(height) if height else DEFAULT_HEIGHT
+    return x, y, x + w, y + h
+
+
+def _load_geometry(canvas_id: int):
+    return (
+        db.session.query(
+            CanvasElement.type,
+            CanvasElement.x,
+            CanvasElement.y,
+            CanvasElement.width,
+            CanvasElement.height,
+            CanvasElement.bgcolor,
+            CanvasElement.line_start_x,
+            CanvasElement.line_start_y,
+            CanvasElement.line_end_x,
+            CanvasElement.line_end_y,
+        )
+        .filter(CanvasElement.canvas_id == canvas_id)
+        .all()
+    )
+
+
+def build_level(rows, level: int) -> dict:
+    """Bucket element rows into `{(tx, ty): [cluster, ...]}` for one level."""
+    span = tile_span(level)
+    cell = span / GRID
+    cells = {}
+    for row in rows:
+        x0, y0, x1, y1 = _bounds(row)
+        cx = floor(((x0 + x1) / 2.0) / cell)
+        cy = floor(((y0 + y1) / 2.0) / cell)
+        agg = cells.get((cx, cy))
+        if agg is None:
+            agg = cells[(cx, cy)] = {
+                "count": 0,
+                "bbox": [x0, y0, x1, y1],
+                "colors": Counter(),
+                "types": Counter(),
+            }
+        else:
+            bbox = agg["bbox"]
+            if x0 < bbox[0]: bbox[0] = x0
+            if y0 < bbox[1]: bbox[1] = y0
+            if x1 > bbox[2]: bbox[2] = x1
+            if y1 > bbox[3]: bbox[3] = y1
+        agg["count"] += 1
+        agg["colors"][row[5] or "#FFFFFF"] += 1
+        agg["types"][row[0]] += 1
+
+    tiles = {}
+    for (cx, cy), agg in cells.items():
+        key = (cx // GRID, cy // GRID)
+        tiles.setdefault(key, []).append({
+            "count": agg["count"],
+            "bbox": agg["bbox"],
+            "bgcolor": agg["colors"].most_common(1)[0][0],
+            "types": dict(agg["types"]),
+        })
+    return tiles
+
+
+def _get_level(canvas_id: int, revision: int, level: int) -> dict:
+    key = (canvas_id, level)
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None and hit[0] == revision:
+            _cache.move_to_end(key)
+            return hit[1]
+
+    tiles = build_level(_load_geometry(canvas_id), level)
+
+    with _cache_lock:
+        current = _cache.get(key)
+        # Don't clobber an entry built from a newer revision by a concurrent request
+        if current is None or current[0] <= revision:
+            _cache[key] = (revision, tiles)
+            _cache.move_to_end(key)
+        while len(_cache) > _CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return tiles
+
+
+def get_tile(canvas_id: int, revision: int, level: int, tx: int, ty: int) -> dict:
+    span = tile_span(level)
+    clusters = _get_level(canvas_id, revision, level).get((tx, ty), [])
+    return {
+        "canvas_id": canvas_id,
+        "revision": revision,
+        "level": level,
+        "tx": tx,
+        "ty": ty,
+        "bbox": [tx * span, ty * span, (tx + 1) * span, (ty + 1) * span],
+        "element_count": sum(c["count"] for c in clusters),
+        "clusters": clusters,
+    }
+
+
+def invalidate(canvas_id: int) -> None:
+    """Drop every cached level for a canvas (e.g. once it is deleted)."""
+    with _cache_lock:
+        for key in [k for k in _cache if k[0] == canvas_id]:
+            del _cache[key]
@@ -0,0 +1,227 @@
+"""In-process metrics exposed at `/metrics` in Prometheus text format.
+
+Recording is lock-free: every thread writes only to its own shard (plain
+dicts, found through a thread-local), and a scrape sums the shards. When a
+thread ends, its shard is folded into a retired total, so short-lived threads
+don't accumulate. Gauges
+are counters of +1/-1 deltas, so a stream may open on one thread and close
+on another.
+
+Wired in by `init_app()`:
+- request hooks: per-endpoint request counts and latency histograms
+- SQLAlchemy engine events: statements and SQL time per request
+- `chat_stream` / the change feed call `observe()` / `stream_opened()` directly
+  for OpenAI time-to-first-token, stream duration and open SSE streams
+
+Each process keeps its own numbers (under gunicorn, a scrape sees one worker).
+"""
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+from flask import g, request
+from sqlalchemy import event
+
+from extensions import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+STREAM_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# name -> (type, help, buckets)
+METRICS = {
+    "learnable_http_requests_total": ("counter", "HTTP requests by endpoint, method and status.", None),
+    "learnable_http_request_duration_seconds": (
+        "histogram", "Time to produce the response (headers, for streams) by endpoint.", LATENCY_BUCKETS),
+    "learnable_sql_statements_total": ("counter", "SQL statements executed, by endpoint.", None),
+    "learnable_sql_seconds_total": ("counter", "Time spent executing SQL, by endpoint.", None),
+    "learnable_sql_statements_per_request": (
+        "histogram", "SQL statements per request, by endpoint.", COUNT_BUCKETS),
+    "learnable_openai_ttft_seconds": ("histogram", "Chat: time from request to first streamed token.", LATENCY_BUCKETS),
+    "learnable_openai_stream_seconds": ("histogram", "Chat: total duration of the model stream.", STREAM_BUCKETS),
+    "learnable_openai_errors_total": ("counter", "Chat: model requests that failed.", None),
+    "learnable_sse_streams": ("gauge", "Open server-sent-event streams, by kind.", None),
+    "learnable_password_seconds": (
+        "histogram", "Password hashing/verification, including time queued for a worker.", LATENCY_BUCKETS),
+    "learnable_password_rejected_total": ("counter", "Password operations refused because the pool was busy.", None),
+}
+
+
+class _Shard:
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        self.counters: dict = {}
+        self.histograms: dict = {}  # key -> [bucket counts..., +Inf count, sum]
+
+    def merge_into(self, counters: dict, histograms: dict) -> None:
+        for key, v in list(self.counters.items()):
+            counters[key] = counters.get(key, 0.0) + v
+        for key, h in list(self.histograms.items()):
+            acc = histograms.setdefault(key, [0] * len(h))
+            for i, v in enumerate(h):
+                acc[i] += v
+
+
+class _ThreadToken:
+    """Held only by a thread's thread-local, so it's collected when the thread ends."""
+
+
+class Metrics:
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: list[_Shard] = []
+        self._retired = _Shard()  # totals of threads that have ended
+        # Taken when a thread starts or stops recording, and by scrapes. Reentrant because
+        # a finalizer may retire a shard on whichever thread happens to hold it
+        self._shards_lock = threading.RLock()
+        self._sql = threading.local()
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard()
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            token = self._local.token = _ThreadToken()
+            weakref.finalize(token, self._retire, shard).atexit = False
+        return shard
+
+    def _retire(self, shard: _Shard) -> None:
+        with self._shards_lock:
+            self._shards.remove(shard)
+            shard.merge_into(self._retired.counters, self._retired.histograms)
+
+    # ---------------------------
+    # Recording
+    # ---------------------------
+    def inc(self, name: str, labels: tuple = (), value: float = 1.0) -> None:
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, labels: tuple = ()) -> None:
+        buckets = METRICS[name][2]
+        hist = self._shard().histograms
+        key = (name, labels)
+        h = hist.get(key)
+        if h is None:
+            h = hist[key] = [0] * (len(buckets) + 1) + [0.0]
+        h[bisect_left(buckets, value)] += 1
+        h[-1] += value
+
+    def stream_opened(self, kind: str) -> None:
+        self.inc("learnable_sse_streams", (("kind", kind),), 1)
+
+    def stream_closed(self, kind: str) -> None:
+        self.inc("learnable_sse_streams", (("kind", kind),), -1)
+
+    # ---------------------------
+    # Exposition
+    # ---------------------------
+    def render(self) -> str:
+        counters: dict = {}
+        histograms: dict = {}
+        with self._shards_lock:
+            for shard in [self._retired, *self._shards]:
+                shard.merge_into(counters, histograms)
+
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (n, labels), h in sorted(histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(buckets + ("+Inf",), h[:-1]):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', _num(bound)),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_num(h[-1])}")
+                    lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+            else:
+                for (n, labels), v in sorted(counters.items()):
+                    if n == name:
+                        lines.append(f"{name}{_labels(labels)} {_num(v)}")
+        return "\n".join(lines) + "\n"
+
+    # ---------------------------
+    # Flask / SQLAlchemy wiring
+    # ---------------------------
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(db.engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_request(self):
+        g.metrics_start = time.perf_counter()
+        # [statements, seconds] for this request, filled by the engine events on this thread
+        self._sql.current = g.metrics_sql = [0, 0.0]
+
+    def _after_request(self, response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            self._record_request(response.status_code, time.perf_counter() - start)
+        return response
+
+    def _teardown_request(self, exc):
+        # after_request is skipped when a view raises
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            self._record_request(500, time.perf_counter() - start)
+        sql = g.pop("metrics_sql", None)
+        self._sql.current = None
+        if sql is not None:
+            endpoint = (("endpoint", _endpoint()),)
+            self.inc("learnable_sql_statements_total", endpoint, sql[0])
+            self.inc("learnable_sql_seconds_total", endpoint, sql[1])
+            self.observe("learnable_sql_statements_per_request", sql[0], endpoint)
+
+    def _record_request(self, status: int, seconds: float) -> None:
+        endpoint = _endpoint()
+        self.inc("learnable_http_requests_total", (
+            ("endpoint", endpoint), ("method", request.method), ("status", str(status)),
+        ))
+        self.observe("learnable_http_request_duration_seconds", seconds, (("endpoint", endpoint),))
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["metrics_query_start"].pop()
+        current = getattr(self._sql, "current", None)
+        if current is not None:
+            current[0] += 1
+            current[1] += time.perf_counter() - start
+
+
+def _endpoint() -> str:
+    return request.endpoint or "unmatched"
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+    return "{" + inner + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(v) -> str:
+    if isinstance(v, str):
+        return v
+    if v == int(v):
+        return str(int(v))
+    return repr(float(v))
+
+
+metrics = Metrics()
@@ -0,0 +1,296 @@
+"""Fractional order keys for element stacking order.
+
+Keys are strings that sort lexicographically (byte order, SQLite's default
+collation) in stacking order, bottom first. A key can always be generated
+between any two distinct keys, so moving an element between two neighbours
+rewrites only that element's row.
+
+The encoding follows the well-known "fractional indexing" scheme: a
+variable-length integer part (head char `a`-`z` for non-negative, `A`-`Z` for
+negative values, followed by that many digits) and an optional fractional tail.
+Appending on top increments the integer part, so keys grow logarithmically with
+element count. Repeated inserts at the same spot lengthen the tail; once a key
+exceeds `MAX_KEY_LENGTH` the canvas is rebalanced in the background.
+"""
+import threading
+
+from sqlalchemy import update
+
+from extensions import db
+from models.canvas_element import CanvasElement
+from services.change_feed import queue_changes
+from services.revisions import bump_revision
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+SMALLEST_INTEGER = "A" + DIGITS[0] * 26
+MAX_KEY_LENGTH = 24
+REBALANCE_CHUNK = 1000
+
+
+def _midpoint(a: str, b: str | None) -> str:
+    """Fractional digits strictly between `a` and `b` (None = 1.0)."""
+    if b is not None:
+        n = 0
+        while (a[n] if n < len(a) else DIGITS[0]) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else BASE
+    if digit_b - digit_a > 1:
+        return DIGITS[round(0.5 * (digit_a + digit_b))]
+    if b is not None and len(b) > 1:
+        return b[:1]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _integer_length(head: str) -> int:
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"Invalid order key head: {head!r}")
+
+
+def _integer_part(key: str) -> str:
+    length = _integer_length(key[0])
+    if length > len(key):
+        raise ValueError(f"Invalid order key: {key!r}")
+    return key[:length]
+
+
+def _increment_integer(x: str) -> str | None:
+    head, digs = x[0], list(x[1:])
+    carry = True
+    for i in range(len(digs) - 1, -1, -1):
+        d = DIGITS.index(digs[i]) + 1
+        if d == BASE:
+            digs[i] = DIGITS[0]
+        else:
+            digs[i] = DIGITS[d]
+            carry = False
+            break
+    if not carry:
+        return head + "".join(digs)
+    if head == "Z":
+        return "a" + DIGITS[0]
+    if head == "z":
+        return None
+    h = chr(ord(head) + 1)
+    if h > "a":
+        digs.append(DIGITS[0])
+    else:
+        digs.pop()
+    return h + "".join(digs)
+
+
+def _decrement_integer(x: str) -> str | None:
+    head, digs = x[0], list(x[1:])
+    borrow = True
+    for i in range(len(digs) - 1, -1, -1):
+        d = DIGITS.index(digs[i]) - 1
+        if d == -1:
+            digs[i] = DIGITS[-1]
+        else:
+            digs[i] = DIGITS[d]
+            borrow = False
+            break
+    if not borrow:
+        return head + "".join(digs)
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+    h = chr(ord(head) - 1)
+    if h < "Z":
+        digs.append(DIGITS[-1])
+    else:
+        digs.pop()
+    return h + "".join(digs)
+
+
+def key_between(a: str | None, b: str | None) -> str:
+    """Return a key strictly between `a` and `b`; None means unbounded on that side."""
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"Order keys out of order: {a!r} >= {b!r}")
+    if a is None:
+        if b is None:
+            return "a" + DIGITS[0]
+        ib = _integer_part(b)
+        fb = b[len(ib):]
+        if ib == SMALLEST_INTEGER:
+            return ib + _midpoint("", fb)
+        if ib < b:
+            return ib
+        res = _decrement_integer(ib)
+        if res is None:
+            raise ValueError("Cannot decrement order key any further")
+        return res
+    if b is None:
+        ia = _integer_part(a)
+        fa = a[len(ia):]
+        i = _increment_integer(ia)
+        return ia + _midpoint(fa, None) if i is None else i
+    ia = _integer_part(a)
+    fa = a[len(ia):]
+    ib = _integer_part(b)
+    fb = b[len(ib):]
+    if ia == ib:
+        return ia + _midpoint(fa, fb)
+    i = _increment_integer(ia)
+    if i is None:
+        raise ValueError("Cannot increment order key any further")
+    return i if i < b else ia + _midpoint(fa, None)
+
+
+def key_for_index(n: int) -> str:
+    """Integer key for position `n` (>= 0); used for legacy `z_index` values and rebalancing.
+
+    Keys for increasing `n` sort in increasing order and leave room in between.
+    """
+    n = max(0, int(n))
+    length = 1
+    span = BASE
+    while n >= span:
+        n -= span
+        length += 1
+        span = BASE ** length
+        if length > 26:
+            raise ValueError("Index too large for an order key")
+    digits = []
+    for _ in range(length):
+        n, r = divmod(n, BASE)
+        digits.append(DIGITS[r])
+    return chr(ord("a") + length - 1) + "".join(reversed(digits))
+
+
+# ---------------------------
+# Canvas-level helpers
+# ---------------------------
+def top_placement(canvas_id: int) -> tuple[str, int]:
+    """(order key, z_index) placing a new element above everything on the canvas.
+
+    The z_index is one above the current top element's, so clients that still
+    stack by z_index agree with the order key. One indexed lookup.
+    """
+    top = (
+        db.session.query(CanvasElement.order_key, CanvasElement.z_index)
+        .filter(CanvasElement.canvas_id == canvas_id, CanvasElement.order_key.isnot(None))
+        .order_by(CanvasElement.order_key.desc())
+        .limit(1)
+        .first()
+    )
+    if top is None:
+        return key_between(None, None), 1
+    return key_between(top.order_key, None), int(top.z_index or 0) + 1
+
+
+def key_next_to(anchor: CanvasElement, after: bool, exclude_id: int | None = None) -> str:
+    """Key directly above (`after=True`) or below `anchor` on its canvas."""
+    q = db.session.query(CanvasElement.order_key).filter(
+        CanvasElement.canvas_id == anchor.canvas_id,
+        CanvasElement.order_key.isnot(None),
+    )
+    if exclude_id is not None:
+        q = q.filter(CanvasElement.id != exclude_id)
+    if after:
+        neighbour = (
+            q.filter(CanvasElement.order_key > anchor.order_key)
+            .order_by(CanvasElement.order_key.asc())
+            .limit(1)
+            .scalar()
+        )
+        return key_between(anchor.order_key, neighbour)
+    neighbour = (
+        q.filter(CanvasElement.order_key < anchor.order_key)
+        .order_by(CanvasElement.order_key.desc())
+        .limit(1)
+        .scalar()
+    )
+    return key_between(neighbour, anchor.order_key)
+
+
+def key_for_rank(canvas_id: int, rank: int, exclude_id: int | None = None) -> str:
+    """Key putting an element at 1-based stacking position `rank` (bottom first).
+
+    For legacy `z_index` writes. Derived from the canvas' current order rather
+    than from `rank` alone, so it can't collide with keys written by rebalancing
+    or `place_after`/`place_before` moves.
+    """
+    q = db.session.query(CanvasElement).filter(
+        CanvasElement.canvas_id == canvas_id,
+        CanvasElement.order_key.isnot(None),
+    )
+    if exclude_id is not None:
+        q = q.filter(CanvasElement.id != exclude_id)
+    ordered = q.order_by(CanvasElement.order_key.asc(), CanvasElement.id.asc())
+    if rank <= 1:
+        bottom = ordered.limit(1).first()
+        return key_between(None, bottom.order_key if bottom else None)
+    below = ordered.offset(rank - 2).limit(1).first()
+    if below is None:
+        # Past the top: stack above everything
+        below = q.order_by(CanvasElement.order_key.desc()).limit(1).first()
+        if below is None:
+            return key_between(None, None)
+    return key_next_to(below, True, exclude_id=exclude_id)
+
+
+def needs_rebalance(key: str) -> bool:
+    return len(key) > MAX_KEY_LENGTH
+
+
+# ---------------------------
+# Background rebalancing
+# ---------------------------
+_rebalance_lock = threading.Lock()
+_rebalance_pending: set[int] = set()
+
+
+def rebalance(canvas_id: int) -> int:
+    """Rewrite every key on a canvas to short, evenly spaced keys, preserving order.
+
+    Each element's z_index is set to its new rank as well.
+
+    Runs in a single transaction. The revision bump comes first so the SQLite
+    write lock is held before the current order is read. Returns rows rewritten.
+    """
+    revision = bump_revision(canvas_id)
+    ids = [
+        row[0]
+        for row in db.session.query(CanvasElement.id)
+        .filter(CanvasElement.canvas_id == canvas_id)
+        .order_by(CanvasElement.order_key.asc(), CanvasElement.id.asc())
+        .all()
+    ]
+    if not ids:
+        db.session.rollback()
+        return 0
+    # z_index follows the rank too, for clients that still stack by it
+    changes = [{"id": eid, "order_key": key_for_index(i + 1), "z_index": i + 1} for i, eid in enumerate(ids)]
+    for start in range(0, len(changes), REBALANCE_CHUNK):
+        db.session.execute(update(CanvasElement), changes[start:start + REBALANCE_CHUNK])
+    queue_changes(canvas_id, revision, "element", "updated", changes)
+    db.session.commit()
+    return len(changes)
+
+
+def schedule_rebalance(app, canvas_id: int) -> None:
+    """Rebalance a canvas on a background thread (deduplicated per canvas)."""
+    with _rebalance_lock:
+        if canvas_id in _rebalance_pending:
+            return
+        _rebalance_pending.add(canvas_id)
+
+    def run():
+        try:
+            with app.app_context():
+                rebalance(canvas_id)
+        except Exception as e:
+            print("Error rebalancing order keys:", e)
+        finally:
+            with _rebalance_lock:
+                _rebalance_pending.discard(canvas_id)
+
+    threading.Thread(target=run, name=f"rebalance-{canvas_id}", daemon=True).start()
@@ -0,0 +1,165 @@
+"""Password hashing off the request thread.
+
+Werkzeug's KDFs (scrypt, pbkdf2) are meant to be slow: each call keeps a core
+busy for 100+ ms. On request threads, a burst of sign-ins runs one per thread
+and takes every core, and other requests in the process queue behind them for
+CPU. `passwords` runs them on a small process pool instead
+(`PASSWORD_WORKERS`, niced by `PASSWORD_NICE`), so at most that many hash at
+once and the scheduler prefers request handling. The request thread just waits
+on a future.
+
+At most `PASSWORD_QUEUE_DEPTH` calls wait for a busy pool. Past that, a
+call raises `PasswordBusy` right away (the routes answer 503 with
+`Retry-After`), so a login storm can't pile up threads.
+
+New hashes use `PASSWORD_METHOD`, a Werkzeug method string such as
+`scrypt:32768:8:1` or `pbkdf2:sha256:600000`. `verify()` also returns a fresh
+hash when the stored one was made with other parameters, computed in the same
+worker call. Sign-in saves it, so raising the cost upgrades accounts as their
+owners log in.
+
+The pool is built on first use (and again after a worker crash) with the
+`forkserver` start method: its processes are forked from a small single-threaded
+server process that has imported only this module, never from the threaded
+server process, which could deadlock a child on a lock another thread held. The
+KDFs need no inherited state. Like spawned children, the workers re-import the
+entry script as `__mp_main__`, so scripts guard app setup against that (see
+`app.py`). `PASSWORD_WORKERS = 0` hashes inline, for scripts and tests.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+from services.metrics import metrics
+
+
+class PasswordBusy(Exception):
+    """The hashing pool is saturated; retry shortly."""
+
+
+def normalize_method(method: str) -> str:
+    """The parameter prefix Werkzeug stores for hashes made with `method`."""
+    name, *args = method.split(":")
+    if name == "scrypt":
+        n, r, p = (args + ["", "", ""])[:3]
+        return f"scrypt:{int(n or 2 ** 15)}:{int(r or 8)}:{int(p or 1)}"
+    if name == "pbkdf2":
+        hash_name, iterations = (args + ["", ""])[:2]
+        return f"pbkdf2:{hash_name or 'sha256'}:{int(iterations or DEFAULT_PBKDF2_ITERATIONS)}"
+    raise ValueError(f"Unsupported password hashing method: {method!r}")
+
+
+# Run in the pool's worker processes
+def _worker_init(nice: int) -> None:
+    if nice:
+        os.nice(nice)
+
+
+def _hash(password: str, method: str) -> str:
+    return generate_password_hash(password, method=method)
+
+
+def _verify(pwhash: str, password: str, method: str) -> tuple[bool, str | None]:
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if pwhash.split("$", 1)[0] == method:
+        return True, None
+    return True, generate_password_hash(password, method=method)
+
+
+class PasswordHasher:
+    def __init__(self):
+        self.workers = 0
+        self.queue_depth = 0
+        self.timeout = 10.0
+        self.nice = 0
+        self.method = normalize_method("scrypt")
+        self._pool: ProcessPoolExecutor | None = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.workers = max(0, int(app.config.get("PASSWORD_WORKERS", 2)))
+        self.queue_depth = max(0, int(app.config.get("PASSWORD_QUEUE_DEPTH", 16)))
+        self.timeout = float(app.config.get("PASSWORD_TIMEOUT", 10.0))
+        self.nice = int(app.config.get("PASSWORD_NICE", 10))
+        self.method = normalize_method(app.config.get("PASSWORD_METHOD") or "scrypt")
+
+    def after_fork(self):
+        """Forget a pool inherited from the parent; this process builds its own on first use."""
+        self._pool = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def hash(self, password: str) -> str:
+        """A new hash of `password` with the configured method."""
+        return self._call(_hash, password, self.method)
+
+    def verify(self, pwhash: str, password: str) -> tuple[bool, str | None]:
+        """(matches, new hash if the stored one should be replaced)."""
+        return self._call(_verify, pwhash, password, self.method)
+
+    def _call(self, fn, *args):
+        start = time.perf_counter()
+        if not self.workers:
+            result = fn(*args)
+            metrics.observe("learnable_password_seconds", time.perf_counter() - start)
+            return result
+
+        with self._lock:
+            if self._pending >= self.workers + self.queue_depth:
+                metrics.inc("learnable_password_rejected_total")
+                raise PasswordBusy("Too many sign-ins in progress")
+            self._pending += 1
+            if self._pool is None:
+                self._pool = self._new_pool()
+            pool = self._pool
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self._release()
+            self._reset(pool)
+            raise PasswordBusy("Password hashing pool restarted") from None
+        # The slot is held until the work is done, even if this request stops waiting
+        future.add_done_callback(lambda _: self._release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            metrics.inc("learnable_password_rejected_total")
+            raise PasswordBusy("Password hashing timed out") from None
+        except BrokenProcessPool:
+            # A worker died; the next call starts a fresh pool
+            self._reset(pool)
+            raise PasswordBusy("Password hashing pool restarted") from None
+        finally:
+            metrics.observe("learnable_password_seconds", time.perf_counter() - start)
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        context = multiprocessing.get_context("forkserver")
+        # The fork server imports just this module, not the entry script
+        context.set_forkserver_preload([__name__])
+        return ProcessPoolExecutor(self.workers, mp_context=context,
+                                   initializer=_worker_init, initargs=(self.nice,))
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def _reset(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+
+
+passwords = PasswordHasher()
@@ -0,0 +1,51 @@
+"""Background purge of deleted canvases.
+
+`DELETE /api/canvas/canvases/<id>` only stamps `deleted_at` and enqueues a
+`purge_canvas` job. The job removes the canvas' rows in bounded chunks, each in
+its own short transaction, so the SQLite write lock is released between chunks
+and interactive writers are never starved by a large delete.
+"""
+from sqlalchemy import delete, select
+
+from extensions import db
+from models.canvas import Canvas
+from models.canvas_element import CanvasElement
+from models.canvas_thumbnail import CanvasThumbnail
+from models.chat import Chat
+from models.chat_message import ChatMessage
+from models.element_group import ElementGroup, ElementGroupMember
+from services.jobs import enqueue, handler
+
+PURGE_CHUNK = 500
+
+
+def enqueue_purge(canvas_id: int):
+    return enqueue("purge_canvas", {"canvas_id": canvas_id})
+
+
+def _delete_chunked(model, condition, ctx, chunk: int = PURGE_CHUNK) -> None:
+    """Delete matching rows `chunk` at a time, committing after each chunk."""
+    while True:
+        ids = select(model.id).where(condition).limit(chunk)
+        deleted = db.session.execute(delete(model).where(model.id.in_(ids))).rowcount
+        db.session.commit()
+        if deleted < chunk:
+            return
+        ctx.heartbeat()
+
+
+@handler("purge_canvas")
+def purge_canvas(payload: dict, ctx) -> None:
+    canvas_id = int(payload["canvas_id"])
+    chat_ids = select(Chat.id).where(Chat.canvas_id == canvas_id)
+    group_ids = select(ElementGroup.id).where(ElementGroup.canvas_id == canvas_id)
+
+    _delete_chunked(ChatMessage, ChatMessage.chat_id.in_(chat_ids), ctx)
+    _delete_chunked(ElementGroupMember, ElementGroupMember.group_id.in_(group_ids), ctx)
+    _delete_chunked(ElementGroup, ElementGroup.canvas_id == canvas_id, ctx)
+    _delete_chunked(CanvasElement, CanvasElement.canvas_id == canvas_id, ctx)
+    db.session.execute(delete(Chat).where(Chat.canvas_id == canvas_id))
+    db.session.execute(delete(CanvasThumbnail).where(CanvasThumbnail.canvas_id == canvas_id))
+    # Only remove the canvas if it is still marked deleted
+    db.session.execute(delete(Canvas).where(Canvas.id == canvas_id, Canvas.deleted_at.isnot(None)))
+    db.session.commit()
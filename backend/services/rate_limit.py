@@ -0,0 +1,268 @@
+"""Per-user rate limiting and admission control.
+
+Every API request is charged to a token bucket keyed by the caller (user from
+the JWT, else client address) and a route class:
+
+- `chat`   — chat completions (`RATE_LIMIT_CHAT`, default "10/min")
+- `write`  — POST/PATCH/PUT/DELETE (`RATE_LIMIT_WRITE`, default "60/s")
+- `read`   — GET (`RATE_LIMIT_READ`, default "60/s")
+
+A limit "N/period" allows bursts of N and refills N tokens per period
+(s, min or h). Views can pick a class with `@limit_class("chat")` or opt out
+with `@exempt`.
+
+Long-lived SSE views marked `@stream` are capped per caller
+(`MAX_STREAMS_PER_USER`) and are not counted as in-flight work. Once more than
+`MAX_INFLIGHT_REQUESTS` other requests are running in the process, callers who
+already have one in flight are turned away, and past twice that everyone is,
+so a single flooding client can't take every worker thread.
+
+Rejections are 429 with `Retry-After`. Buckets live in process memory, or in
+a small SQLite file shared by all worker processes when
+`RATE_LIMIT_STORAGE=sqlite:///path`. Stream and in-flight counts are always
+per process.
+"""
+import math
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g, jsonify, request
+
+PERIODS = {"s": 1, "sec": 1, "second": 1, "m": 60, "min": 60, "minute": 60, "h": 3600, "hour": 3600}
+
+
+def parse_limit(spec: str) -> tuple[float, float]:
+    """'10/min' -> (capacity 10, refill 10/60 tokens per second)."""
+    count, _, period = spec.strip().partition("/")
+    seconds = PERIODS.get(period.strip().lower() or "s")
+    if seconds is None:
+        raise ValueError(f"Unknown rate limit period in {spec!r}")
+    capacity = float(count)
+    return capacity, capacity / seconds
+
+
+# ---------------------------
+# View markers
+# ---------------------------
+def limit_class(name: str):
+    """Charge a view to the `name` bucket instead of read/write by method."""
+    def decorator(fn):
+        fn.rate_limit_class = name
+        return fn
+    return decorator
+
+
+def exempt(fn):
+    fn.rate_limit_exempt = True
+    return fn
+
+
+def stream(fn):
+    """Mark a view as a long-lived stream (capped per user, not counted as in-flight)."""
+    fn.rate_limit_stream = True
+    return fn
+
+
+# ---------------------------
+# Bucket storage
+# ---------------------------
+class MemoryBucketStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: dict[str, tuple[float, float]] = {}  # key -> (tokens, updated)
+
+    def take(self, key: str, capacity: float, rate: float, now: float) -> float:
+        """Take one token; return 0 on success, else seconds until one is available."""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate if rate > 0 else 60.0
+
+
+class SQLiteBucketStore:
+    """Buckets in a SQLite file, so all worker processes on a host share them."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, capacity: float, rate: float, now: float) -> float:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate if rate > 0 else 60.0
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+# ---------------------------
+# Limiter
+# ---------------------------
+def _client_address() -> str:
+    return f"ip:{request.remote_addr or 'unknown'}"
+
+
+class RateLimiter:
+    """Flask extension: registers request hooks on `init_app`."""
+
+    def __init__(self):
+        self.enabled = False
+        self.limits: dict[str, tuple[float, float]] = {}
+        self.max_streams = 0
+        self.max_inflight = 0
+        self.key_func = _client_address
+        self.store = MemoryBucketStore()
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._inflight_by_key: dict[str, int] = {}
+        self._streams_by_key: dict[str, int] = {}
+
+    def init_app(self, app, key_func=None):
+        cfg = app.config
+        self.enabled = bool(cfg.get("RATE_LIMIT_ENABLED", True))
+        self.limits = {
+            "chat": parse_limit(cfg.get("RATE_LIMIT_CHAT", "10/min")),
+            "write": parse_limit(cfg.get("RATE_LIMIT_WRITE", "60/s")),
+            "read": parse_limit(cfg.get("RATE_LIMIT_READ", "60/s")),
+        }
+        self.max_streams = int(cfg.get("MAX_STREAMS_PER_USER", 6))
+        self.max_inflight = int(cfg.get("MAX_INFLIGHT_REQUESTS", 32))
+        storage = cfg.get("RATE_LIMIT_STORAGE") or "memory"
+        if storage.startswith("sqlite:///"):
+            self.store = SQLiteBucketStore(storage[len("sqlite:///"):])
+        else:
+            self.store = MemoryBucketStore()
+        if key_func is not None:
+            self.key_func = key_func
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    # ---------------------------
+    # Hooks
+    # ---------------------------
+    def _before_request(self):
+        if not self.enabled or request.method == "OPTIONS" or request.endpoint is None:
+            return None
+        view = current_app.view_functions.get(request.endpoint)
+        if getattr(view, "rate_limit_exempt", False):
+            return None
+
+        key = self.key_func() or _client_address()
+        route_class = getattr(view, "rate_limit_class", None)
+        if route_class is None:
+            route_class = "read" if request.method in ("GET", "HEAD") else "write"
+        capacity, rate = self.limits.get(route_class, self.limits["read"])
+        wait = self.store.take(f"{route_class}:{key}", capacity, rate, time.time())
+        if wait > 0:
+            return self._reject(f"Too many {route_class} requests", wait)
+
+        if getattr(view, "rate_limit_stream", False):
+            return self._admit_stream(key)
+        return self._admit_request(key)
+
+    def _admit_stream(self, key: str):
+        with self._lock:
+            if self._streams_by_key.get(key, 0) >= self.max_streams:
+                return self._reject("Too many open streams", 5)
+            self._streams_by_key[key] = self._streams_by_key.get(key, 0) + 1
+        self._register_release(lambda: self._release(self._streams_by_key, key))
+        return None
+
+    def _admit_request(self, key: str):
+        with self._lock:
+            if self.max_inflight > 0:
+                mine = self._inflight_by_key.get(key, 0)
+                if self._inflight >= 2 * self.max_inflight or (self._inflight >= self.max_inflight and mine >= 1):
+                    return self._reject("Server busy", 1)
+            self._inflight += 1
+            self._inflight_by_key[key] = self._inflight_by_key.get(key, 0) + 1
+        self._register_release(lambda: self._release_request(key))
+        return None
+
+    def _register_release(self, release):
+        """Release once, when the response is closed (after streaming) or the request is torn down."""
+        done = threading.Event()
+
+        def once():
+            if not done.is_set():
+                done.set()
+                release()
+
+        g.rate_limit_release = once
+
+    def _after_request(self, response):
+        release = g.pop("rate_limit_release", None)
+        if release is not None:
+            response.call_on_close(release)
+        return response
+
+    def _teardown_request(self, exc):
+        # Reached without a response (unhandled error); nothing will be closed
+        release = g.pop("rate_limit_release", None)
+        if release is not None:
+            release()
+
+    # ---------------------------
+    # Counters
+    # ---------------------------
+    def _release(self, counts: dict, key: str):
+        with self._lock:
+            n = counts.get(key, 0) - 1
+            if n > 0:
+                counts[key] = n
+            else:
+                counts.pop(key, None)
+
+    def _release_request(self, key: str):
+        with self._lock:
+            self._inflight -= 1
+        self._release(self._inflight_by_key, key)
+
+    def _reject(self, message: str, retry_after: float):
+        seconds = max(1, math.ceil(retry_after))
+        resp = jsonify({"error": message, "retry_after": seconds})
+        resp.status_code = 429
+        resp.headers["Retry-After"] = str(seconds)
+        return resp
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "inflight": self._inflight,
+                "streams": sum(self._streams_by_key.values()),
+            }
+
+
+rate_limiter = RateLimiter()
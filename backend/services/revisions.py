@@ -0,0 +1,21 @@
+from extensions import db
+from models.canvas import Canvas
+
+
+def bump_revision(canvas_id: int) -> int:
+    """Mark a canvas as changed within the current transaction and return the new revision.
+
+    Element and group writes call this before committing so caches keyed by
+    `(canvas_id, revision)` stop matching. `updated_at` is left untouched so the
+    canvas list keeps ordering by metadata edits only.
+    """
+    Canvas.query.filter_by(id=canvas_id).update(
+        {Canvas.revision: Canvas.revision + 1, Canvas.updated_at: Canvas.updated_at},
+        synchronize_session="evaluate",
+    )
+    return get_revision(canvas_id)
+
+
+def get_revision(canvas_id: int) -> int:
+    rev = db.session.query(Canvas.revision).filter_by(id=canvas_id).scalar()
+    return int(rev or 0)
@@ -0,0 +1,153 @@
+"""Full-text search over text elements and chat messages (SQLite FTS5).
+
+Two FTS5 tables mirror the searchable text: `element_search` (rowid = the
+text element's id, body = `data.text`) and `message_search` (rowid = the chat
+message's id). Triggers on `canvas_element` and `chat_message` keep them
+current, so every write path (routes, bulk import, duplicate, purge, chat
+checkpoints) is covered without hooks in Python. Each row also carries an
+`owner` token (`u<user id>`), so a user's query is matched against only their
+own rows inside the index instead of being filtered afterwards.
+
+`ensure_search_index()` runs with the schema check; it creates the tables and
+triggers and fills them from existing rows the first time. On other databases
+it does nothing and `search()` raises `SearchUnavailable`.
+"""
+import html
+import re
+
+from sqlalchemy import text
+
+from extensions import db
+
+# Most terms taken from a query; each is matched as a prefix
+MAX_TERMS = 8
+MAX_RESULTS = 50
+# snippet() markers, replaced with <mark> after the text has been escaped
+_OPEN, _CLOSE = "\x02", "\x03"
+
+ELEMENT_BODY = "json_extract({row}.data, '$.text')"
+ELEMENT_OWNER = "(SELECT 'u' || user_id FROM canvas WHERE canvas.id = {row}.canvas_id)"
+MESSAGE_OWNER = ("(SELECT 'u' || canvas.user_id FROM chat JOIN canvas ON canvas.id = chat.canvas_id "
+                 "WHERE chat.id = {row}.chat_id)")
+
+_TABLES = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS element_search USING fts5("
+    "owner, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS message_search USING fts5("
+    "owner, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+]
+
+_INSERT_ELEMENT = (
+    "INSERT INTO element_search (rowid, owner, body) "
+    f"SELECT new.id, {ELEMENT_OWNER.format(row='new')}, {ELEMENT_BODY.format(row='new')} "
+    f"WHERE new.type = 'text' AND coalesce({ELEMENT_BODY.format(row='new')}, '') != '';"
+)
+_INSERT_MESSAGE = (
+    "INSERT INTO message_search (rowid, owner, body) "
+    f"SELECT new.id, {MESSAGE_OWNER.format(row='new')}, new.text WHERE coalesce(new.text, '') != '';"
+)
+
+_TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS element_search_ai AFTER INSERT ON canvas_element BEGIN {_INSERT_ELEMENT} END",
+    "CREATE TRIGGER IF NOT EXISTS element_search_au AFTER UPDATE OF data, type ON canvas_element BEGIN "
+    f"DELETE FROM element_search WHERE rowid = old.id; {_INSERT_ELEMENT} END",
+    "CREATE TRIGGER IF NOT EXISTS element_search_ad AFTER DELETE ON canvas_element BEGIN "
+    "DELETE FROM element_search WHERE rowid = old.id; END",
+    f"CREATE TRIGGER IF NOT EXISTS message_search_ai AFTER INSERT ON chat_message BEGIN {_INSERT_MESSAGE} END",
+    "CREATE TRIGGER IF NOT EXISTS message_search_au AFTER UPDATE OF text ON chat_message BEGIN "
+    f"DELETE FROM message_search WHERE rowid = old.id; {_INSERT_MESSAGE} END",
+    "CREATE TRIGGER IF NOT EXISTS message_search_ad AFTER DELETE ON chat_message BEGIN "
+    "DELETE FROM message_search WHERE rowid = old.id; END",
+]
+
+_BACKFILL = {
+    "element_search": (
+        "INSERT INTO element_search (rowid, owner, body) "
+        f"SELECT e.id, {ELEMENT_OWNER.format(row='e')}, {ELEMENT_BODY.format(row='e')} FROM canvas_element e "
+        f"WHERE e.type = 'text' AND coalesce({ELEMENT_BODY.format(row='e')}, '') != ''"
+    ),
+    "message_search": (
+        "INSERT INTO message_search (rowid, owner, body) "
+        f"SELECT m.id, {MESSAGE_OWNER.format(row='m')}, m.text FROM chat_message m WHERE coalesce(m.text, '') != ''"
+    ),
+}
+
+# One statement for both kinds; bm25() is lower for better matches, and `owner` carries no weight
+_SEARCH = """
+SELECT * FROM (
+    SELECT 'element' AS kind, e.id AS id, c.id AS canvas_id, c.name AS canvas_name,
+           snippet(element_search, 1, :open, :close, '…', 12) AS snippet,
+           bm25(element_search, 0.0, 1.0) AS score
+    FROM element_search
+    JOIN canvas_element e ON e.id = element_search.rowid
+    JOIN canvas c ON c.id = e.canvas_id
+    WHERE element_search MATCH :match AND c.user_id = :user_id AND c.deleted_at IS NULL AND :elements
+    UNION ALL
+    SELECT 'message', m.id, c.id, c.name,
+           snippet(message_search, 1, :open, :close, '…', 12),
+           bm25(message_search, 0.0, 1.0)
+    FROM message_search
+    JOIN chat_message m ON m.id = message_search.rowid
+    JOIN chat ON chat.id = m.chat_id
+    JOIN canvas c ON c.id = chat.canvas_id
+    WHERE message_search MATCH :match AND c.user_id = :user_id AND c.deleted_at IS NULL AND :messages
+)
+ORDER BY score
+LIMIT :limit
+"""
+
+
+class SearchUnavailable(Exception):
+    pass
+
+
+def ensure_search_index(conn) -> None:
+    """Create the FTS tables and triggers if missing, filling new tables from existing rows."""
+    if conn.dialect.name != "sqlite":
+        return
+    existing = {r[0] for r in conn.execute(text(
+        "SELECT name FROM sqlite_master WHERE name IN ('element_search', 'message_search')"
+    ))}
+    for ddl in _TABLES:
+        conn.execute(text(ddl))
+    for ddl in _TRIGGERS:
+        conn.execute(text(ddl))
+    for table, fill in _BACKFILL.items():
+        if table not in existing:
+            conn.execute(text(fill))
+
+
+def match_expression(query: str, user_id: int) -> str | None:
+    """FTS5 query for `query`'s words (each a prefix, all required) within the user's rows."""
+    terms = re.findall(r"\w+", query or "")[:MAX_TERMS]
+    if not terms:
+        return None
+    words = " AND ".join(f'"{t}"*' for t in terms)
+    return f'owner : "u{int(user_id)}" AND body : ({words})'
+
+
+def _highlight(snippet: str | None) -> str:
+    return html.escape(snippet or "").replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>")
+
+
+def search(user_id: int, query: str, kinds: set[str], limit: int = 20) -> list[dict] | None:
+    """Ranked hits for `query` in the user's canvases; None if the query has no words.
+
+    Each hit is {kind, id, canvas_id, canvas_name, snippet, score}. The snippet
+    is HTML-escaped with the matched terms wrapped in <mark>.
+    """
+    if db.engine.dialect.name != "sqlite":
+        raise SearchUnavailable("Search needs SQLite with FTS5")
+    match = match_expression(query, user_id)
+    if match is None:
+        return None
+    rows = db.session.execute(text(_SEARCH), {
+        "match": match, "user_id": user_id, "open": _OPEN, "close": _CLOSE,
+        "elements": "element" in kinds, "messages": "message" in kinds,
+        "limit": max(1, min(int(limit), MAX_RESULTS)),
+    }).mappings().all()
+    return [
+        {"kind": r["kind"], "id": r["id"], "canvas_id": r["canvas_id"], "canvas_name": r["canvas_name"],
+         "snippet": _highlight(r["snippet"]), "score": round(-r["score"], 6)}
+        for r in rows
+    ]
@@ -0,0 +1,245 @@
+"""Fast JSON serialization for list endpoints.
+
+List routes select only the columns they return, as tuples, instead of
+hydrating ORM objects and calling `to_dict()` per row, and encode with orjson
+when it is installed (falling back to the stdlib encoder). Very large arrays are
+streamed as chunked JSON so the response never has to be built in memory.
+
+The dict shapes match the models' `to_dict()` output.
+"""
+import json
+
+from flask import Response, stream_with_context
+from sqlalchemy import func, select, tuple_
+
+from extensions import db
+from models.canvas import Canvas
+from models.canvas_element import CanvasElement
+from models.chat import Chat
+from models.chat_message import ChatMessage
+from models.element_group import ElementGroup, ElementGroupMember
+from models.purchases import Purchase
+
+try:
+    import orjson
+    ORJSON_ENABLED = True
+except ImportError:
+    ORJSON_ENABLED = False
+
+# Arrays longer than this are streamed in chunks of STREAM_CHUNK rows
+STREAM_THRESHOLD = 5000
+STREAM_CHUNK = 1000
+
+
+def dumps(obj) -> bytes:
+    if ORJSON_ENABLED:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(obj, status: int = 200) -> Response:
+    """Like `jsonify(obj), status`, using the fast encoder."""
+    return Response(dumps(obj), status=status, mimetype="application/json")
+
+
+def streamed_json_array(chunks) -> Response:
+    """Stream an iterable of row-dict lists as one JSON array."""
+    def generate():
+        yield b"["
+        first = True
+        for rows in chunks:
+            if not rows:
+                continue
+            body = dumps(rows)[1:-1]
+            yield body if first else b"," + body
+            first = False
+        yield b"]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
+def _dicts(names, rows):
+    return [dict(zip(names, row)) for row in rows]
+
+
+# ---------------------------
+# Column sets (same keys as the models' to_dict())
+# ---------------------------
+CANVAS_COLUMNS = (
+    Canvas.id, Canvas.user_id, Canvas.name, Canvas.created_at, Canvas.updated_at,
+    Canvas.camera_x, Canvas.camera_y, Canvas.camera_zoom_percentage, Canvas.revision,
+)
+ELEMENT_COLUMNS = (
+    CanvasElement.id, CanvasElement.canvas_id, CanvasElement.type, CanvasElement.x, CanvasElement.y,
+    CanvasElement.width, CanvasElement.height, CanvasElement.rotation, CanvasElement.z_index,
+    CanvasElement.order_key, CanvasElement.bgcolor, CanvasElement.data,
+    CanvasElement.line_start_x, CanvasElement.line_start_y, CanvasElement.line_end_x, CanvasElement.line_end_y,
+    CanvasElement.created_at, CanvasElement.updated_at,
+)
+GROUP_COLUMNS = (
+    ElementGroup.id, ElementGroup.canvas_id, ElementGroup.name, ElementGroup.created_at, ElementGroup.updated_at,
+)
+MESSAGE_COLUMNS = (
+    ChatMessage.id, ChatMessage.chat_id, ChatMessage.text, ChatMessage.is_response,
+    ChatMessage.is_liked, ChatMessage.is_disliked, ChatMessage.created_at,
+)
+PURCHASE_COLUMNS = (
+    Purchase.id, Purchase.user_id, Purchase.product_name, Purchase.tokens_given, Purchase.price_usd,
+    Purchase.payment_method, Purchase.status, Purchase.created_at,
+)
+
+
+def _names(columns):
+    return [c.key for c in columns]
+
+
+def canvas_rows(user_id: int) -> list[dict]:
+    rows = db.session.execute(
+        select(*CANVAS_COLUMNS)
+        .where(Canvas.user_id == user_id, Canvas.deleted_at.is_(None))
+        .order_by(Canvas.updated_at.desc())
+    ).all()
+    out = _dicts(_names(CANVAS_COLUMNS), rows)
+    for c in out:
+        c["camera_x"] = float(c["camera_x"] or 0.0)
+        c["camera_y"] = float(c["camera_y"] or 0.0)
+        c["camera_zoom_percentage"] = float(c["camera_zoom_percentage"] or 0.0)
+        c["revision"] = int(c["revision"] or 0)
+    return out
+
+
+def parse_canvas_cursor(cursor: str) -> tuple[int, int]:
+    """'<updated_at>:<id>' -> (updated_at, id); raises ValueError."""
+    updated_at, _, canvas_id = cursor.partition(":")
+    return int(updated_at), int(canvas_id)
+
+
+def canvas_page(user_id: int, limit: int, after: tuple[int, int] | None = None,
+                ascending: bool = False) -> tuple[list[dict], str | None]:
+    """One page of a user's canvases by (updated_at, id), with element count and last chat message time.
+
+    Keyset pagination on the (user_id, updated_at, id) index: `after` is the
+    position of the previous page's last row. The aggregates are correlated
+    subqueries in the same statement, evaluated only for the rows on the page.
+    Returns (rows, cursor of the next page or None).
+    """
+    from services.thumbnails import thumbnail_url
+
+    element_count = (
+        select(func.count(CanvasElement.id)).where(CanvasElement.canvas_id == Canvas.id).scalar_subquery()
+    )
+    last_message_at = (
+        select(func.max(ChatMessage.created_at))
+        .join(Chat, Chat.id == ChatMessage.chat_id)
+        .where(Chat.canvas_id == Canvas.id)
+        .scalar_subquery()
+    )
+    key = tuple_(Canvas.updated_at, Canvas.id)
+    stmt = (
+        select(*CANVAS_COLUMNS, element_count.label("element_count"), last_message_at.label("last_message_at"))
+        .where(Canvas.user_id == user_id, Canvas.deleted_at.is_(None))
+    )
+    if after is not None:
+        stmt = stmt.where(key > after if ascending else key < after)
+    order = (Canvas.updated_at.asc(), Canvas.id.asc()) if ascending else (Canvas.updated_at.desc(), Canvas.id.desc())
+    rows = db.session.execute(stmt.order_by(*order).limit(limit + 1)).all()
+
+    out = _dicts(_names(CANVAS_COLUMNS) + ["element_count", "last_message_at"], rows[:limit])
+    for c in out:
+        c["camera_x"] = float(c["camera_x"] or 0.0)
+        c["camera_y"] = float(c["camera_y"] or 0.0)
+        c["camera_zoom_percentage"] = float(c["camera_zoom_percentage"] or 0.0)
+        c["revision"] = int(c["revision"] or 0)
+        c["thumbnail_url"] = thumbnail_url(c["id"], c["revision"])
+    next_cursor = f"{out[-1]['updated_at']}:{out[-1]['id']}" if len(rows) > limit else None
+    return out, next_cursor
+
+
+def _element_dicts(rows) -> list[dict]:
+    out = _dicts(_names(ELEMENT_COLUMNS), rows)
+    for e in out:
+        if not e["data"]:
+            e["data"] = {}
+    return out
+
+
+def element_count(canvas_id: int) -> int:
+    return db.session.query(db.func.count(CanvasElement.id)).filter(CanvasElement.canvas_id == canvas_id).scalar()
+
+
+def element_rows(canvas_id: int) -> list[dict]:
+    rows = db.session.execute(
+        select(*ELEMENT_COLUMNS)
+        .where(CanvasElement.canvas_id == canvas_id)
+        .order_by(CanvasElement.order_key.asc(), CanvasElement.id.asc())
+    ).all()
+    return _element_dicts(rows)
+
+
+def iter_element_chunks(canvas_id: int, chunk: int = STREAM_CHUNK):
+    """Yield lists of element dicts in stacking order, keyset-paginated on (order_key, id)."""
+    last = None
+    while True:
+        q = select(*ELEMENT_COLUMNS).where(CanvasElement.canvas_id == canvas_id)
+        if last is not None:
+            key, eid = last
+            q = q.where(db.or_(
+                CanvasElement.order_key > key,
+                db.and_(CanvasElement.order_key == key, CanvasElement.id > eid),
+            ))
+        rows = db.session.execute(
+            q.order_by(CanvasElement.order_key.asc(), CanvasElement.id.asc()).limit(chunk)
+        ).all()
+        if not rows:
+            return
+        out = _element_dicts(rows)
+        yield out
+        last = (out[-1]["order_key"], out[-1]["id"])
+
+
+def element_list_response(canvas_id: int) -> Response:
+    """Element list as JSON; streamed in chunks for very large canvases."""
+    if element_count(canvas_id) > STREAM_THRESHOLD:
+        return streamed_json_array(iter_element_chunks(canvas_id))
+    return json_response(element_rows(canvas_id))
+
+
+def group_rows(canvas_id: int) -> list[dict]:
+    """Groups with their element_ids: one query for groups, one for all memberships."""
+    rows = db.session.execute(
+        select(*GROUP_COLUMNS)
+        .where(ElementGroup.canvas_id == canvas_id)
+        .order_by(ElementGroup.updated_at.desc())
+    ).all()
+    groups = _dicts(_names(GROUP_COLUMNS), rows)
+    if not groups:
+        return groups
+    members: dict[int, list[int]] = {}
+    for group_id, element_id in db.session.execute(
+        select(ElementGroupMember.group_id, ElementGroupMember.element_id)
+        .join(ElementGroup, ElementGroup.id == ElementGroupMember.group_id)
+        .where(ElementGroup.canvas_id == canvas_id)
+        .order_by(ElementGroupMember.id.asc())
+    ):
+        members.setdefault(group_id, []).append(element_id)
+    for grp in groups:
+        grp["element_ids"] = members.get(grp["id"], [])
+    return groups
+
+
+def message_rows(chat_id: int) -> list[dict]:
+    rows = db.session.execute(
+        select(*MESSAGE_COLUMNS)
+        .where(ChatMessage.chat_id == chat_id)
+        .order_by(ChatMessage.created_at.asc())
+    ).all()
+    return _dicts(_names(MESSAGE_COLUMNS), rows)
+
+
+def purchase_rows(user_id: int) -> list[dict]:
+    rows = db.session.execute(
+        select(*PURCHASE_COLUMNS)
+        .where(Purchase.user_id == user_id)
+        .order_by(Purchase.created_at.desc())
+    ).all()
+    return _dicts(_names(PURCHASE_COLUMNS), rows)
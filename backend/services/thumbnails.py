@@ -0,0 +1,141 @@
+"""Server-rendered SVG previews for the canvas list.
+
+A thumbnail is a small SVG of the canvas' element geometry: boxes in their
+colours, lines as strokes, text and image elements as tinted boxes. It is
+rendered on the first request for a canvas revision and stored in
+`canvas_thumbnail`, one row per canvas. So it is regenerated lazily after the
+canvas changes and shared by all worker processes.
+
+The list endpoint hands out `thumbnail_url(canvas_id, revision)`. That URL
+names the revision and carries an HMAC signature instead of requiring a bearer
+token, so the dashboard can use it in a plain `<img src>`. The bytes at a
+given revision never change, so the response is cached as immutable. A
+request for an older revision gets 410, so an old signed URL stops working
+once the canvas changes.
+"""
+import hashlib
+import hmac
+import os
+import re
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models.canvas import Canvas
+from models.canvas_element import CanvasElement
+from models.canvas_thumbnail import CanvasThumbnail
+
+WIDTH, HEIGHT, PADDING = 320, 200, 12
+# Elements drawn per thumbnail, bottom of the stack first
+MAX_ELEMENTS = 1500
+# Most a single small element is blown up
+MAX_SCALE = 1.5
+BACKGROUND = "#272725"
+DEFAULT_FILL = "#FFFFFF"
+IMAGE_FILL = "#8A8782"
+LINE_STROKE = "#C5C1BA"
+_COLOR = re.compile(r"^(#[0-9a-fA-F]{3,8}|[a-zA-Z]{3,20})$")
+
+_SECRET = (os.getenv("JWT_SECRET") or "").encode()
+
+
+def _signature(canvas_id: int, revision: int) -> str:
+    return hmac.new(_SECRET, f"thumbnail:{canvas_id}:{revision}".encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def thumbnail_url(canvas_id: int, revision: int) -> str:
+    return f"/api/canvas/thumbnails/{canvas_id}/{int(revision or 0)}.svg?sig={_signature(canvas_id, revision or 0)}"
+
+
+def valid_signature(canvas_id: int, revision: int, sig: str | None) -> bool:
+    return bool(sig) and hmac.compare_digest(_signature(canvas_id, revision), sig)
+
+
+def _num(v: float) -> str:
+    return f"{v:.1f}".rstrip("0").rstrip(".")
+
+
+def _color(value, default: str) -> str:
+    return value if isinstance(value, str) and _COLOR.match(value) else default
+
+
+def render_svg(rows) -> str:
+    """SVG markup for element rows (type, x, y, width, height, rotation, bgcolor, line coordinates)."""
+    boxes, xs, ys = [], [], []
+    for r in rows:
+        if r.type == "line" and None not in (r.line_start_x, r.line_start_y, r.line_end_x, r.line_end_y):
+            xs += [r.line_start_x, r.line_end_x]
+            ys += [r.line_start_y, r.line_end_y]
+            boxes.append(r)
+        elif r.x is not None and r.y is not None:
+            w, h = r.width or 100.0, r.height or 60.0
+            xs += [r.x, r.x + w]
+            ys += [r.y, r.y + h]
+            boxes.append(r)
+
+    head = (f'<svg xmlns="http://www.w3.org/2000/svg" width="{WIDTH}" height="{HEIGHT}" '
+            f'viewBox="0 0 {WIDTH} {HEIGHT}"><rect width="{WIDTH}" height="{HEIGHT}" fill="{BACKGROUND}"/>')
+    if not boxes:
+        return head + "</svg>"
+
+    min_x, min_y = min(xs), min(ys)
+    span_x, span_y = max(max(xs) - min_x, 1.0), max(max(ys) - min_y, 1.0)
+    scale = min((WIDTH - 2 * PADDING) / span_x, (HEIGHT - 2 * PADDING) / span_y, MAX_SCALE)
+    # Centre the drawing
+    tx = (WIDTH - span_x * scale) / 2 - min_x * scale
+    ty = (HEIGHT - span_y * scale) / 2 - min_y * scale
+    parts = [head, f'<g transform="translate({_num(tx)} {_num(ty)}) scale({scale:.5g})">']
+    for r in boxes:
+        if r.type == "line":
+            parts.append(
+                f'<line x1="{_num(r.line_start_x)}" y1="{_num(r.line_start_y)}" x2="{_num(r.line_end_x)}" '
+                f'y2="{_num(r.line_end_y)}" stroke="{LINE_STROKE}" stroke-width="2" vector-effect="non-scaling-stroke"/>'
+            )
+            continue
+        w, h = r.width or 100.0, r.height or 60.0
+        fill = IMAGE_FILL if r.type == "image" else _color(r.bgcolor, DEFAULT_FILL)
+        rotate = ""
+        if r.rotation:
+            rotate = f' transform="rotate({_num(r.rotation)} {_num(r.x + w / 2)} {_num(r.y + h / 2)})"'
+        parts.append(f'<rect x="{_num(r.x)}" y="{_num(r.y)}" width="{_num(w)}" height="{_num(h)}" '
+                     f'rx="{_num(min(w, h) * 0.06)}" fill="{fill}"{rotate}/>')
+    parts.append("</g></svg>")
+    return "".join(parts)
+
+
+def get_thumbnail(canvas_id: int) -> tuple[int, str] | None:
+    """(revision, svg) for the canvas' current revision, rendering and storing it if needed.
+
+    None if the canvas doesn't exist or is deleted.
+    """
+    row = db.session.execute(
+        select(Canvas.revision, CanvasThumbnail)
+        .outerjoin(CanvasThumbnail, CanvasThumbnail.canvas_id == Canvas.id)
+        .where(Canvas.id == canvas_id, Canvas.deleted_at.is_(None))
+    ).first()
+    if row is None:
+        return None
+    revision, cached = int(row[0] or 0), row[1]
+    if cached is not None and cached.revision == revision:
+        return revision, cached.svg
+
+    elements = db.session.execute(
+        select(CanvasElement.type, CanvasElement.x, CanvasElement.y, CanvasElement.width, CanvasElement.height,
+               CanvasElement.rotation, CanvasElement.bgcolor, CanvasElement.line_start_x,
+               CanvasElement.line_start_y, CanvasElement.line_end_x, CanvasElement.line_end_y)
+        .where(CanvasElement.canvas_id == canvas_id)
+        .order_by(CanvasElement.order_key, CanvasElement.id)
+        .limit(MAX_ELEMENTS)
+    ).all()
+    svg = render_svg(elements)
+    if cached is None:
+        db.session.add(CanvasThumbnail(canvas_id=canvas_id, revision=revision, svg=svg))
+    else:
+        cached.revision, cached.svg = revision, svg
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another request stored this canvas' first thumbnail at the same time
+        db.session.rollback()
+    return revision, svg
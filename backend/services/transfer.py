@@ -0,0 +1,448 @@
+"""Moving canvases around: streaming export/import and server-side duplication.
+
+Export/import use gzip-compressed NDJSON.
+
+An export is one JSON object per line, in this order:
+
+    {"kind": "canvas", ...}                       exactly one, first
+    {"kind": "element", "id": ..., ...}           one per CanvasElement
+    {"kind": "group", "element_ids": [...], ...}  one per ElementGroup
+    {"kind": "chat", ...}                         at most one
+    {"kind": "chat_message", ...}                 one per ChatMessage
+
+Rows are read in keyset-paginated chunks and compressed incrementally, so memory
+stays flat however large the canvas is. Imports inflate at most READ_SIZE bytes
+at a time, parse the stream line by line (lines are capped at
+`IMPORT_MAX_LINE_BYTES`, the whole stream at `IMPORT_MAX_BYTES`) and insert each
+kind in chunked multi-row INSERTs; element IDs are remapped and groups refer to
+elements by their exported IDs, which is why groups come after elements. Image elements carry blob references only; the blob bytes must already
+exist on the importing server.
+"""
+import json
+import zlib
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, literal, select
+
+from extensions import db
+from models.canvas import Canvas
+from models.canvas_element import CanvasElement
+from models.canvas_thumbnail import CanvasThumbnail
+from models.chat import Chat
+from models.chat_message import ChatMessage
+from models.element_group import ElementGroup, ElementGroupMember
+from services.blobs import externalize_image_data
+from services.order_keys import key_for_index
+
+EXPORT_CHUNK = 1000
+IMPORT_CHUNK = 1000
+READ_SIZE = 64 * 1024
+
+ELEMENT_FIELDS = (
+    "type", "x", "y", "width", "height", "rotation", "z_index", "order_key", "bgcolor", "data",
+    "line_start_x", "line_start_y", "line_end_x", "line_end_y", "created_at", "updated_at",
+)
+MESSAGE_FIELDS = ("text", "is_response", "is_liked", "is_disliked", "created_at")
+ALLOWED_ELEMENT_TYPES = {"rectangle", "text", "image", "line"}
+
+
+class TransferError(ValueError):
+    """Raised for import streams that aren't a valid canvas export."""
+
+
+# ---------------------------
+# Export
+# ---------------------------
+def _keyset_chunks(table, canvas_column, canvas_value, chunk=EXPORT_CHUNK):
+    """Yield lists of row mappings of `table` for one parent id, `chunk` rows per query."""
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(table)
+            .where(canvas_column == canvas_value, table.c.id > last_id)
+            .order_by(table.c.id.asc())
+            .limit(chunk)
+        ).mappings().all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]["id"]
+
+
+def _keyset_rows(table, canvas_column, canvas_value, chunk=EXPORT_CHUNK):
+    for rows in _keyset_chunks(table, canvas_column, canvas_value, chunk):
+        yield from rows
+
+
+def iter_export_lines(canvas: Canvas):
+    """Yield NDJSON lines (str, newline-terminated) for a canvas."""
+    yield json.dumps({"kind": "canvas", "version": 1, **canvas.to_dict()}) + "\n"
+
+    el_table = CanvasElement.__table__
+    for row in _keyset_rows(el_table, el_table.c.canvas_id, canvas.id):
+        yield json.dumps({"kind": "element", **dict(row)}) + "\n"
+
+    grp_table = ElementGroup.__table__
+    member_table = ElementGroupMember.__table__
+    for rows in _keyset_chunks(grp_table, grp_table.c.canvas_id, canvas.id):
+        # Members of the whole chunk in one query
+        members: dict[int, list[int]] = {row["id"]: [] for row in rows}
+        for group_id, element_id in db.session.execute(
+            select(member_table.c.group_id, member_table.c.element_id)
+            .where(member_table.c.group_id.in_(list(members)))
+            .order_by(member_table.c.id)
+        ):
+            members[group_id].append(element_id)
+        for row in rows:
+            yield json.dumps({"kind": "group", **dict(row), "element_ids": members[row["id"]]}) + "\n"
+
+    chat = Chat.query.filter_by(canvas_id=canvas.id).first()
+    if chat:
+        yield json.dumps({"kind": "chat", **chat.to_dict()}) + "\n"
+        msg_table = ChatMessage.__table__
+        for row in _keyset_rows(msg_table, msg_table.c.chat_id, chat.id):
+            yield json.dumps({"kind": "chat_message", **dict(row)}) + "\n"
+
+
+def iter_gzip(lines, level: int = 6):
+    """Gzip-compress an iterable of str incrementally, yielding bytes."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for line in lines:
+        out = compressor.compress(line.encode("utf-8"))
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+# ---------------------------
+# Import
+# ---------------------------
+def _inflate(stream):
+    """Yield a binary stream's bytes, gunzipped if it starts with the gzip magic.
+
+    Each piece is at most READ_SIZE bytes, however well the input compresses.
+    """
+    chunk = stream.read(READ_SIZE)
+    if chunk[:2] != b"\x1f\x8b":
+        while chunk:
+            yield chunk
+            chunk = stream.read(READ_SIZE)
+        return
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    while chunk:
+        data = decompressor.decompress(chunk, READ_SIZE)
+        while True:
+            if data:
+                yield data
+            if not decompressor.unconsumed_tail:
+                break
+            data = decompressor.decompress(decompressor.unconsumed_tail, READ_SIZE)
+        chunk = stream.read(READ_SIZE)
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+def iter_ndjson(stream, max_line: int = 0, max_bytes: int = 0):
+    """Parse NDJSON from a (possibly gzip-compressed) binary stream, one object at a time.
+
+    Memory is bounded by `max_line`: a longer line raises TransferError, as does
+    NDJSON (after decompression) longer than `max_bytes`. 0 means no limit.
+    """
+    pending = bytearray()
+    total = 0
+    for data in _inflate(stream):
+        total += len(data)
+        if max_bytes and total > max_bytes:
+            raise TransferError(f"Import exceeds the {max_bytes} byte limit")
+        start = 0
+        # Only the new data is searched for line breaks
+        while (end := data.find(b"\n", start)) != -1:
+            pending += data[start:end]
+            start = end + 1
+            if max_line and len(pending) > max_line:
+                raise TransferError(f"Line exceeds the {max_line} byte limit")
+            if pending.strip():
+                yield json.loads(pending)
+            pending.clear()
+        pending += data[start:]
+        if max_line and len(pending) > max_line:
+            raise TransferError(f"Line exceeds the {max_line} byte limit")
+    if pending.strip():
+        yield json.loads(pending)
+
+
+def _insert_ids(table, parent_column, parent_id: int, rows: list[dict], after_id: int = 0) -> list[int]:
+    """INSERT rows for a freshly created parent and return their new ids in order.
+
+    SQLite can't return generated keys of an executemany in parameter order (SQLAlchemy
+    falls back to one INSERT per row), so insert in one batch and read the ids back:
+    only this import writes under the new parent, and rows get ascending ids in
+    insertion order, the same property `_id_map` relies on for duplication.
+    """
+    if not rows:
+        return []
+    db.session.execute(insert(table), rows)
+    return db.session.execute(
+        select(table.c.id)
+        .where(parent_column == parent_id, table.c.id > after_id)
+        .order_by(table.c.id.asc())
+        .limit(len(rows))
+    ).scalars().all()
+
+
+def _element_row(obj: dict, canvas_id: int, user_id: int) -> dict:
+    el_type = str(obj.get("type") or "").strip().lower()
+    if el_type not in ALLOWED_ELEMENT_TYPES:
+        raise TransferError(f"Unsupported element type '{el_type}'")
+    row = {k: obj.get(k) for k in ELEMENT_FIELDS}
+    row["type"] = el_type
+    row["canvas_id"] = canvas_id
+    row["x"] = float(row["x"] or 0)
+    row["y"] = float(row["y"] or 0)
+    row["rotation"] = float(row["rotation"] or 0)
+    row["z_index"] = int(row["z_index"] or 0)
+    row["bgcolor"] = (row["bgcolor"] or "#FFFFFF")[:16]
+    data = row["data"] if isinstance(row["data"], dict) else {}
+    row["data"] = externalize_image_data(data, user_id)
+    if not row["order_key"]:
+        row["order_key"] = key_for_index(row["z_index"])
+    for key in ("created_at", "updated_at"):
+        if row[key] is None:
+            del row[key]
+    return row
+
+
+def delete_canvas_rows(canvas_id: int) -> None:
+    """Remove a canvas and everything under it with set-based DELETEs."""
+    chat_ids = select(Chat.id).where(Chat.canvas_id == canvas_id)
+    group_ids = select(ElementGroup.id).where(ElementGroup.canvas_id == canvas_id)
+    db.session.execute(delete(ChatMessage).where(ChatMessage.chat_id.in_(chat_ids)))
+    db.session.execute(delete(Chat).where(Chat.canvas_id == canvas_id))
+    db.session.execute(delete(ElementGroupMember).where(ElementGroupMember.group_id.in_(group_ids)))
+    db.session.execute(delete(ElementGroup).where(ElementGroup.canvas_id == canvas_id))
+    db.session.execute(delete(CanvasElement).where(CanvasElement.canvas_id == canvas_id))
+    db.session.execute(delete(CanvasThumbnail).where(CanvasThumbnail.canvas_id == canvas_id))
+    db.session.execute(delete(Canvas).where(Canvas.id == canvas_id))
+
+
+def import_canvas(user_id: int, stream) -> Canvas:
+    """Create a new canvas for `user_id` from an export stream.
+
+    Rows are committed in chunks; if the stream turns out to be invalid part way,
+    everything created so far is removed and TransferError is raised.
+    """
+    objects = iter_ndjson(stream, max_line=int(current_app.config.get("IMPORT_MAX_LINE_BYTES") or 0),
+                          max_bytes=int(current_app.config.get("IMPORT_MAX_BYTES") or 0))
+    try:
+        head = next(objects)
+    except StopIteration:
+        raise TransferError("Empty import")
+    except TransferError:
+        raise
+    except ValueError:
+        raise TransferError("Invalid NDJSON")
+    if not isinstance(head, dict) or head.get("kind") != "canvas":
+        raise TransferError("First line must be the canvas object")
+
+    canvas = Canvas(
+        user_id=user_id,
+        name=(str(head.get("name") or "").strip() or "Untitled Canvas")[:255],
+        camera_x=float(head.get("camera_x") or 0.0),
+        camera_y=float(head.get("camera_y") or 0.0),
+        camera_zoom_percentage=float(head.get("camera_zoom_percentage") or 100.0),
+    )
+    db.session.add(canvas)
+    db.session.commit()
+    canvas_id = canvas.id
+
+    el_table = CanvasElement.__table__
+    msg_table = ChatMessage.__table__
+    element_ids: dict[int, int] = {}
+    element_batch: list[tuple[int, dict]] = []
+    group_batch: list[tuple[str, list]] = []
+    last_id = {"element": 0, "group": 0}  # highest id inserted so far, per table
+    message_batch: list[dict] = []
+    chat_id = None
+
+    def flush_elements():
+        new_ids = _insert_ids(el_table, el_table.c.canvas_id, canvas_id,
+                              [row for _, row in element_batch], after_id=last_id["element"])
+        last_id["element"] = new_ids[-1]
+        for (old_id, _), new_id in zip(element_batch, new_ids):
+            if old_id is not None:
+                element_ids[old_id] = new_id
+        element_batch.clear()
+        db.session.commit()
+
+    def flush_groups():
+        grp_table = ElementGroup.__table__
+        new_ids = _insert_ids(grp_table, grp_table.c.canvas_id, canvas_id,
+                              [{"canvas_id": canvas_id, "name": name} for name, _ in group_batch],
+                              after_id=last_id["group"])
+        last_id["group"] = new_ids[-1]
+        members = [
+            {"group_id": group_id, "element_id": element_ids[eid]}
+            for (_, old_ids), group_id in zip(group_batch, new_ids)
+            for eid in dict.fromkeys(old_ids)
+            if eid in element_ids
+        ]
+        if members:
+            db.session.execute(insert(ElementGroupMember.__table__), members)
+        group_batch.clear()
+        db.session.commit()
+
+    def ensure_chat():
+        chat = Chat(canvas_id=canvas_id)
+        db.session.add(chat)
+        db.session.flush()
+        return chat.id
+
+    def flush_messages():
+        if message_batch:
+            db.session.execute(insert(msg_table), message_batch)
+            message_batch.clear()
+            db.session.commit()
+
+    try:
+        for obj in objects:
+            kind = obj.get("kind") if isinstance(obj, dict) else None
+            if kind == "element":
+                element_batch.append((obj.get("id"), _element_row(obj, canvas_id, user_id)))
+                if len(element_batch) >= IMPORT_CHUNK:
+                    flush_elements()
+            elif kind == "group":
+                if element_batch:
+                    flush_elements()
+                name = (str(obj.get("name") or "").strip() or "Group")[:255]
+                element_list = obj.get("element_ids") or []
+                if not isinstance(element_list, list):
+                    raise TransferError("Group element_ids must be a list")
+                group_batch.append((name, element_list))
+                if len(group_batch) >= IMPORT_CHUNK:
+                    flush_groups()
+            elif kind == "chat":
+                chat_id = chat_id or ensure_chat()
+            elif kind == "chat_message":
+                chat_id = chat_id or ensure_chat()
+                row = {k: obj.get(k) for k in MESSAGE_FIELDS if obj.get(k) is not None}
+                row["chat_id"] = chat_id
+                row["text"] = str(row.get("text") or "")
+                message_batch.append(row)
+                if len(message_batch) >= IMPORT_CHUNK:
+                    flush_messages()
+            else:
+                raise TransferError(f"Unknown line type '{kind}'")
+        if element_batch:
+            flush_elements()
+        if group_batch:
+            flush_groups()
+        flush_messages()
+        # Every canvas has exactly one chat
+        chat_id = chat_id or ensure_chat()
+        db.session.commit()
+    except (TransferError, ValueError, TypeError, KeyError, zlib.error) as e:
+        db.session.rollback()
+        delete_canvas_rows(canvas_id)
+        db.session.commit()
+        if isinstance(e, TransferError):
+            raise
+        raise TransferError(f"Invalid import: {e}")
+    except Exception:
+        db.session.rollback()
+        delete_canvas_rows(canvas_id)
+        db.session.commit()
+        raise
+
+    return db.session.get(Canvas, canvas_id)
+
+
+# ---------------------------
+# Duplication
+# ---------------------------
+def _id_map(table, parent_column, old_parent: int, new_parent: int):
+    """Subquery pairing each row of the source parent with its copy (old_id, new_id).
+
+    Copies are inserted with INSERT ... SELECT ordered by id, so the n-th source row
+    and the n-th new row (both by id) are the same logical row.
+    """
+    old = select(
+        table.c.id.label("id"),
+        func.row_number().over(order_by=table.c.id).label("rn"),
+    ).where(parent_column == old_parent).subquery()
+    new = select(
+        table.c.id.label("id"),
+        func.row_number().over(order_by=table.c.id).label("rn"),
+    ).where(parent_column == new_parent).subquery()
+    return (
+        select(old.c.id.label("old_id"), new.c.id.label("new_id"))
+        .join_from(old, new, old.c.rn == new.c.rn)
+        .subquery()
+    )
+
+
+def _copy_rows(table, parent_column, old_parent: int, new_parent: int, overrides: dict | None = None):
+    """INSERT ... SELECT every row of one parent under another, preserving id order."""
+    overrides = overrides or {}
+    columns = [c for c in table.columns if c.name != "id"]
+    values = []
+    for c in columns:
+        if c is parent_column:
+            values.append(literal(new_parent))
+        elif c.name in overrides:
+            values.append(literal(overrides[c.name]))
+        else:
+            values.append(c)
+    db.session.execute(
+        insert(table).from_select(
+            [c.name for c in columns],
+            select(*values).where(parent_column == old_parent).order_by(table.c.id),
+        )
+    )
+
+
+def duplicate_canvas(source: Canvas, name: str | None = None, include_chat: bool = False) -> Canvas:
+    """Copy a canvas, its elements, groups and memberships (and optionally chat) in one transaction.
+
+    Everything below the canvas row is copied with set-based INSERT ... SELECT
+    statements, so the cost doesn't depend on HTTP round trips or Python loops.
+    """
+    copy = Canvas(
+        user_id=source.user_id,
+        name=(name or f"{source.name} (copy)")[:255],
+        camera_x=source.camera_x,
+        camera_y=source.camera_y,
+        camera_zoom_percentage=source.camera_zoom_percentage,
+    )
+    db.session.add(copy)
+    db.session.flush()
+
+    el_table = CanvasElement.__table__
+    grp_table = ElementGroup.__table__
+    member_table = ElementGroupMember.__table__
+    _copy_rows(el_table, el_table.c.canvas_id, source.id, copy.id)
+    _copy_rows(grp_table, grp_table.c.canvas_id, source.id, copy.id)
+
+    el_map = _id_map(el_table, el_table.c.canvas_id, source.id, copy.id)
+    grp_map = _id_map(grp_table, grp_table.c.canvas_id, source.id, copy.id)
+    db.session.execute(
+        insert(member_table).from_select(
+            ["group_id", "element_id"],
+            select(grp_map.c.new_id, el_map.c.new_id)
+            .select_from(member_table)
+            .join(grp_map, grp_map.c.old_id == member_table.c.group_id)
+            .join(el_map, el_map.c.old_id == member_table.c.element_id),
+        )
+    )
+
+    chat = Chat(canvas_id=copy.id)
+    db.session.add(chat)
+    db.session.flush()
+    if include_chat:
+        source_chat_id = db.session.query(Chat.id).filter_by(canvas_id=source.id).scalar()
+        if source_chat_id is not None:
+            msg_table = ChatMessage.__table__
+            _copy_rows(msg_table, msg_table.c.chat_id, source_chat_id, chat.id)
+
+    db.session.commit()
+    return copy
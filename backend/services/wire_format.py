@@ -0,0 +1,107 @@
+"""Packed binary encoding of a canvas's elements (`application/x-learnable-elements`).
+
+Layout, little-endian, every section 4-byte aligned:
+
+    header   16 bytes: magic b"LRNE", u16 version, u16 column count,
+             u32 element count, u32 side table length in bytes
+    columns  one typed array per entry in COLUMNS, `count` values each
+    side     UTF-8 JSON object of per-element arrays for the non-numeric
+             fields: {"columns": [[name, type], ...], "type": [...],
+             "order_key": [...], "bgcolor": [...], "data": [...]}
+
+Columns are in stacking order, like the JSON list. Floats are Float32 (NULL is
+NaN), so very large coordinates lose precision past ~7 significant digits.
+Clients map each column with `new Float32Array(buf, offset, count)` without
+copying; see `frontend/src/lib/elementWire.ts`.
+"""
+import json
+import math
+import struct
+import sys
+from array import array
+
+from sqlalchemy import select
+
+from extensions import db
+from models.canvas_element import CanvasElement
+from services.serialization import dumps
+
+MEDIA_TYPE = "application/x-learnable-elements"
+MAGIC = b"LRNE"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+
+# (name, array typecode, JSON type name): i = Int32, I = Uint32, f = Float32
+COLUMNS = (
+    ("id", "i", "int32"),
+    ("x", "f", "float32"),
+    ("y", "f", "float32"),
+    ("width", "f", "float32"),
+    ("height", "f", "float32"),
+    ("rotation", "f", "float32"),
+    ("z_index", "i", "int32"),
+    ("line_start_x", "f", "float32"),
+    ("line_start_y", "f", "float32"),
+    ("line_end_x", "f", "float32"),
+    ("line_end_y", "f", "float32"),
+    ("created_at", "I", "uint32"),
+    ("updated_at", "I", "uint32"),
+)
+SIDE_FIELDS = ("type", "order_key", "bgcolor", "data")
+
+
+def _column_values(values, typecode: str):
+    if typecode == "f":
+        return [math.nan if v is None else v for v in values]
+    return [v or 0 for v in values]
+
+
+def encode_elements(rows) -> bytes:
+    """Pack rows of (*COLUMNS, *SIDE_FIELDS) values."""
+    count = len(rows)
+    columns = list(zip(*rows)) if rows else [()] * (len(COLUMNS) + len(SIDE_FIELDS))
+    parts = []
+    for (_, typecode, _), values in zip(COLUMNS, columns):
+        arr = array(typecode, _column_values(values, typecode))
+        if sys.byteorder == "big":
+            arr.byteswap()
+        parts.append(arr.tobytes())
+
+    side = {"columns": [[name, kind] for name, _, kind in COLUMNS]}
+    for name, values in zip(SIDE_FIELDS, columns[len(COLUMNS):]):
+        side[name] = list(values)
+    side["data"] = [d or {} for d in side["data"]]
+    side_bytes = dumps(side)
+    side_bytes += b" " * (-len(side_bytes) % 4)
+
+    header = HEADER.pack(MAGIC, VERSION, len(COLUMNS), count, len(side_bytes))
+    return b"".join([header, *parts, side_bytes])
+
+
+def decode_elements(buf: bytes) -> dict:
+    """Inverse of `encode_elements` (columns as memoryviews); used by tooling and the benchmark."""
+    magic, version, ncols, count, side_len = HEADER.unpack_from(buf)
+    if magic != MAGIC or version != VERSION or ncols != len(COLUMNS):
+        raise ValueError("Not a Learnable element buffer")
+    view = memoryview(buf)
+    offset = HEADER.size
+    out = {}
+    for name, typecode, _ in COLUMNS:
+        out[name] = view[offset:offset + count * 4].cast(typecode)
+        offset += count * 4
+    side = json.loads(bytes(view[offset:offset + side_len]))
+    for name in SIDE_FIELDS:
+        out[name] = side[name]
+    out["count"] = count
+    return out
+
+
+def canvas_elements_packed(canvas_id: int) -> bytes:
+    cols = [getattr(CanvasElement, name) for name, _, _ in COLUMNS]
+    cols += [getattr(CanvasElement, name) for name in SIDE_FIELDS]
+    rows = db.session.execute(
+        select(*cols)
+        .where(CanvasElement.canvas_id == canvas_id)
+        .order_by(CanvasElement.order_key.asc(), CanvasElement.id.asc())
+    ).all()
+    return encode_elements(rows)
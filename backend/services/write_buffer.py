@@ -0,0 +1,241 @@
+"""Write-behind buffer for high-frequency geometry updates.
+
+Dragging, resizing and rotating elements and panning the camera produce a stream
+of small PATCHes. Geometry-only PATCHes are staged here instead of being
+committed one by one: the latest value per element/canvas field wins, and a
+background thread writes everything staged in a single transaction every
+`GEOMETRY_FLUSH_INTERVAL` seconds.
+
+Consistency rules:
+- Reads of a canvas (`flush(canvas_id)`) and any non-geometry write to it flush
+  its staged rows first, so clients always read their own writes. The canvas
+  list overlays staged camera fields instead (`overlay_cameras`).
+- Flushes are serialized, so an older batch can never commit after a newer one.
+- Rows staged for elements deleted since are dropped. A failed batch is put
+  back only after a transient error, so one bad row can't wedge the buffer.
+- Pending rows are flushed at interpreter exit.
+
+Set `GEOMETRY_FLUSH_INTERVAL` to 0 to disable buffering (every PATCH commits).
+Staged rows live in one process, so the buffer is only safe with a single
+server process; `gunicorn.conf.py` turns it off when running more workers.
+"""
+import atexit
+import threading
+from time import time
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.exc import OperationalError
+
+from extensions import db
+from models.canvas import Canvas
+from models.canvas_element import CanvasElement
+from services.change_feed import record_changes
+
+# Fields that may be buffered; PATCHes touching anything else are written through
+ELEMENT_FIELDS = frozenset({
+    "x", "y", "width", "height", "rotation",
+    "line_start_x", "line_start_y", "line_end_x", "line_end_y",
+})
+NULLABLE_ELEMENT_FIELDS = frozenset({
+    "width", "height", "line_start_x", "line_start_y", "line_end_x", "line_end_y",
+})
+CAMERA_FIELDS = frozenset({"camera_x", "camera_y", "camera_zoom_percentage"})
+
+
+def _update_rows(table, rows: list[dict]) -> None:
+    """UPDATE rows by id, one executemany per distinct set of columns.
+
+    Core rather than ORM bulk updates, which raise when a row no longer exists.
+    """
+    by_columns: dict[tuple, list[dict]] = {}
+    for row in rows:
+        by_columns.setdefault(tuple(sorted(k for k in row if k != "id")), []).append(row)
+    for columns, group in by_columns.items():
+        stmt = (update(table).where(table.c.id == bindparam("row_id"))
+                .values({c: bindparam(f"new_{c}") for c in columns}))
+        db.session.execute(stmt, [{"row_id": r["id"], **{f"new_{c}": r[c] for c in columns}} for r in group])
+
+
+def coerce_fields(body: dict, nullable=frozenset()) -> dict:
+    """Convert PATCH values to floats. Raises TypeError/ValueError like the routes expect."""
+    out = {}
+    for key, value in body.items():
+        if value is None and key in nullable:
+            out[key] = None
+        else:
+            out[key] = float(value)
+    return out
+
+
+class GeometryBuffer:
+    def __init__(self):
+        self.app = None
+        self.interval = 0.0
+        self._lock = threading.Lock()
+        # Held for the whole swap + commit so batches land in order
+        self._flush_lock = threading.Lock()
+        self._elements: dict[int, dict] = {}  # element_id -> {"canvas_id", "fields"}
+        self._cameras: dict[int, dict] = {}  # canvas_id -> fields
+        self._thread = None
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = float(app.config.get("GEOMETRY_FLUSH_INTERVAL", 0) or 0)
+        atexit.register(self.shutdown)
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    # ---------------------------
+    # Staging
+    # ---------------------------
+    def stage_element(self, element_id: int, canvas_id: int, fields: dict) -> None:
+        with self._lock:
+            entry = self._elements.setdefault(element_id, {"canvas_id": canvas_id, "fields": {}})
+            entry["fields"].update(fields)
+        self._ensure_thread()
+
+    def stage_camera(self, canvas_id: int, fields: dict) -> None:
+        with self._lock:
+            self._cameras.setdefault(canvas_id, {}).update(fields)
+        self._ensure_thread()
+
+    def overlay_element(self, data: dict) -> dict:
+        """Apply staged fields to a serialized element (for PATCH responses)."""
+        with self._lock:
+            entry = self._elements.get(data["id"])
+            if entry:
+                data.update(entry["fields"])
+        return data
+
+    def overlay_camera(self, data: dict) -> dict:
+        with self._lock:
+            data.update(self._cameras.get(data["id"], {}))
+        return data
+
+    def overlay_cameras(self, rows: list[dict]) -> list[dict]:
+        """Apply staged camera fields to serialized canvases, so listing them needn't flush."""
+        with self._lock:
+            if self._cameras:
+                for data in rows:
+                    data.update(self._cameras.get(data["id"], {}))
+        return rows
+
+    def discard_element(self, element_id: int) -> None:
+        with self._lock:
+            self._elements.pop(element_id, None)
+
+    def discard_canvas(self, canvas_id: int) -> None:
+        with self._lock:
+            self._cameras.pop(canvas_id, None)
+            for eid in [k for k, v in self._elements.items() if v["canvas_id"] == canvas_id]:
+                del self._elements[eid]
+
+    # ---------------------------
+    # Flushing
+    # ---------------------------
+    def _take(self, canvas_id: int | None):
+        with self._lock:
+            if canvas_id is None:
+                elements, self._elements = self._elements, {}
+                cameras, self._cameras = self._cameras, {}
+                return elements, cameras
+            elements = {k: v for k, v in self._elements.items() if v["canvas_id"] == canvas_id}
+            for eid in elements:
+                del self._elements[eid]
+            cameras = {}
+            if canvas_id in self._cameras:
+                cameras[canvas_id] = self._cameras.pop(canvas_id)
+            return elements, cameras
+
+    def has_pending(self, canvas_id: int | None = None) -> bool:
+        with self._lock:
+            if canvas_id is None:
+                return bool(self._elements or self._cameras)
+            return canvas_id in self._cameras or any(
+                v["canvas_id"] == canvas_id for v in self._elements.values()
+            )
+
+    def flush(self, canvas_id: int | None = None) -> int:
+        """Commit staged rows (all, or one canvas's) in one transaction.
+
+        Must run inside an app context. Returns the number of rows written. Rows
+        for elements deleted since they were staged are dropped. A failed batch is
+        put back only if the error is transient (e.g. the database was locked).
+        """
+        # Cheap fast path for the common read with nothing staged
+        if not self.has_pending(canvas_id) and not self._flush_lock.locked():
+            return 0
+        with self._flush_lock:
+            elements, cameras = self._take(canvas_id)
+            if not elements and not cameras:
+                return 0
+            now = int(time())
+            try:
+                if elements:
+                    # Skip elements deleted after they were staged rather than failing the batch
+                    live = set(db.session.scalars(
+                        select(CanvasElement.id).where(CanvasElement.id.in_(list(elements)))
+                    ))
+                    elements = {eid: e for eid, e in elements.items() if eid in live}
+                    _update_rows(CanvasElement.__table__, [
+                        {"id": eid, **e["fields"], "updated_at": now} for eid, e in elements.items()
+                    ])
+                    by_canvas: dict[int, list] = {}
+                    for eid, e in elements.items():
+                        by_canvas.setdefault(e["canvas_id"], []).append({"id": eid, **e["fields"]})
+                    for cid, changes in by_canvas.items():
+                        record_changes(cid, "element", "updated", changes)
+                if cameras:
+                    _update_rows(Canvas.__table__, [{"id": cid, **f} for cid, f in cameras.items()])
+                db.session.commit()
+                # Rows were written behind the identity map and sessions don't expire on commit
+                db.session.expire_all()
+            except OperationalError:
+                db.session.rollback()
+                # Transient (locked database, ...): put the batch back unless newer values were staged meanwhile
+                with self._lock:
+                    for eid, e in elements.items():
+                        cur = self._elements.setdefault(eid, {"canvas_id": e["canvas_id"], "fields": {}})
+                        cur["fields"] = {**e["fields"], **cur["fields"]}
+                    for cid, f in cameras.items():
+                        self._cameras[cid] = {**f, **self._cameras.get(cid, {})}
+                raise
+            except Exception:
+                # Retrying a batch that can't be written would fail every later flush too
+                db.session.rollback()
+                raise
+            return len(elements) + len(cameras)
+
+    # ---------------------------
+    # Background thread
+    # ---------------------------
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="geometry-flush", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception as e:
+                print("Error flushing geometry buffer:", e)
+
+    def shutdown(self):
+        """Stop the flush thread and write whatever is still staged."""
+        self._stop.set()
+        if self.app is not None and self.has_pending():
+            with self.app.app_context():
+                self.flush()
+
+
+write_buffer = GeometryBuffer()
@@ -0,0 +1,8 @@
+"""WSGI entry point for production servers: `gunicorn -c gunicorn.conf.py`."""
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from factory import create_app
+
+app = create_app()
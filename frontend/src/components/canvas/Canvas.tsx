@@ -1,7 +1,7 @@
 import { useMemo, useRef, useState, useEffect } from 'react';
 import { useParams } from 'react-router-dom';
 import { CanvasBottomBar } from '@/components/canvas/CanvasBottomBar';
-import { CanvasAPI } from '@/lib/api';
+import { CanvasAPI, type ElementPlacement } from '@/lib/api';
 import { useCanvasInteraction } from '@/components/canvas/interaction';
 import { Rectangle } from '@/components/canvas/Rectangle';
 import { TextField } from '@/components/canvas/TextField';
@@ -12,6 +12,36 @@ import { PanelLeftOpen } from 'lucide-react';
 
 // interactions consolidated in interaction hook
 
+// Placements that turn the bottom-first order `before` into `after`. Elements on a
+// longest run that already keeps its relative order stay put; every other element
+// is placed after its new lower neighbour (or below the first staying one).
+function layerPlacements(before: number[], after: number[]): [number, ElementPlacement][] {
+  const oldIndex = new Map(before.map((id, i) => [id, i] as [number, number]));
+  const seq = after.map((id) => oldIndex.get(id) ?? -1);
+  // Longest increasing subsequence of old positions (patience sorting)
+  const tails: number[] = [];
+  const prevOf: number[] = new Array(seq.length).fill(-1);
+  for (let i = 0; i < seq.length; i++) {
+    if (seq[i] < 0) continue;
+    let lo = 0, hi = tails.length;
+    while (lo < hi) {
+      const mid = (lo + hi) >> 1;
+      if (seq[tails[mid]] < seq[i]) lo = mid + 1; else hi = mid;
+    }
+    prevOf[i] = lo > 0 ? tails[lo - 1] : -1;
+    tails[lo] = i;
+  }
+  const staying = new Set<number>();
+  for (let i = tails.length ? tails[tails.length - 1] : -1; i >= 0; i = prevOf[i]) staying.add(i);
+  const firstStaying = after[Math.min(...staying)];
+  const out: [number, ElementPlacement][] = [];
+  for (let i = 0; i < after.length; i++) {
+    if (staying.has(i)) continue;
+    out.push([after[i], i === 0 ? { place_before: firstStaying } : { place_after: after[i - 1] }]);
+  }
+  return out;
+}
+
 type Props = {
   rightOffsetPercent?: number;
   canvasId?: number | null;
@@ -100,26 +130,26 @@ export const Canvas = ({ rightOffsetPercent = 0, canvasId = null }: Props) => {
   };
 
   const handleReorderLayers = async (allOrderedIdsTopFirst: number[]) => {
-    // Assign z-index sequentially across ALL elements so ordering is stable.
-    setElements((prev) => {
-      const idToZ = new Map<number, number>();
-      const total = allOrderedIdsTopFirst.length;
-      // Top (index 0) gets highest z
-      for (let i = 0; i < total; i++) {
-        const id = allOrderedIdsTopFirst[i];
-        idToZ.set(id, total - i);
+    const before = [...elements].sort((a, b) => (a.z_index ?? 0) - (b.z_index ?? 0)).map((el) => el.id);
+    const after = [...allOrderedIdsTopFirst].reverse();
+    // Local z is the rank; top (index 0) gets the highest
+    const total = allOrderedIdsTopFirst.length;
+    const idToZ = new Map(allOrderedIdsTopFirst.map((id, i) => [id, total - i] as [number, number]));
+    setElements((prev) => prev.map((el) => (idToZ.has(el.id) ? { ...el, z_index: idToZ.get(el.id)! } : el)));
+    const token = localStorage.getItem('learnableToken') || '';
+    if (!token) return;
+    // One place_after/place_before PATCH per moved element (a single drag is one request)
+    try {
+      for (const [id, placement] of layerPlacements(before, after)) {
+        await CanvasAPI.updateElement(token, id, placement);
       }
-      const next = prev.map((el) => (idToZ.has(el.id) ? { ...el, z_index: idToZ.get(el.id)! } : el));
-      const token = localStorage.getItem('learnableToken') || '';
-      if (token) {
-        (async () => {
-          for (const [id, z] of idToZ.entries()) {
-            try { await CanvasAPI.updateElement(token, id, { z_index: z } as any); } catch {}
-          }
-        })();
+    } catch (err) {
+      console.error('Failed to save layer order', err);
+      // Show what the server actually has rather than an order that wasn't saved
+      if (parsedCanvasId) {
+        try { setElements(await CanvasAPI.listElements(token, parsedCanvasId)); } catch {}
       }
-      return next;
-    });
+    }
   };
 
   // Groups state
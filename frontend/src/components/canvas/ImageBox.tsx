@@ -1,4 +1,5 @@
 import type { CanvasElement } from '@/types/api';
+import { API_BASE_URL } from '@/config';
 import { ElementHandles } from './ElementHandles';
 
 type Props = {
@@ -11,7 +12,9 @@ type Props = {
 };
 
 export const ImageBox = ({ el, style, onMouseDownMove, onResizeHandle, onRotateHandle, showControls }: Props) => {
-  const url = (el.data as any)?.url || '';
+  const rawUrl: string = (el.data as any)?.url || '';
+  // Blob-store references are API-relative (/api/blobs/<sha256>)
+  const url = rawUrl.startsWith('/api/') ? `${API_BASE_URL}${rawUrl}` : rawUrl;
   const cropScaleRaw = (el.data as any)?.cropScale;
   const cropScale: number | null = (cropScaleRaw === undefined || cropScaleRaw === null) ? null : Number(cropScaleRaw) || 1;
   const selectedCls = showControls ? 'outline outline-1 outline-[#1E52F1]' : 'hover:outline hover:outline-1 hover:outline-[#1E52F1]';
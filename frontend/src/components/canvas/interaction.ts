@@ -1,6 +1,6 @@
 import { useCallback, useEffect, useMemo, useRef, useState } from 'react';
 import type { CanvasElement } from '@/types/api';
-import { CanvasAPI } from '@/lib/api';
+import { BlobAPI, CanvasAPI } from '@/lib/api';
 
 type MovementArgs = {
   zoom: number;
@@ -409,7 +409,6 @@ export function useCanvasInteraction({ containerRef, parsedCanvasId }: UseCanvas
         width: patch.width,
         height: patch.height,
         rotation: patch.rotation,
-        z_index: patch.z_index,
         data: patch.data as any,
       } as any);
     },
@@ -594,7 +593,7 @@ export function useCanvasInteraction({ containerRef, parsedCanvasId }: UseCanvas
               canvas_id: parsedCanvasId,
               type: 'line',
               x: minX, y: minY, width: bw, height: bh,
-              rotation: 0, z_index: nextZ,
+              rotation: 0,
               bgcolor: '#FFFFFF',
               line_start_x: sx,
               line_start_y: sy,
@@ -602,31 +601,20 @@ export function useCanvasInteraction({ containerRef, parsedCanvasId }: UseCanvas
               line_end_y: ey,
               data: { stroke_width: 2 },
             } as any);
-            if (!created.z_index || created.z_index < nextZ) {
-              created = { ...created, z_index: nextZ } as any;
-            }
-            // Persist z-index explicitly in case backend normalized to 0
-            try {
-              const updated = await CanvasAPI.updateElement(token, created.id, { z_index: nextZ } as any);
-              created = { ...created, z_index: updated.z_index ?? nextZ } as any;
-            } catch {}
+            // The server stacks new elements on top; z_index is only the local rank
+            created = { ...created, z_index: nextZ } as any;
           } else {
             const nextZ = getTopZ();
             created = await CanvasAPI.createElement(token, {
               canvas_id: parsedCanvasId,
               type: draft.type === 'rect' ? 'rectangle' : 'text',
               x, y, width: w, height: h,
-              rotation: 0, z_index: nextZ,
+              rotation: 0,
               bgcolor: '#FFFFFF',
               data: draft.type === 'text' ? { text: 'Text', fontSize: 16 } : {},
             } as any);
-            if (!created.z_index || created.z_index < nextZ) {
-              created = { ...created, z_index: nextZ } as any;
-            }
-            try {
-              const updated = await CanvasAPI.updateElement(token, created.id, { z_index: nextZ } as any);
-              created = { ...created, z_index: updated.z_index ?? nextZ } as any;
-            } catch {}
+            // The server stacks new elements on top; z_index is only the local rank
+            created = { ...created, z_index: nextZ } as any;
           }
           setElements((prev) => [...prev, created]);
           if (draft.type === 'text') {
@@ -780,6 +768,12 @@ export function useCanvasInteraction({ containerRef, parsedCanvasId }: UseCanvas
     });
     const center = getCanvasCenter();
     const base = pos ?? center;
+    // Store the bytes once in the blob store; fall back to inline data if the upload fails
+    let imageData: Record<string, unknown> = { url: dataUrl };
+    try {
+      const stored = await BlobAPI.upload(token, await (await fetch(dataUrl)).blob());
+      imageData = { url: stored.url, blob: stored.sha256 };
+    } catch { }
     try {
       let created = await CanvasAPI.createElement(token, {
         canvas_id: parsedCanvasId,
@@ -789,17 +783,9 @@ export function useCanvasInteraction({ containerRef, parsedCanvasId }: UseCanvas
         width: imgDims.w,
         height: imgDims.h,
         rotation: 0,
-        z_index: nextZ,
-        data: { url: dataUrl },
+        data: imageData,
       } as any);
-      if (!created.z_index || created.z_index < nextZ) {
-        try {
-          const updated = await CanvasAPI.updateElement(token, created.id, { z_index: nextZ } as any);
-          created = { ...created, z_index: updated.z_index ?? nextZ } as any;
-        } catch {
-          created = { ...created, z_index: nextZ } as any;
-        }
-      }
+      created = { ...created, z_index: nextZ } as any;
       setElements((prev) => [...prev, created]);
     } catch { }
   };
@@ -833,17 +819,9 @@ export function useCanvasInteraction({ containerRef, parsedCanvasId }: UseCanvas
         width: imgDims.w,
         height: imgDims.h,
         rotation: 0,
-        z_index: nextZ,
         data: { url },
       } as any);
-      if (!created.z_index || created.z_index < nextZ) {
-        try {
-          const updated = await CanvasAPI.updateElement(token, created.id, { z_index: nextZ } as any);
-          created = { ...created, z_index: updated.z_index ?? nextZ } as any;
-        } catch {
-          created = { ...created, z_index: nextZ } as any;
-        }
-      }
+      created = { ...created, z_index: nextZ } as any;
       setElements((prev) => [...prev, created]);
     } catch { }
   };
@@ -7,6 +7,10 @@ import { ChatInput } from './ChatInput';
 import { Message } from './types';
 import { extractCardContent } from './utils';
 
+// Polling a reply another server worker is still generating (the server gives up on it after 10 minutes)
+const PENDING_POLL_MS = 2000;
+const MAX_PENDING_POLLS = 300;
+
 export const Chat = () => {
   const [messages, setMessages] = useState<Message[]>([]);
   const [input, setInput] = useState('');
@@ -78,70 +82,137 @@ export const Chat = () => {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [activeGraphId, isAuthed, apiBaseUrl]);
 
-  // Fetch assistant response (streaming)
+  // Fetch assistant response (streaming). The server keeps generating if the connection drops,
+  // so on a network error we reattach with the last event id instead of asking again.
   const fetchAssistantResponse = async (prompt: string, assistantId: string) => {
-    try {
-      const response = await ChatAPI.stream(prompt, (window as any).learnableActiveGraphId || undefined);
-      if (!response.ok || !response.body) throw new Error('Failed to fetch');
+    const token = localStorage.getItem('learnableToken') || '';
+    let streamId: string | null = null;
+    let lastEventId: string | null = null;
 
+    const updateRaw = (next: (raw: string) => string) => {
+      setMessages((prev) => prev.map((msg) => {
+        if (msg.id !== assistantId) return msg;
+        const combinedRaw = next(msg.rawText ?? '');
+        // Show normal text while streaming, but strip any <card> blocks from the visible text
+        const display = combinedRaw.replace(/<card>[\s\S]*?<\/card>/gi, '');
+        return { ...msg, rawText: combinedRaw, text: display };
+      }));
+    };
+
+    // The reply is final at the `reply` event (or [DONE] from older servers); a card may follow it
+    let finished = false;
+    // Set by a resync from a worker that doesn't run this stream while the reply is still being written
+    let pending = false;
+    const finish = () => {
+      if (finished) return;
+      finished = true;
+      setMessages((prev) => prev.map((msg) => {
+        if (msg.id !== assistantId) return msg;
+        const source = msg.rawText ?? msg.text;
+        const { cleaned, card } = extractCardContent(source);
+        const hasCard = !!card;
+        // Keep the cleaned normal text, and also show the Proposed Card if present
+        return { ...msg, text: cleaned, isGenerating: false, showProposal: hasCard, cardContent: card, rawText: '' };
+      }));
+    };
+
+    const showCard = (card?: string) => {
+      if (!card) return;
+      setMessages((prev) => prev.map((msg) => (
+        msg.id === assistantId ? { ...msg, showProposal: true, cardContent: card } : msg
+      )));
+    };
+
+    // Handle one SSE event; returns true on [DONE]
+    const handleEvent = (raw: string) => {
+      let event = 'message';
+      const data: string[] = [];
+      for (const line of raw.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('id:')) lastEventId = line.slice(3).trim();
+        else if (line.startsWith('data:')) data.push(line.slice(5).trim());
+      }
+      const payload = data.join('\n');
+      if (!payload) return false;
+      if (payload === '[DONE]') return true;
+      try {
+        const parsed = JSON.parse(payload);
+        if (event === 'stream') {
+          // Sent at the start of a full replay: the events that follow rebuild the whole reply
+          streamId = parsed.stream_id ?? null;
+          updateRaw(() => '');
+        }
+        else if (event === 'reply') finish();
+        else if (event === 'card') showCard(parsed.card);
+        else if (event === 'resync') {
+          pending = parsed.complete === false;
+          updateRaw(() => parsed.text ?? '');
+          // Saved text isn't tied to an event id; if the run turns up, replay it from the start
+          if (pending) lastEventId = null;
+        }
+        else if (parsed.content) updateRaw((raw) => raw + parsed.content);
+      } catch (err) {
+        console.error('Stream parse error:', err);
+      }
+      return false;
+    };
+
+    // Read one response to the end; returns true once [DONE] arrived
+    const consume = async (response: Response) => {
+      if (!response.ok || !response.body) throw new Error('Failed to fetch');
       const reader = response.body.getReader();
       const decoder = new TextDecoder();
       let buffer = '';
-
-      const processBuffer = () => {
-        let handledDone = false;
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
         let boundary = buffer.indexOf('\n\n');
         while (boundary !== -1) {
           const eventChunk = buffer.slice(0, boundary).trim();
           buffer = buffer.slice(boundary + 2);
           boundary = buffer.indexOf('\n\n');
-          if (!eventChunk.startsWith('data:')) continue;
-          const payload = eventChunk.slice(5).trim();
-          if (!payload) continue;
-          if (payload === '[DONE]') { handledDone = true; break; }
-
-          try {
-            const parsed: { content?: string } = JSON.parse(payload);
-            const content = parsed.content ?? '';
-            if (!content) continue;
-            setMessages((prev) => prev.map((msg) => {
-              if (msg.id !== assistantId) return msg;
-              const combinedRaw = `${msg.rawText ?? ''}${content}`;
-              // Show normal text while streaming, but strip any <card> blocks from the visible text
-              const display = combinedRaw.replace(/<card>[\s\S]*?<\/card>/gi, '');
-              return { ...msg, rawText: combinedRaw, text: display };
-            }));
-          } catch (err) {
-            console.error('Stream parse error:', err);
+          if (handleEvent(eventChunk)) {
+            void reader.cancel();
+            return true;
           }
         }
+      }
+      buffer += decoder.decode();
+      return buffer.trim() ? handleEvent(buffer.trim()) : false;
+    };
 
-        if (handledDone) {
-          setMessages((prev) => prev.map((msg) => {
-            if (msg.id !== assistantId) return msg;
-            const source = msg.rawText ?? msg.text;
-            const { cleaned, card } = extractCardContent(source);
-            const hasCard = !!card;
-            // Keep the cleaned normal text, and also show the Proposed Card if present
-            return { ...msg, text: cleaned, isGenerating: false, showProposal: hasCard, cardContent: card, rawText: '' };
-          }));
+    let lastError: unknown = null;
+    let polls = 0;
+    for (let attempt = 0; attempt < 4; attempt++) {
+      try {
+        if (attempt > 0) await new Promise((r) => setTimeout(r, 500 * attempt));
+        const response = streamId
+          ? await ChatAPI.resume(token, streamId, lastEventId)
+          : await ChatAPI.stream(token, prompt, (window as any).learnableActiveGraphId || undefined);
+        pending = false;
+        if (await consume(response)) {
+          finish();
+          return;
         }
-        return handledDone;
-      };
-
-      while (true) {
-        const { value, done } = await reader.read();
-        if (done) break;
-        buffer += decoder.decode(value, { stream: true });
-        if (processBuffer()) return;
+      } catch (error) {
+        lastError = error;
       }
-      buffer += decoder.decode();
-      processBuffer();
-    } catch (error) {
-      const msg = error instanceof Error ? error.message : 'Network error';
-      setMessages((prev) => prev.map((m) => (m.id === assistantId ? { ...m, text: "Sorry, I couldn't reach the server. Please try again.", isGenerating: false } : m)));
-      toast({ variant: 'destructive', description: msg });
+      // Another worker is still generating: poll its saved text until the reply is complete
+      if (pending && polls < MAX_PENDING_POLLS) {
+        polls++;
+        attempt = -1; // a poll isn't a failed attempt
+        await new Promise((r) => setTimeout(r, PENDING_POLL_MS));
+        continue;
+      }
+      // Without a stream id the request never started generating; don't send the prompt twice
+      if (!streamId) break;
     }
+    // The reply itself arrived; only the optional card was lost
+    if (finished) return;
+    const msg = lastError instanceof Error ? lastError.message : 'Network error';
+    setMessages((prev) => prev.map((m) => (m.id === assistantId ? { ...m, text: "Sorry, I couldn't reach the server. Please try again.", isGenerating: false } : m)));
+    toast({ variant: 'destructive', description: msg });
   };
 
   // Actions
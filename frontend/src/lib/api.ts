@@ -1,8 +1,24 @@
 import { API_BASE_URL } from '@/config';
-import type { Canvas, ChatMessage, CanvasElement, ElementGroup } from '@/types/api';
+import type { Canvas, CanvasPage, ChatMessage, CanvasElement, ElementGroup } from '@/types/api';
+import { ELEMENT_WIRE_TYPE, decodeElements, type PackedElements } from '@/lib/elementWire';
 
 const authHeader = (token?: string) => (token ? { Authorization: `Bearer ${token}` } : {});
 
+// Writes are rate limited per user (429 + Retry-After); bursts such as saving a
+// multi-element drag wait out the limit instead of dropping writes.
+const WRITE_RETRIES = 3;
+async function fetchWrite(url: string, init: RequestInit): Promise<Response> {
+  for (let attempt = 0; ; attempt++) {
+    const res = await fetch(url, init);
+    if (res.status !== 429 || attempt >= WRITE_RETRIES) return res;
+    const wait = Number(res.headers.get('Retry-After'));
+    await new Promise((r) => setTimeout(r, Math.min(Number.isFinite(wait) && wait > 0 ? wait : 1, 10) * 1000));
+  }
+}
+
+// Moves an element directly above / below another one in the stacking order
+export type ElementPlacement = { place_after?: number; place_before?: number };
+
 export const CanvasAPI = {
   async listCanvases(token: string): Promise<Canvas[]> {
     const res = await fetch(`${API_BASE_URL}/api/canvas/canvases`, { headers: { ...authHeader(token) } });
@@ -10,6 +26,18 @@ export const CanvasAPI = {
     if (!res.ok) throw new Error(data?.error || 'Failed to load canvases');
     return data as Canvas[];
   },
+  // One page, newest first by default; pass next_cursor back as `cursor` for the next one.
+  async listCanvasPage(
+    token: string,
+    opts: { limit?: number; cursor?: string | null; order?: 'asc' | 'desc' } = {},
+  ): Promise<CanvasPage> {
+    const params = new URLSearchParams({ limit: String(opts.limit ?? 24), order: opts.order ?? 'desc' });
+    if (opts.cursor) params.set('cursor', opts.cursor);
+    const res = await fetch(`${API_BASE_URL}/api/canvas/canvases?${params}`, { headers: { ...authHeader(token) } });
+    const data = await res.json();
+    if (!res.ok) throw new Error(data?.error || 'Failed to load canvases');
+    return data as CanvasPage;
+  },
   async listGroups(token: string, canvasId: number): Promise<ElementGroup[]> {
     const res = await fetch(`${API_BASE_URL}/api/canvas/groups?canvas_id=${canvasId}`, {
       headers: { ...authHeader(token) },
@@ -106,14 +134,27 @@ export const CanvasAPI = {
     });
     const data = await res.json();
     if (!res.ok) throw new Error(data?.error || 'Failed to load elements');
-    return data as CanvasElement[];
+    // The list comes back in stacking (order_key) order; z_index is just the rank in it
+    return (data as CanvasElement[]).map((el, i) => ({ ...el, z_index: i + 1 }));
+  },
+
+  // Same list as listElements, as packed typed-array columns (much smaller for big canvases).
+  async listElementsPacked(token: string, canvasId: number): Promise<PackedElements> {
+    const res = await fetch(`${API_BASE_URL}/api/canvas/elements?canvas_id=${canvasId}`, {
+      headers: { ...authHeader(token), Accept: ELEMENT_WIRE_TYPE },
+    });
+    if (!res.ok) {
+      const data = await res.json().catch(() => null);
+      throw new Error(data?.error || 'Failed to load elements');
+    }
+    return decodeElements(await res.arrayBuffer());
   },
 
   async createElement(
     token: string,
     payload: Omit<CanvasElement, 'id' | 'created_at' | 'updated_at'>
   ): Promise<CanvasElement> {
-    const res = await fetch(`${API_BASE_URL}/api/canvas/elements`, {
+    const res = await fetchWrite(`${API_BASE_URL}/api/canvas/elements`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json', ...authHeader(token) },
       body: JSON.stringify(payload),
@@ -126,9 +167,9 @@ export const CanvasAPI = {
   async updateElement(
     token: string,
     elementId: number,
-    patch: Partial<Omit<CanvasElement, 'id' | 'canvas_id' | 'created_at' | 'updated_at'>>
+    patch: Partial<Omit<CanvasElement, 'id' | 'canvas_id' | 'created_at' | 'updated_at'>> & ElementPlacement
   ): Promise<CanvasElement> {
-    const res = await fetch(`${API_BASE_URL}/api/canvas/elements/${elementId}`, {
+    const res = await fetchWrite(`${API_BASE_URL}/api/canvas/elements/${elementId}`, {
       method: 'PATCH',
       headers: { 'Content-Type': 'application/json', ...authHeader(token) },
       body: JSON.stringify(patch),
@@ -139,7 +180,7 @@ export const CanvasAPI = {
   },
 
   async deleteElement(token: string, elementId: number): Promise<{ success: boolean }> {
-    const res = await fetch(`${API_BASE_URL}/api/canvas/elements/${elementId}`, {
+    const res = await fetchWrite(`${API_BASE_URL}/api/canvas/elements/${elementId}`, {
       method: 'DELETE',
       headers: { ...authHeader(token) },
     });
@@ -150,11 +191,42 @@ export const CanvasAPI = {
 };
 
 export const ChatAPI = {
-  stream(prompt: string, canvasId?: number | null) {
+  stream(token: string, prompt: string, canvasId?: number | null) {
     return fetch(`${API_BASE_URL}/api/chat/stream`, {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { 'Content-Type': 'application/json', ...authHeader(token) },
       body: JSON.stringify({ message: prompt, canvas_id: canvasId ?? undefined }),
     });
   },
+  // Reattach to a running (or recently finished) reply after the connection dropped
+  resume(token: string, streamId: string, lastEventId?: string | null) {
+    return fetch(`${API_BASE_URL}/api/chat/stream/${encodeURIComponent(streamId)}`, {
+      headers: { ...authHeader(token), ...(lastEventId ? { 'Last-Event-ID': lastEventId } : {}) },
+    });
+  },
+};
+
+export type StoredBlob = {
+  sha256: string;
+  url: string;
+  content_type: string;
+  size: number;
+  width?: number | null;
+  height?: number | null;
+  created_at: number;
+};
+
+export const BlobAPI = {
+  async upload(token: string, file: Blob): Promise<StoredBlob> {
+    const form = new FormData();
+    form.append('file', file);
+    const res = await fetch(`${API_BASE_URL}/api/blobs`, {
+      method: 'POST',
+      headers: { ...authHeader(token) },
+      body: form,
+    });
+    const data = await res.json();
+    if (!res.ok) throw new Error(data?.error || 'Failed to upload image');
+    return data as StoredBlob;
+  },
 };
@@ -0,0 +1,67 @@
+// Decoder for the packed element list (`Accept: application/x-learnable-elements`).
+// Layout is documented in backend/services/wire_format.py. Numeric columns are
+// views over the response buffer (no copy); NULL floats arrive as NaN.
+import type { CanvasElement } from '@/types/api';
+
+export const ELEMENT_WIRE_TYPE = 'application/x-learnable-elements';
+
+type ColumnType = 'int32' | 'uint32' | 'float32';
+type Column = Int32Array | Uint32Array | Float32Array;
+
+export type PackedElements = {
+  count: number;
+  columns: Record<string, Column>;
+  type: string[];
+  order_key: (string | null)[];
+  bgcolor: (string | null)[];
+  data: Record<string, unknown>[];
+};
+
+const ARRAYS: Record<ColumnType, new (buf: ArrayBuffer, offset: number, length: number) => Column> = {
+  int32: Int32Array,
+  uint32: Uint32Array,
+  float32: Float32Array,
+};
+
+export function decodeElements(buf: ArrayBuffer): PackedElements {
+  const view = new DataView(buf);
+  const magic = String.fromCharCode(...new Uint8Array(buf, 0, 4));
+  if (magic !== 'LRNE' || view.getUint16(4, true) !== 1) throw new Error('Unsupported element buffer');
+  const ncols = view.getUint16(6, true);
+  const count = view.getUint32(8, true);
+  const sideLen = view.getUint32(12, true);
+  const sideOffset = 16 + ncols * count * 4;
+  const side = JSON.parse(new TextDecoder().decode(new Uint8Array(buf, sideOffset, sideLen)));
+
+  const columns: Record<string, Column> = {};
+  (side.columns as [string, ColumnType][]).forEach(([name, kind], i) => {
+    columns[name] = new ARRAYS[kind](buf, 16 + i * count * 4, count);
+  });
+  return { count, columns, type: side.type, order_key: side.order_key, bgcolor: side.bgcolor, data: side.data };
+}
+
+const nullable = (v: number) => (Number.isNaN(v) ? null : v);
+
+// Materialize one element in the same shape as the JSON list.
+export function elementAt(p: PackedElements, i: number, canvasId: number): CanvasElement {
+  const c = p.columns;
+  return {
+    id: c.id[i],
+    canvas_id: canvasId,
+    type: p.type[i],
+    x: c.x[i],
+    y: c.y[i],
+    width: nullable(c.width[i]),
+    height: nullable(c.height[i]),
+    rotation: c.rotation[i],
+    z_index: c.z_index[i],
+    bgcolor: p.bgcolor[i] ?? undefined,
+    line_start_x: nullable(c.line_start_x[i]),
+    line_start_y: nullable(c.line_start_y[i]),
+    line_end_x: nullable(c.line_end_x[i]),
+    line_end_y: nullable(c.line_end_y[i]),
+    data: p.data[i],
+    created_at: c.created_at[i],
+    updated_at: c.updated_at[i],
+  };
+}
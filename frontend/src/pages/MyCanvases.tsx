@@ -7,11 +7,14 @@ import { Switch } from '@/components/ui/switch';
 import { Tooltip, TooltipContent, TooltipProvider, TooltipTrigger } from '@/components/ui/tooltip';
 import { useToast } from '@/hooks/use-toast';
 import { useNavigate } from 'react-router-dom';
+import { API_BASE_URL } from '@/config';
 import { CanvasAPI } from '@/lib/api';
 import type { Canvas } from '@/types/api';
-import { useEffect, useMemo, useState } from 'react';
+import { useEffect, useState } from 'react';
 import { ArrowDown, ArrowUp, Share, Network, MoreVertical } from 'lucide-react';
 
+const PAGE_SIZE = 24;
+
 const MyCanvases = () => {
   const currentYear = new Date().getFullYear();
   const { toast } = useToast();
@@ -30,38 +33,60 @@ const MyCanvases = () => {
     return `${Math.floor(months / 12)}y ago`;
   };
 
-  // Load graphs
-  useEffect(() => {
-    const loadGraphs = async () => {
-      try {
-        const token = localStorage.getItem('learnableToken');
-        if (!token) return;
-        const data = await CanvasAPI.listCanvases(token);
-        const items = (data as Canvas[]).map((g) => ({
-          id: String(g.id),
-          name: g.name || 'Untitled',
-          updatedAt: new Date((g.updated_at || 0) * 1000),
-          updatedLabel: formatRelative(new Date((g.updated_at || 0) * 1000)),
-          notes: 0,
-          shared: 0,
-          tokensUsed: 0,
-          questions: 0,
-        }));
-        setGraphs(items);
-      } catch (err) {
-        console.error('Failed to load graphs', err);
-        setGraphs([]);
-      }
+  const toItem = (g: Canvas) => {
+    const updatedAt = new Date((g.updated_at || 0) * 1000);
+    return {
+      id: String(g.id),
+      name: g.name || 'Untitled',
+      updatedAt,
+      updatedLabel: formatRelative(updatedAt),
+      thumbnail: g.thumbnail_url ? `${API_BASE_URL}${g.thumbnail_url}` : null,
+      notes: g.element_count ?? 0,
+      lastChatLabel: g.last_message_at ? formatRelative(new Date(g.last_message_at * 1000)) : '—',
+      shared: 0,
+      tokensUsed: 0,
+      questions: 0,
     };
-    void loadGraphs();
-  }, []);
+  };
 
+  // Load graphs a page at a time; the server orders them, so switching order reloads from the start
   const [orderBy, setOrderBy] = useState<'newest' | 'oldest'>('newest');
-  const ordered = useMemo(() => {
-    const list = [...graphs];
-    list.sort((a, b) => (orderBy === 'newest' ? b.updatedAt - a.updatedAt : a.updatedAt - b.updatedAt));
-    return list;
-  }, [graphs, orderBy]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  const loadPage = async (cursor: string | null) => {
+    const token = localStorage.getItem('learnableToken');
+    if (!token) return;
+    const page = await CanvasAPI.listCanvasPage(token, {
+      limit: PAGE_SIZE,
+      cursor,
+      order: orderBy === 'newest' ? 'desc' : 'asc',
+    });
+    const items = page.canvases.map(toItem);
+    setGraphs((prev) => (cursor ? [...prev, ...items] : items));
+    setNextCursor(page.next_cursor);
+  };
+
+  useEffect(() => {
+    loadPage(null).catch((err) => {
+      console.error('Failed to load graphs', err);
+      setGraphs([]);
+      setNextCursor(null);
+    });
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [orderBy]);
+
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      await loadPage(nextCursor);
+    } catch {
+      toast({ description: 'Failed to load more canvases.', variant: 'destructive' });
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   const [publicMap, setPublicMap] = useState<Record<string, boolean>>({});
   const togglePublic = (id: string, v: boolean) => setPublicMap((m) => ({ ...m, [id]: !!v }));
@@ -85,11 +110,8 @@ const MyCanvases = () => {
       const token = localStorage.getItem('learnableToken');
       if (!token) return;
       const g = await CanvasAPI.createCanvas(token, `New Canvas ${graphs.length + 1}`);
-      const updatedAt = new Date(((g as any).updated_at || 0) * 1000);
-      setGraphs((prev) => [
-        { id: String(g.id), name: g.name, updatedAt, updatedLabel: formatRelative(updatedAt), notes: 0, shared: 0, questions: 0, tokensUsed: 0 },
-        ...prev,
-      ]);
+      const item = toItem(g);
+      setGraphs((prev) => (orderBy === 'newest' ? [item, ...prev] : [...prev, item]));
       toast({ description: 'Canvas created successfully.' });
     } catch {
       toast({ description: 'Error creating canvas.', variant: 'destructive' });
@@ -146,7 +168,7 @@ const MyCanvases = () => {
           </div>
 
           <div className="mt-4 grid grid-cols-1 sm:grid-cols-2 gap-6">
-            {ordered.map((g) => (
+            {graphs.map((g) => (
               <Card key={g.id} className="bg-[#1C1C1C] border border-[#2A2A28] hover:border-[#3F3F3D] transition-all">
                 <CardHeader className="pt-6 pb-0 flex justify-between">
                   <div className="flex items-center gap-2">
@@ -173,11 +195,25 @@ const MyCanvases = () => {
                   <div className="text-xs text-[#B5B2AC]">{g.updatedLabel}</div>
                 </CardHeader>
                 <CardContent className="text-[#C5C1BA] text-sm">
-                  <div className="grid grid-cols-2 gap-4 mt-4 border-t border-[#2A2A28] pt-4">
+                  <button
+                    type="button"
+                    className="mt-4 block w-full aspect-[8/5] rounded overflow-hidden bg-[#272725]"
+                    onClick={() => navigate(`/my-canvases/${g.id}`)}
+                  >
+                    {g.thumbnail && (
+                      <img src={g.thumbnail} alt="" loading="lazy" decoding="async" className="h-full w-full object-cover"
+                        onError={(e) => { e.currentTarget.style.visibility = 'hidden'; }} />
+                    )}
+                  </button>
+                  <div className="grid grid-cols-3 gap-4 mt-4 border-t border-[#2A2A28] pt-4">
                     <div className="text-center">
                       <div className="text-lg font-semibold text-[#E5E3DF]">{g.notes}</div>
                       <div className="text-xs text-[#B5B2AC] mt-1">Notes</div>
                     </div>
+                    <div className="text-center">
+                      <div className="text-lg font-semibold text-[#E5E3DF]">{g.lastChatLabel}</div>
+                      <div className="text-xs text-[#B5B2AC] mt-1">Last chat</div>
+                    </div>
                     <div className="text-center">
                       <div className="text-lg font-semibold text-[#E5E3DF]">{g.shared}</div>
                       <div className="text-xs text-[#B5B2AC] mt-1">Shared</div>
@@ -216,6 +252,19 @@ const MyCanvases = () => {
               </Card>
             ))}
           </div>
+
+          {nextCursor && (
+            <div className="flex justify-center mt-6">
+              <Button
+                variant="outline"
+                className="text-xs"
+                disabled={loadingMore}
+                onClick={loadMore}
+              >
+                {loadingMore ? 'Loading…' : 'Load more'}
+              </Button>
+            </div>
+          )}
         </div>
       </main>
 
@@ -7,6 +7,16 @@ export type Canvas = {
   camera_x?: number;
   camera_y?: number;
   camera_zoom_percentage?: number;
+  revision?: number;
+  // Only on paged listings
+  element_count?: number;
+  last_message_at?: number | null;
+  thumbnail_url?: string;
+};
+
+export type CanvasPage = {
+  canvases: Canvas[];
+  next_cursor: string | null;
 };
 
 export type Chat = {
@@ -35,7 +45,9 @@ export type CanvasElement = {
   width?: number | null;
   height?: number | null;
   rotation: number;
+  // Layer rank on the client; the server stacks by order_key
   z_index: number;
+  order_key?: string | null;
   bgcolor?: string;
   line_start_x?: number | null;
   line_start_y?: number | null;